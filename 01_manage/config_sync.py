@@ -0,0 +1,84 @@
+import json
+import hashlib
+
+from shared.firestore_batch import commit_in_batches
+
+def content_hash(data):
+    """Return a stable hash of a document's content, independent of key order."""
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+def load_config_entries(json_file):
+    """Read a JSON config file containing a list of entries with an 'id' field."""
+    with open(json_file, 'r') as f:
+        return json.load(f)
+
+def project_fields(data, fields=None):
+    """Keep only the given fields of a document (all of them when `fields` is None)."""
+    if fields is None:
+        return dict(data)
+    return {field: data[field] for field in fields if field in data}
+
+def delete_field():
+    """Return Firestore's DELETE_FIELD sentinel, importing the SDK only when a field has to be deleted."""
+    from google.cloud import firestore
+    return firestore.DELETE_FIELD
+
+def build_documents(entries, fields=None):
+    """Turn config entries into {doc_id: data}, skipping entries without an 'id'."""
+    documents = {}
+    for entry in entries:
+        doc_id = entry.get('id')
+        if not doc_id:
+            print("Skipping entry without 'id':", entry)
+            continue
+        documents[doc_id] = project_fields(entry, fields)
+    return documents
+
+def sync_config_to_collection(db, collection_name, entries, fields=None, prune=False, label='document'):
+    """
+    Sync config entries into a Firestore collection.
+
+    The collection is read once, each entry is compared with the stored document by content
+    hash, and only new or changed documents are written, in batches. When `fields` is given
+    only those fields are compared and updated, leaving any other stored fields untouched;
+    a field removed from a config entry is deleted from its stored document.
+    With `prune=True`, documents whose id is no longer in the config are deleted.
+    Returns a dictionary with the number of inserted, updated, unchanged and deleted documents.
+    """
+    documents = build_documents(entries, fields)
+    collection_ref = db.collection(collection_name)
+    existing_projections = {doc.id: project_fields(doc.to_dict(), fields) for doc in collection_ref.stream()}
+    existing_hashes = {doc_id: content_hash(data) for doc_id, data in existing_projections.items()}
+    # Whole-document configs replace the stored document, field configs only update their fields
+    update_operation = 'set' if fields is None else 'update'
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    writes = []
+    for doc_id, data in documents.items():
+        existing_hash = existing_hashes.get(doc_id)
+        if existing_hash is None:
+            writes.append(('set', collection_ref.document(doc_id), data))
+            counts["inserted"] += 1
+            print(f"Inserted new {label}: {doc_id}")
+        elif existing_hash != content_hash(data):
+            if fields is not None:
+                # An update leaves fields it does not mention in place, so dropped fields are deleted explicitly
+                removed_fields = [field for field in existing_projections[doc_id] if field not in data]
+                data = dict(data, **{field: delete_field() for field in removed_fields})
+            writes.append((update_operation, collection_ref.document(doc_id), data))
+            counts["updated"] += 1
+            print(f"Updated {label}: {doc_id}")
+        else:
+            counts["unchanged"] += 1
+            print(f"{label.capitalize()} already exists with the same data: {doc_id}")
+
+    if prune:
+        for doc_id in existing_hashes:
+            if doc_id not in documents:
+                writes.append(('delete', collection_ref.document(doc_id), None))
+                counts["deleted"] += 1
+                print(f"Deleted {label} no longer in config: {doc_id}")
+
+    commit_in_batches(db, writes)
+    return counts
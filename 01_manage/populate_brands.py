@@ -1,68 +1,50 @@
-import json
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore
+import sys
+import time
+import argparse
 from dotenv import load_dotenv
 
+# Modules shared by every stage live in ../shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_sync import load_config_entries, sync_config_to_collection
+from shared.firestore_client import get_db
+
 # Load environment variables from .env file
 load_dotenv()
 
 # Get paths from environment variables
-FIREBASE_CREDENTIALS_PATH = os.getenv('FIREBASE_CREDENTIALS_PATH')
 BRANDS_JSON_PATH = os.getenv('BRANDS_JSON_PATH')
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)  # Use the path from the .env file
-firebase_admin.initialize_app(cred)
-
-# Initialize Firestore client
-db = firestore.client()
+# Only these fields of each brand entry are stored in Firestore
+BRAND_FIELDS = ('name', 'website', 'request_blocking')
 
-def read_json_and_insert_to_firestore(json_file):
+def read_json_and_insert_to_firestore(json_file, prune=False):
     """
     Reads the JSON file and inserts or updates data in the 'brands' collection in Firestore.
+    With `prune=True`, documents that are no longer in the JSON file are deleted.
     """
     try:
-        # Read the JSON file
-        with open(json_file, 'r') as f:
-            brands = json.load(f)
-        
-        # Reference to the 'brands' collection
-        brands_ref = db.collection('brands')
-
-        # Process each brand in the JSON file
-        for brand in brands:
-            brand_id = brand.get('id')
-            if brand_id:
-                # Reference to the specific document
-                doc_ref = brands_ref.document(brand_id)
-                doc = doc_ref.get()
-                
-                if doc.exists:
-                    # Document exists, check for differences
-                    existing_data = doc.to_dict()
-                    if existing_data['name'] != brand['name'] or existing_data['website'] != brand['website']:
-                        # Update the document if there are differences
-                        doc_ref.update({
-                            'name': brand['name'],
-                            'website': brand['website']
-                        })
-                        print(f"Updated brand: {brand_id}")
-                    else:
-                        print(f"Brand already exists with the same data: {brand_id}")
-                else:
-                    # Document does not exist, add a new one
-                    doc_ref.set({
-                        'name': brand['name'],
-                        'website': brand['website']
-                    })
-                    print(f"Inserted new brand: {brand_id}")
-
-            else:
-                print("Skipping entry without 'id':", brand)
+        entries = load_config_entries(json_file)
+        counts = sync_config_to_collection(get_db(), 'brands', entries, fields=BRAND_FIELDS, prune=prune, label='brand')
+        print(f"Brand sync finished: {counts['inserted']} inserted, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged, {counts['deleted']} deleted.")
 
     except Exception as e:
         print(f"An error occurred: {e}")
 
 if __name__ == "__main__":
-    read_json_and_insert_to_firestore(BRANDS_JSON_PATH)
+    parser = argparse.ArgumentParser(description="Sync 'brands' from the JSON config into Firestore.")
+    parser.add_argument('--prune', action='store_true', help="Delete documents that are no longer in the config.")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Print how long the Firebase initialization and the sync take.")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        started = time.perf_counter()
+        get_db()
+        print(f"Firebase initialization: {(time.perf_counter() - started) * 1000:.0f} ms")
+    started = time.perf_counter()
+    read_json_and_insert_to_firestore(BRANDS_JSON_PATH, prune=args.prune)
+    if args.profile_startup:
+        print(f"Sync: {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,176 @@
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from brand_modules.metrics import metrics as run_metrics, RUN_BRAND
+from worker_pool import JobQueue, fail_unclaimed
+
+# How often (in seconds) the queue depth is logged while the pipeline runs
+MONITOR_INTERVAL = 10
+
+class PipelineStats:
+    """Queue depth and time spent waiting on each side of the batch queue."""
+
+    def __init__(self):
+        self.batches = 0
+        self.max_depth = 0
+        self.put_wait = 0.0  # Scrapers blocked on a full queue: writing is the bottleneck
+        self.get_wait = 0.0  # Writers idle on an empty queue: scraping is the bottleneck
+
+class JobTracker:
+    """
+    Report a job as done once its search has finished and all of its batches were written.
+
+    The start and done callbacks write to the job journal, so they run in threads instead of
+    blocking the event loop.
+    """
+
+    def __init__(self, on_job_done=None, on_job_start=None):
+        self.on_job_done = on_job_done
+        self.on_job_start = on_job_start
+        self.pending = {}
+        self.finished = {}
+        self.save_errors = {}
+        self.succeeded = 0
+        self.failed = 0
+        self.worker_error = None
+
+    async def search_started(self, job):
+        if self.on_job_start is not None:
+            await asyncio.to_thread(self.on_job_start, job)
+
+    def batch_queued(self, job):
+        self.pending[job] = self.pending.get(job, 0) + 1
+
+    async def batch_written(self, job, error=None):
+        self.pending[job] -= 1
+        if error is not None:
+            self.save_errors.setdefault(job, error)
+        await self._check_done(job)
+
+    async def search_finished(self, job, error=None):
+        self.finished[job] = error
+        await self._check_done(job)
+
+    async def _check_done(self, job):
+        if job not in self.finished or self.pending.get(job, 0):
+            return
+        # The job failed if the search raised or any of its batches could not be saved
+        error = self.finished.pop(job) or self.save_errors.pop(job, None)
+        self.pending.pop(job, None)
+        if error is None:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+            logging.error(f"Error searching for {job.product_type} on {job.brand_name}: {error}")
+            print(f"Error searching for {job.product_type} on {job.brand_name}: {error}")
+        # The job's state is settled before awaiting, so another task cannot report it twice
+        if self.on_job_done is not None:
+            await asyncio.to_thread(self.on_job_done, job, error)
+
+async def _scraper(scraper_id, job_queue, batches, tracker, create_worker, stats):
+    """Run search jobs on one browser worker and put their link batches on the queue."""
+    loop = asyncio.get_running_loop()
+    # A WebDriver and the per-thread wait stats need every call of a worker on the same thread
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"scraper-{scraper_id}")
+    worker = None
+    try:
+        worker = await loop.run_in_executor(executor, create_worker)
+        logging.info(f"Scraper {scraper_id} started.")
+        while True:
+            job = await loop.run_in_executor(executor, job_queue.claim)
+            if job is None:
+                break
+            await tracker.search_started(job)
+            error = None
+            job_batches = worker.iter_batches(job)
+            try:
+                while True:
+                    product_links = await loop.run_in_executor(executor, next, job_batches, None)
+                    if product_links is None:
+                        break
+                    tracker.batch_queued(job)
+                    started = time.perf_counter()
+                    await batches.put((job, product_links))
+                    waited = time.perf_counter() - started
+                    stats.put_wait += waited
+                    stats.batches += 1
+                    stats.max_depth = max(stats.max_depth, batches.qsize())
+                    run_metrics.record_span('queue_put_wait', waited, job.brand_name)
+            except Exception as e:
+                error = e
+            finally:
+                job_queue.release(job)
+            await tracker.search_finished(job, error)
+    except Exception as e:
+        logging.critical(f"Scraper {scraper_id} failed: {e}")
+        print(f"Scraper {scraper_id} failed: {e}")
+        tracker.worker_error = e
+    finally:
+        if worker is not None:
+            await loop.run_in_executor(executor, worker.close)
+        executor.shutdown(wait=False)
+        logging.info(f"Scraper {scraper_id} closed its WebDriver.")
+
+async def _writer(batches, tracker, on_batch, stats):
+    """Drain link batches from the queue and persist them off the event loop."""
+    while True:
+        started = time.perf_counter()
+        item = await batches.get()
+        waited = time.perf_counter() - started
+        stats.get_wait += waited
+        if item is None:
+            return
+        run_metrics.record_span('queue_get_wait', waited, RUN_BRAND)
+
+        job, product_links = item
+        error = None
+        try:
+            await asyncio.to_thread(on_batch, job, product_links)
+        except Exception as e:
+            error = e
+        await tracker.batch_written(job, error)
+
+async def _monitor(batches, stats):
+    while True:
+        await asyncio.sleep(MONITOR_INTERVAL)
+        logging.info(f"Pipeline queue depth {batches.qsize()}/{batches.maxsize}, {stats.batches} batches queued, "
+                     f"scrapers waited {stats.put_wait:.1f}s, writers waited {stats.get_wait:.1f}s.")
+
+async def run_async_pipeline(jobs, create_worker, on_batch, on_job_done=None, scrapers=1, writers=2,
+                             queue_size=8, per_brand_limit=None, brand_limits=None, on_job_start=None):
+    """
+    Run search jobs on scraper tasks and persist their batches on concurrent writer tasks.
+
+    Scrapers (one browser worker each, as created by `create_worker()`) put link batches on a
+    bounded queue, so they pause while writes fall behind, and `writers` tasks drain it with
+    `on_batch(job, product_links)` in threads. Browsing and Firestore I/O overlap even with a
+    single scraper. `on_job_start(job)` is called (in a thread too) when a scraper picks a job
+    up and `on_job_done(job, error)` once its search has finished and all of its batches were
+    written. Jobs left unsearched because every scraper failed are reported as failed.
+    Returns a (succeeded, failed) tuple of job counts.
+    """
+    job_queue = JobQueue(jobs, per_brand_limit, brand_limits)
+    scraper_count = max(1, min(scrapers, len(jobs)))
+    batches = asyncio.Queue(maxsize=queue_size)
+    tracker = JobTracker(on_job_done, on_job_start)
+    stats = PipelineStats()
+
+    writer_tasks = [asyncio.create_task(_writer(batches, tracker, on_batch, stats)) for _ in range(max(1, writers))]
+    monitor = asyncio.create_task(_monitor(batches, stats))
+    try:
+        await asyncio.gather(*(_scraper(scraper_id, job_queue, batches, tracker, create_worker, stats)
+                               for scraper_id in range(scraper_count)))
+        for _ in writer_tasks:
+            await batches.put(None)
+        await asyncio.gather(*writer_tasks)
+    finally:
+        monitor.cancel()
+    tracker.failed += await asyncio.to_thread(fail_unclaimed, job_queue, on_job_done, tracker.worker_error)
+
+    logging.info(f"Pipeline wrote {stats.batches} batches (max queue depth {stats.max_depth}/{queue_size}); "
+                 f"scrapers waited {stats.put_wait:.1f}s on writes, writers waited {stats.get_wait:.1f}s on scraping.")
+    print(f"Pipeline wrote {stats.batches} batches (max queue depth {stats.max_depth}/{queue_size}); "
+          f"scrapers waited {stats.put_wait:.1f}s on writes, writers waited {stats.get_wait:.1f}s on scraping.")
+    return tracker.succeeded, tracker.failed
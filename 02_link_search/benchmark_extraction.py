@@ -0,0 +1,91 @@
+"""
+Benchmark in-page script extraction against per-element extraction on saved search pages.
+
+Save a search results page of each brand (for example from `driver.page_source`) as
+<pages-dir>/prozis.html, <pages-dir>/myprotein.html and <pages-dir>/zumub.html, then run:
+
+    python benchmark_extraction.py --pages-dir saved_pages --repeat 5
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import statistics
+import contextlib
+from pathlib import Path
+
+# Modules shared by every stage live in ../shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brand_modules import prozis, myprotein, zumub
+from brand_modules.extraction import extract_with_script
+from browser import init_webdriver
+
+# Saved page file name (without .html) mapped to the brand module that parses it
+brand_modules = {
+    "prozis": prozis,
+    "myprotein": myprotein,
+    "zumub": zumub,
+}
+
+class CommandCounter:
+    """Count the WebDriver commands (HTTP round trips) sent through a driver."""
+
+    def __init__(self, driver):
+        self.count = 0
+        self._execute = driver.execute
+        driver.execute = self._counting_execute
+
+    def _counting_execute(self, *args, **kwargs):
+        self.count += 1
+        return self._execute(*args, **kwargs)
+
+def extraction_strategies(driver, module):
+    """Return the two extraction strategies of a brand module as (label, callable) pairs."""
+    return [
+        ("script", lambda: extract_with_script(driver, module.EXTRACT_SCRIPT, module.product_id_from_link)),
+        ("per-element", lambda: module.extract_links_from_items(driver.find_elements(*module.ITEM_LOCATOR))),
+    ]
+
+def benchmark_page(driver, counter, module, repeat):
+    """Time each extraction strategy on the page currently loaded in the driver."""
+    results = {}
+    for label, extract in extraction_strategies(driver, module):
+        timings = []
+        for _ in range(repeat):
+            counter.count = 0
+            started = time.perf_counter()
+            # Silence the per-product output of the extraction functions
+            with contextlib.redirect_stdout(io.StringIO()):
+                links = extract() or []
+            timings.append(time.perf_counter() - started)
+        results[label] = {"items": len(links), "median": statistics.median(timings), "calls": counter.count}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare in-page and per-element link extraction.")
+    parser.add_argument('--pages-dir', required=True, help="Directory with saved <brand>.html search pages.")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per strategy and page.")
+    parser.add_argument('--headless', action='store_true', help="Run Chrome in headless mode.")
+    args = parser.parse_args()
+
+    driver = init_webdriver(browser='chrome', headless=args.headless)
+    counter = CommandCounter(driver)
+
+    try:
+        print(f"{'page':<12}{'strategy':<14}{'items':>7}{'median ms':>12}{'driver calls':>14}")
+        for page_name, module in brand_modules.items():
+            page_path = Path(args.pages_dir) / f"{page_name}.html"
+            if not page_path.exists():
+                print(f"{page_name:<12}skipped (no {page_path})")
+                continue
+            driver.get(page_path.resolve().as_uri())
+            for label, result in benchmark_page(driver, counter, module, args.repeat).items():
+                print(f"{page_name:<12}{label:<14}{result['items']:>7}"
+                      f"{result['median'] * 1000:>12.1f}{result['calls']:>14}")
+    finally:
+        driver.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark the search pipeline of every brand against recorded pages.
+
+Record the pages once with `python replay.py record --out recordings`, then run:
+
+    python benchmark_search.py --recordings recordings --repeat 3 --headless
+
+Each search is timed per stage (homepage + pop-ups, search submit, first page extraction)
+and end to end, so changes to waits, selectors or extraction can be compared offline
+without touching the live sites. --block-requests and --page-load-strategy eager show the
+effect of request blocking on load time, bytes transferred and JS heap size.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import contextlib
+from pathlib import Path
+
+# Modules shared by every stage live in ../shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brand_modules import waits
+from brand_modules.registry import session_classes
+from brand_modules.request_blocking import blocked_url_patterns
+from brand_modules.scheduling import rate_limiter
+from browser import init_webdriver
+from benchmark_extraction import CommandCounter
+from replay import MANIFEST_NAME, load_json, start_replay_servers
+
+STAGES = ('open', 'submit', 'extract')
+
+# Bytes transferred by the current page and its subresources, and the JS heap in use
+PAGE_WEIGHT_SCRIPT = """
+const entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+const transferred = entries.reduce((total, entry) => total + (entry.transferSize || 0), 0);
+return [transferred, performance.memory ? performance.memory.usedJSHeapSize : 0];
+"""
+
+def timed(stage_timings, stage, action):
+    """Run `action` and append its duration to `stage_timings[stage]`."""
+    started = time.perf_counter()
+    result = action()
+    stage_timings[stage].append(time.perf_counter() - started)
+    return result
+
+def benchmark_search(driver, counter, session_class, website, product_type, repeat, blocked_urls=None):
+    """Run a cold search (fresh session) `repeat` times and collect per-stage timings."""
+    stage_timings = {stage: [] for stage in STAGES}
+    totals = []
+    items = 0
+    calls = []
+    weights = []
+    for _ in range(repeat):
+        session = session_class(driver, website, blocked_urls)
+        counter.count = 0
+        started = time.perf_counter()
+        # Silence the per-product output of the extraction functions
+        with contextlib.redirect_stdout(io.StringIO()):
+            timed(stage_timings, 'open', session.open)
+            timed(stage_timings, 'submit', lambda: session.submit_search(product_type))
+            links = timed(stage_timings, 'extract', session.extract) or []
+        totals.append(time.perf_counter() - started)
+        calls.append(counter.count)
+        items = len(links)
+        weights.append(driver.execute_script(PAGE_WEIGHT_SCRIPT))
+
+    total = statistics.median(totals)
+    return {
+        "product_type": product_type,
+        "items": items,
+        "stages_ms": {stage: statistics.median(timings) * 1000 for stage, timings in stage_timings.items()},
+        "total_ms": total * 1000,
+        "items_per_s": items / total if total else 0.0,
+        "driver_calls": statistics.median(calls),
+        "transferred_kb": statistics.median(weight[0] for weight in weights) / 1024,
+        "js_heap_mb": statistics.median(weight[1] for weight in weights) / (1024 * 1024),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark brand searches against recorded pages.")
+    parser.add_argument('--recordings', default='recordings', help="Directory with the recordings of replay.py.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per brand and product type.")
+    parser.add_argument('--headless', action='store_true', help="Run Chrome in headless mode.")
+    parser.add_argument('--block-requests', action='store_true',
+                        help="Block images, fonts, media and trackers with the default blocklist.")
+    parser.add_argument('--page-load-strategy', choices=('normal', 'eager'), default=None)
+    parser.add_argument('--json', help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    manifest = load_json(Path(args.recordings) / MANIFEST_NAME)
+    websites, servers = start_replay_servers(args.recordings)
+    # Replays are local, so pacing would only measure the politeness budget and the rate limit
+    waits.politeness.min_interval = waits.politeness.jitter = 0
+    rate_limiter.configure(rate=0)
+
+    started = time.perf_counter()
+    driver = init_webdriver(browser='chrome', headless=args.headless, page_load_strategy=args.page_load_strategy)
+    driver_init_ms = (time.perf_counter() - started) * 1000
+    counter = CommandCounter(driver)
+    print(f"Driver init: {driver_init_ms:.0f} ms")
+    blocked_urls = blocked_url_patterns() if args.block_requests else None
+
+    results = {"driver_init_ms": driver_init_ms, "brands": {}}
+    try:
+        print(f"{'brand':<12}{'product type':<22}{'items':>6}{'open ms':>9}{'submit ms':>11}"
+              f"{'extract ms':>12}{'total ms':>10}{'items/s':>9}{'calls':>7}{'kB':>8}{'heap MB':>9}")
+        for brand_name, website in websites.items():
+            session_class = session_classes.get(brand_name)
+            if session_class is None:
+                print(f"{brand_name:<12}skipped (no session class)")
+                continue
+            product_types = [page["product_type"] for page in manifest[brand_name]["pages"] if page["product_type"]]
+            brand_results = results["brands"][brand_name] = []
+            for product_type in product_types:
+                result = benchmark_search(driver, counter, session_class, website, product_type, args.repeat,
+                                          blocked_urls)
+                brand_results.append(result)
+                stages = result["stages_ms"]
+                print(f"{brand_name:<12}{product_type[:21]:<22}{result['items']:>6}{stages['open']:>9.0f}"
+                      f"{stages['submit']:>11.0f}{stages['extract']:>12.0f}{result['total_ms']:>10.0f}"
+                      f"{result['items_per_s']:>9.1f}{result['driver_calls']:>7.0f}"
+                      f"{result['transferred_kb']:>8.0f}{result['js_heap_mb']:>9.1f}")
+    finally:
+        driver.quit()
+        for server in servers:
+            server.shutdown()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import logging
+from selenium.common.exceptions import WebDriverException
+
+from brand_modules import metrics
+from brand_modules.urls import clean_url
+
+def log_product(product_name, href):
+    """Log and print a detected product for immediate feedback."""
+    logging.info(f"Product found: {product_name}, Link: {href}")
+    print(f"Detected product: {product_name}, Link: {href}")
+
+def extract_with_script(driver, script, product_id_from_link, *script_args):
+    """
+    Extract the result items in a single WebDriver round trip.
+
+    `script` runs in the page with `script_args` as its arguments and must return a list of
+    {link, name} objects. Product IDs are derived from the links with the brand's
+    `product_id_from_link`. Returns None when the script fails, so callers can fall back to
+    per-element extraction.
+    """
+    try:
+        products = driver.execute_script(script, *script_args)
+    except WebDriverException as e:
+        metrics.count('extraction_fallbacks')
+        logging.warning(f"In-page extraction failed, falling back to per-element extraction: {e}")
+        return None
+    if products is None:
+        return None
+
+    links = []
+    for product in products:
+        href = product.get('link')
+        if not href:
+            logging.warning("Link element not found in item.")
+            continue
+        product_name = (product.get('name') or '').strip()
+        links.append({"id": product_id_from_link(href), "link": clean_url(href), "name": product_name})
+        log_product(product_name, href)
+    return links
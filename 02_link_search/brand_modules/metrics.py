@@ -0,0 +1,169 @@
+import json
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+# Brand label used for spans and counters recorded outside of any brand search
+RUN_BRAND = 'run'
+
+def percentile(values, pct):
+    """Return the `pct` percentile (0-100) of `values`, interpolating between samples."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+class RunMetrics:
+    """
+    Stage timings and counters of one run, per brand.
+
+    Every span and counter is appended to an optional JSON-lines trace as it happens;
+    `summary()` aggregates the spans into p50/p95 durations per brand and stage.
+    Spans and counters without an explicit brand use the brand bound to the current thread.
+    """
+
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self._durations = defaultdict(list)  # (brand, stage) -> [seconds]
+        self._errors = defaultdict(int)      # (brand, stage) -> failed spans
+        self._counters = defaultdict(int)    # (brand, name) -> count
+        self._values = defaultdict(list)     # (brand, name) -> [sampled values]
+        self._trace = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def open_trace(self, path):
+        """Append trace events to a JSON-lines file."""
+        with self._lock:
+            self._trace = open(path, 'a', encoding='utf-8')
+
+    def bind_brand(self, brand):
+        """Attribute the spans and counters recorded on this thread to `brand`."""
+        self._local.brand = brand
+
+    def current_brand(self):
+        return getattr(self._local, 'brand', None) or RUN_BRAND
+
+    def _emit(self, event):
+        if self._trace is None:
+            return
+        event = {"ts": round(time.time(), 3), "run_id": self.run_id, **event}
+        line = json.dumps(event, default=str)
+        with self._lock:
+            if self._trace is not None:
+                self._trace.write(line + '\n')
+
+    def record_span(self, stage, seconds, brand=None, status='ok', **fields):
+        """Record the duration of a stage that was timed elsewhere."""
+        brand = brand or self.current_brand()
+        with self._lock:
+            self._durations[(brand, stage)].append(seconds)
+            if status != 'ok':
+                self._errors[(brand, stage)] += 1
+        self._emit({"type": "span", "brand": brand, "stage": stage,
+                    "duration_ms": round(seconds * 1000, 1), "status": status, **fields})
+
+    @contextmanager
+    def span(self, stage, brand=None, **fields):
+        """Time the enclosed block as one `stage` span; exceptions mark it as failed."""
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            self.record_span(stage, time.perf_counter() - started, brand, status, **fields)
+
+    def count(self, name, n=1, brand=None, **fields):
+        """Increment a counter such as items, retries or timeouts."""
+        brand = brand or self.current_brand()
+        with self._lock:
+            self._counters[(brand, name)] += n
+        self._emit({"type": "count", "brand": brand, "name": name, "n": n, **fields})
+
+    def observe(self, name, value, brand=None, **fields):
+        """Record a sampled value such as the browser memory use."""
+        brand = brand or self.current_brand()
+        with self._lock:
+            self._values[(brand, name)].append(value)
+        self._emit({"type": "value", "brand": brand, "name": name, "value": round(value, 3), **fields})
+
+    def summary(self):
+        """Return the run totals: p50/p95 per brand and stage, the counters and sampled values per brand."""
+        with self._lock:
+            durations = {key: list(values) for key, values in self._durations.items()}
+            errors = dict(self._errors)
+            counters = dict(self._counters)
+            sampled = {key: list(values) for key, values in self._values.items()}
+
+        stages = defaultdict(dict)
+        for (brand, stage), values in sorted(durations.items()):
+            stages[brand][stage] = {
+                "count": len(values),
+                "errors": errors.get((brand, stage), 0),
+                "total_s": round(sum(values), 3),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+            }
+        counts = defaultdict(dict)
+        for (brand, name), value in sorted(counters.items()):
+            counts[brand][name] = value
+        values = defaultdict(dict)
+        for (brand, name), samples in sorted(sampled.items()):
+            values[brand][name] = {
+                "count": len(samples),
+                "p50": round(percentile(samples, 50), 1),
+                "p95": round(percentile(samples, 95), 1),
+                "max": round(max(samples), 1),
+            }
+        return {
+            "run_id": self.run_id,
+            "started": self.started,
+            "elapsed_s": round(time.time() - self.started, 3),
+            "stages": dict(stages),
+            "counters": dict(counts),
+            "values": dict(values),
+        }
+
+    def close(self, summary_path=None):
+        """Write the summary to the trace (and to `summary_path`) and close the trace."""
+        summary = self.summary()
+        self._emit({"type": "summary", **summary})
+        if summary_path:
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+        return summary
+
+# Shared by the link search, the brand sessions and the Firestore save path
+metrics = RunMetrics()
+
+def span(stage, brand=None, **fields):
+    return metrics.span(stage, brand, **fields)
+
+def count(name, n=1, brand=None, **fields):
+    metrics.count(name, n, brand, **fields)
+
+def log_summary(summary):
+    """Log the per-stage p50/p95 durations and the counters of a run summary."""
+    for brand, stages in summary["stages"].items():
+        for stage, stats in stages.items():
+            logging.info(f"Metrics {brand} {stage}: n={stats['count']} errors={stats['errors']} "
+                         f"p50={stats['p50_ms']:.0f}ms p95={stats['p95_ms']:.0f}ms total={stats['total_s']:.1f}s")
+    for brand, counters in summary["counters"].items():
+        logging.info(f"Metrics {brand} counters: " + ", ".join(f"{name}={value}" for name, value in counters.items()))
+    for brand, values in summary["values"].items():
+        for name, stats in values.items():
+            logging.info(f"Metrics {brand} {name}: n={stats['count']} p50={stats['p50']} p95={stats['p95']} max={stats['max']}")
@@ -1,23 +1,27 @@
-import time
-import random
 import logging
+from urllib.parse import urljoin, urlsplit
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
-def random_sleep(min_time=0.1, max_time=0.8):
-    """Sleep for a random duration to mimic human behavior."""
-    time.sleep(random.uniform(min_time, max_time))
+from brand_modules import waits
+from brand_modules import metrics
+from brand_modules.extraction import extract_with_script, log_product
+from brand_modules.pagination import go_to_next_page
+from brand_modules.session import BrandSession
+from brand_modules.urls import clean_url
+
+# Key of the politeness budget shared by every MyProtein search
+DOMAIN = 'myprotein.pt'
 
 def accept_cookies(driver):
     """Accept cookies on the MyProtein website."""
     try:
-        cookies_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, 'onetrust-accept-btn-handler'))
+        cookies_button = waits.wait_until(
+            driver, EC.element_to_be_clickable((By.ID, 'onetrust-accept-btn-handler')), 10
         )
-        random_sleep()
+        waits.pace(DOMAIN)
         cookies_button.click()
         logging.info("Cookies accepted successfully.")
     except (NoSuchElementException, TimeoutException):
@@ -28,10 +32,10 @@ def accept_cookies(driver):
 def close_registration_popup(driver):
     """Close the registration pop-up if it appears."""
     try:
-        close_button = WebDriverWait(driver, 5).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, 'button.emailReengagement_close_button'))
+        close_button = waits.wait_until(
+            driver, EC.element_to_be_clickable((By.CSS_SELECTOR, 'button.emailReengagement_close_button')), 5
         )
-        random_sleep()
+        waits.pace(DOMAIN)
         close_button.click()
         logging.info("Registration pop-up closed successfully.")
     except (NoSuchElementException, TimeoutException):
@@ -39,13 +43,13 @@ def close_registration_popup(driver):
     except Exception as e:
         logging.error("Error closing registration pop-up: " + str(e))
 
-def open_search(driver):
+def open_search(driver, timeout=10):
     """Open the search input field on MyProtein website."""
     try:
-        search_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, 'button.headerSearch_toggleForm'))
+        search_button = waits.wait_until(
+            driver, EC.element_to_be_clickable((By.CSS_SELECTOR, 'button.headerSearch_toggleForm')), timeout
         )
-        random_sleep()
+        waits.pace(DOMAIN)
         search_button.click()
         logging.info("Search input field opened successfully.")
     except (NoSuchElementException, TimeoutException):
@@ -53,72 +57,130 @@ def open_search(driver):
     except Exception as e:
         logging.error("Error opening search input: " + str(e))
 
-def perform_search(driver, search_query):
-    """Perform a search for the given query on MyProtein website."""
-    random_sleep()
+def perform_search(driver, search_query, timeout=10):
+    """Perform a search for the given query on MyProtein website; return whether it was submitted."""
     try:
-        open_search(driver)  # Open search field before entering text
+        open_search(driver, timeout)  # Open search field before entering text
 
         # Locate the search input using its NAME attribute
-        search_input = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.NAME, 'search'))  # Use NAME to find the search box
+        search_input = waits.wait_until(
+            driver, EC.element_to_be_clickable((By.NAME, 'search')), timeout  # Use NAME to find the search box
         )
+        waits.pace(DOMAIN)
         search_input.clear()
         search_input.send_keys(search_query)
         search_input.send_keys(Keys.RETURN)
         logging.info(f"Search performed successfully for query: {search_query}")
+        return True
     except Exception as e:
         logging.error("Search Error: " + str(e))
+        return False
+
+# Result items on the search results page
+ITEM_LOCATOR = (By.CSS_SELECTOR, 'ul.productListProducts_products li.productListProducts_product')
+
+# Control that loads the next page of results
+NEXT_PAGE_SELECTOR = 'button.responsivePaginationNavigationButton.paginationNavigationButtonNext, a.responsivePaginationNavigationButton.paginationNavigationButtonNext'
+
+# Returns {link, name} for every result item from index arguments[0] on, in a single WebDriver round trip
+EXTRACT_SCRIPT = """
+return Array.from(document.querySelectorAll('ul.productListProducts_products li.productListProducts_product')).slice(arguments[0] || 0).map(function (item) {
+    var link = item.querySelector('a.productBlock_link');
+    if (!link) {
+        return {link: null, name: null};
+    }
+    return {link: link.href, name: (link.innerText || '').trim() || link.getAttribute('aria-label')};
+});
+"""
+
+def product_id_from_link(href):
+    """
+    Extract the unique part of a product link: the next-to-last segment of its path.
+
+    MyProtein links have always been keyed on that segment, so the query string is ignored
+    but the stored document IDs stay the same.
+    """
+    return urlsplit(href.strip()).path.split('/')[-2]
 
-def extract_item_links(driver):
-    """Extract item links from the search results."""
-    random_sleep()
+def extract_links_from_items(items):
+    """Extract item links element by element (one WebDriver round trip per lookup)."""
+    links = []
+    for item in items:
+        try:
+            # Find the link element within the product item
+            link_element = item.find_element(By.CSS_SELECTOR, 'a.productBlock_link')
+            href = link_element.get_attribute('href')
+            product_name = link_element.text.strip() or link_element.get_attribute('aria-label')  # Extracting product name
+            links.append({"id": product_id_from_link(href), "link": clean_url(href), "name": product_name})
+            log_product(product_name, href)
+
+        except NoSuchElementException:
+            logging.warning("Link element not found in item.")
+        except Exception as e:
+            logging.error(f"Error processing item: {str(e)}")
+    return links
+
+def parse_item_links(soup, base_url):
+    """Extract item links from a search results page fetched over plain HTTP."""
+    links = []
+    for link_element in soup.select('ul.productListProducts_products li.productListProducts_product a.productBlock_link'):
+        href = link_element.get('href')
+        if not href:
+            continue
+        href = urljoin(base_url, href)
+        product_name = link_element.get_text(strip=True) or link_element.get('aria-label')  # Extracting product name
+        links.append({"id": product_id_from_link(href), "link": clean_url(href), "name": product_name})
+        log_product(product_name, href)
+    return links
+
+def extract_item_links(driver, start=0):
+    """Extract item links from the search results, starting at item index `start`."""
     links = []
     logging.info("Starting link extraction")
-    
+
     try:
-        # Locate the product list container
-        product_list = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'ul.productListProducts_products'))
-        )
-        
-        # Find all product items within the list
-        items = product_list.find_elements(By.CSS_SELECTOR, 'li.productListProducts_product')
+        # Wait until the product items have rendered and their count has settled
+        items = waits.wait_until(driver, waits.results_stable(ITEM_LOCATOR), 10)
         logging.info(f"Found {len(items)} items on the page.")
-        
-        for item in items:
-            try:
-                # Find the link element within the product item
-                link_element = item.find_element(By.CSS_SELECTOR, 'a.productBlock_link')
-                href = link_element.get_attribute('href')
-                product_id = href.split("/")[-2]  # Extract the unique part of the link
-                links.append({"id": product_id, "link": href})
-                
-                # Improved logging for each product
-                product_name = link_element.text.strip() or link_element.get_attribute('aria-label')  # Extracting product name
-                logging.info(f"Product found: {product_name}, Link: {href}")
-                print(f"Detected product: {product_name}, Link: {href}")  # Print each detected product for immediate feedback
-
-            except NoSuchElementException:
-                logging.warning("Link element not found in item.")
-            except Exception as e:
-                logging.error(f"Error processing item: {str(e)}")
-                
+
+        # Read every item in one in-page script, falling back to per-element lookups
+        links = extract_with_script(driver, EXTRACT_SCRIPT, product_id_from_link, start)
+        if links is None:
+            links = extract_links_from_items(items[start:])
+
     except TimeoutException:
+        # Results that never render (throttling, a blocked page) have to reach the retries and the circuit breaker
         logging.error("Timeout while waiting for items to load.")
+        raise
     except Exception as e:
         logging.error("Links Error: " + str(e))
 
     return links
 
+class MyProteinSession(BrandSession):
+    """Warm browser session on the MyProtein website."""
+
+    brand_label = 'MyProtein'
+    item_locator = ITEM_LOCATOR
+    search_input_selector = 'input[name="search"]'
+    parse_item_links = staticmethod(parse_item_links)
+
+    def prepare(self):
+        with metrics.span('cookies'):
+            accept_cookies(self.driver)  # Accept cookies if necessary
+        with metrics.span('popup'):
+            close_registration_popup(self.driver)  # Close the registration pop-up if it appears
+
+    def submit_search(self, product_type, timeout=10):
+        return perform_search(self.driver, product_type, timeout)
+
+    def extract(self, start=0):
+        return extract_item_links(self.driver, start)
+
+    def next_page(self):
+        # MyProtein splits results over numbered pages
+        return go_to_next_page(self.driver, NEXT_PAGE_SELECTOR, ITEM_LOCATOR, DOMAIN)
+
 def search_myprotein(driver, brand_website, product_type):
     """Function to search for a product type on MyProtein website."""
-    logging.info(f"Starting search on {brand_website} for product type: {product_type}")
-    driver.get(brand_website)
-    random_sleep()  # Let the page load
-    accept_cookies(driver)  # Accept cookies if necessary
-    close_registration_popup(driver)  # Close the registration pop-up if it appears
-    perform_search(driver, product_type)  # Perform the search
-    product_links = extract_item_links(driver)  # Extract product links
-    logging.info(f"Search completed for product type: {product_type} on {brand_website}")
-    return product_links
+    return MyProteinSession(driver, brand_website).search(product_type)
@@ -0,0 +1,46 @@
+import logging
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from brand_modules import waits
+
+def load_more_by_scrolling(driver, item_locator, domain, timeout=5):
+    """
+    Scroll to the bottom of the page to trigger infinite scroll / lazy loading.
+
+    Returns the number of items that were already on the page (so extraction can resume
+    from there), or None when no new items appeared.
+    """
+    previous_count = len(driver.find_elements(*item_locator))
+    waits.pace(domain)
+    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    try:
+        waits.wait_until(driver, lambda d: len(d.find_elements(*item_locator)) > previous_count, timeout)
+    except TimeoutException:
+        return None
+    # Let the newly loaded batch finish rendering before it is extracted
+    waits.wait_optional(driver, waits.results_stable(item_locator, min_count=previous_count + 1), timeout)
+    return previous_count
+
+def go_to_next_page(driver, next_page_selector, item_locator, domain, timeout=10):
+    """
+    Click the "next page" control of a paginated result list.
+
+    Returns 0 (extract the new page from its first item) once the previous results were
+    replaced, or None when there is no next page.
+    """
+    next_buttons = driver.find_elements(By.CSS_SELECTOR, next_page_selector)
+    if not next_buttons:
+        return None
+    first_items = driver.find_elements(*item_locator)[:1]
+    try:
+        waits.pace(domain)
+        next_buttons[0].click()
+        if first_items:
+            waits.wait_until(driver, EC.staleness_of(first_items[0]), timeout)
+        waits.wait_until(driver, waits.results_stable(item_locator), timeout)
+    except (TimeoutException, WebDriverException) as e:
+        logging.warning(f"Could not load the next results page: {e}")
+        return None
+    return 0
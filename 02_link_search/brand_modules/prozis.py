@@ -1,23 +1,27 @@
-import time
-import random
 import logging
+from urllib.parse import urljoin
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
-def random_sleep():
-    """Sleep for a random duration to mimic human behavior."""
-    time.sleep(random.uniform(0.1, 0.8))
+from brand_modules import waits
+from brand_modules import metrics
+from brand_modules.extraction import extract_with_script, log_product
+from brand_modules.pagination import load_more_by_scrolling
+from brand_modules.session import BrandSession
+from brand_modules.urls import clean_url, product_id_from_url
+
+# Key of the politeness budget shared by every Prozis search
+DOMAIN = 'prozis.com'
 
 def accept_cookies(driver):
     """Accept cookies on the website."""
     try:
-        cookies_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, 'CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll'))
+        cookies_button = waits.wait_until(
+            driver, EC.element_to_be_clickable((By.ID, 'CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll')), 10
         )
-        random_sleep()
+        waits.pace(DOMAIN)
         cookies_button.click()
         logging.info("Cookies accepted successfully.")
     except (NoSuchElementException, TimeoutException):
@@ -25,66 +29,115 @@ def accept_cookies(driver):
     except Exception as e:
         logging.error("Cookies Error: " + str(e))
 
-def perform_search(driver, search_query):
-    """Perform a search for the given query on Prozis website."""
-    random_sleep()
+def perform_search(driver, search_query, timeout=10):
+    """Perform a search for the given query on Prozis website; return whether it was submitted."""
     try:
         # Locate the search input using its ID
-        search_input = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, 'quick-search_query'))  # Use ID to find the search box
+        search_input = waits.wait_until(
+            driver, EC.element_to_be_clickable((By.ID, 'quick-search_query')), timeout  # Use ID to find the search box
         )
+        waits.pace(DOMAIN)
         search_input.clear()
         search_input.send_keys(search_query)
         search_input.send_keys(Keys.RETURN)
         logging.info(f"Search performed successfully for query: {search_query}")
+        return True
     except Exception as e:
         logging.error("Search Error: " + str(e))
+        return False
+
+# Result items on the search results page
+ITEM_LOCATOR = (By.CSS_SELECTOR, '.col.list-item')  # Adjusting the selector based on actual class name for product items
+
+# Returns {link, name} for every result item from index arguments[0] on, in a single WebDriver round trip
+EXTRACT_SCRIPT = """
+return Array.from(document.querySelectorAll('.col.list-item')).slice(arguments[0] || 0).map(function (item) {
+    var link = item.querySelector('a.click-layer');
+    return {link: link ? link.href : null, name: link ? link.getAttribute('aria-label') : null};
+});
+"""
+
+def product_id_from_link(href):
+    """Extract the unique part of a product link, ignoring query strings, locale and trailing slash."""
+    return product_id_from_url(href)
+
+def extract_links_from_items(items):
+    """Extract item links element by element (one WebDriver round trip per lookup)."""
+    links = []
+    for item in items:
+        try:
+            # Adjusted to target the correct <a> tag with the class 'click-layer'
+            link_element = item.find_element(By.CSS_SELECTOR, 'a.click-layer')
+            href = link_element.get_attribute('href')
+            product_name = link_element.get_attribute('aria-label')  # Extracting product name from the aria-label attribute
+            links.append({"id": product_id_from_link(href), "link": clean_url(href), "name": product_name})
+            log_product(product_name, href)
+
+        except NoSuchElementException:
+            logging.warning("Link element not found in item.")
+        except Exception as e:
+            logging.error(f"Error processing item: {str(e)}")
+    return links
+
+def parse_item_links(soup, base_url):
+    """Extract item links from a search results page fetched over plain HTTP."""
+    links = []
+    for link_element in soup.select('.col.list-item a.click-layer'):
+        href = link_element.get('href')
+        if not href:
+            continue
+        href = urljoin(base_url, href)
+        product_name = link_element.get('aria-label')  # Extracting product name from the aria-label attribute
+        links.append({"id": product_id_from_link(href), "link": clean_url(href), "name": product_name})
+        log_product(product_name, href)
+    return links
 
-def extract_item_links(driver):
-    """Extract item links from the search results."""
-    random_sleep()
+def extract_item_links(driver, start=0):
+    """Extract item links from the search results, starting at item index `start`."""
     links = []
     logging.info("Starting link extraction")
-    
+
     try:
-        # Correctly using CSS_SELECTOR to target elements
-        items = WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, '.col.list-item'))  # Adjusting the selector based on actual class name for product items
-        )
+        # Wait until the product items have rendered and their count has settled
+        items = waits.wait_until(driver, waits.results_stable(ITEM_LOCATOR), 10)
         logging.info(f"Found {len(items)} items on the page.")
-        
-        for item in items:
-            try:
-                # Adjusted to target the correct <a> tag with the class 'click-layer'
-                link_element = item.find_element(By.CSS_SELECTOR, 'a.click-layer')
-                href = link_element.get_attribute('href')
-                product_id = href.split("/")[-1]  # Extract the unique part of the link
-                links.append({"id": product_id, "link": href})
-                
-                # Improved logging for each product
-                product_name = link_element.get_attribute('aria-label')  # Extracting product name from the aria-label attribute
-                logging.info(f"Product found: {product_name}, Link: {href}")
-                print(f"Detected product: {product_name}, Link: {href}")  # Print each detected product for immediate feedback
-
-            except NoSuchElementException:
-                logging.warning("Link element not found in item.")
-            except Exception as e:
-                logging.error(f"Error processing item: {str(e)}")
-                
+
+        # Read every item in one in-page script, falling back to per-element lookups
+        links = extract_with_script(driver, EXTRACT_SCRIPT, product_id_from_link, start)
+        if links is None:
+            links = extract_links_from_items(items[start:])
+
     except TimeoutException:
+        # Results that never render (throttling, a blocked page) have to reach the retries and the circuit breaker
         logging.error("Timeout while waiting for items to load.")
+        raise
     except Exception as e:
         logging.error("Links Error: " + str(e))
 
     return links
 
+class ProzisSession(BrandSession):
+    """Warm browser session on the Prozis website."""
+
+    brand_label = 'Prozis'
+    item_locator = ITEM_LOCATOR
+    search_input_selector = '#quick-search_query'
+    parse_item_links = staticmethod(parse_item_links)
+
+    def prepare(self):
+        with metrics.span('cookies'):
+            accept_cookies(self.driver)  # Accept cookies if necessary
+
+    def submit_search(self, product_type, timeout=10):
+        return perform_search(self.driver, product_type, timeout)
+
+    def extract(self, start=0):
+        return extract_item_links(self.driver, start)
+
+    def next_page(self):
+        # Prozis loads further results with infinite scroll
+        return load_more_by_scrolling(self.driver, ITEM_LOCATOR, DOMAIN)
+
 def search_prozis(driver, brand_website, product_type):
     """Function to search for a product type on Prozis website."""
-    logging.info(f"Starting search on {brand_website} for product type: {product_type}")
-    driver.get(brand_website)
-    random_sleep()  # Let the page load
-    accept_cookies(driver)  # Accept cookies if necessary
-    perform_search(driver, product_type)  # Perform the search
-    product_links = extract_item_links(driver)  # Extract product links
-    logging.info(f"Search completed for product type: {product_type} on {brand_website}")
-    return product_links
+    return ProzisSession(driver, brand_website).search(product_type)
@@ -0,0 +1,11 @@
+# Import brand-specific search sessions
+from brand_modules.prozis import ProzisSession
+from brand_modules.myprotein import MyProteinSession
+from brand_modules.zumub import ZumubSession
+
+# Dictionary mapping brand name to the session class that searches its website
+session_classes = {
+    "Prozis": ProzisSession,
+    "MyProtein": MyProteinSession,
+    "Zumub": ZumubSession,
+}
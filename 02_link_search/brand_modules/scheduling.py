@@ -0,0 +1,145 @@
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlsplit
+
+from brand_modules import waits
+from brand_modules import metrics
+
+class TokenBucket:
+    """Allow `rate` requests per second on average, with bursts of up to `capacity` requests."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns the time slept."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now; a negative balance makes later callers queue behind this one
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+class DomainRateLimiter:
+    """One token bucket per website domain, shared by every worker of the run."""
+
+    def __init__(self, rate=1.0, burst=3):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def configure(self, rate=None, burst=None):
+        with self._lock:
+            if rate is not None:
+                self.rate = rate
+            if burst is not None:
+                self.burst = burst
+            self._buckets.clear()
+
+    def acquire(self, domain):
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            bucket = self._buckets.get(domain)
+            if bucket is None:
+                bucket = self._buckets[domain] = TokenBucket(self.rate, self.burst)
+        return bucket.acquire()
+
+# Shared by the browser sessions and the HTTP fast path
+rate_limiter = DomainRateLimiter()
+
+def throttle(url):
+    """Wait for the rate limit of the URL's domain before requesting a page from it."""
+    waited = rate_limiter.acquire(urlsplit(url).netloc or url)
+    if waited > 0:
+        waits.current_stats().pacing += waited
+        metrics.metrics.record_span('rate_limit_wait', waited)
+    return waited
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n waits up to base_delay * 2**(n-1) seconds."""
+
+    def __init__(self, attempts=3, base_delay=2.0, max_delay=60.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+class CircuitOpenError(Exception):
+    """Raised instead of searching a brand whose circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Stop sending work to a brand after `threshold` consecutive failed searches.
+
+    Once open, the breaker rejects searches for `cooldown` seconds and then lets a single
+    trial search through (half-open): a success closes it again, a failure re-opens it.
+    """
+
+    def __init__(self, name, threshold=3, cooldown=300):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.state = 'closed'
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = 'half-open'
+                logging.info(f"Circuit breaker of {self.name} is half-open, trying one search.")
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logging.info(f"Circuit breaker of {self.name} closed.")
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.threshold:
+                if self.state != 'open':
+                    logging.warning(f"Circuit breaker of {self.name} opened after {self.failures} consecutive failed searches.")
+                    print(f"Circuit breaker of {self.name} opened after {self.failures} consecutive failed searches.")
+                    metrics.count('circuit_opened', brand=self.name)
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+class SearchScheduler:
+    """Retry policy plus one circuit breaker per brand, shared by all workers of a run."""
+
+    def __init__(self, retry_policy=None, breaker_threshold=3, breaker_cooldown=300):
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker_for(self, brand_name):
+        with self._lock:
+            breaker = self._breakers.get(brand_name)
+            if breaker is None:
+                breaker = CircuitBreaker(brand_name, self.breaker_threshold, self.breaker_cooldown)
+                self._breakers[brand_name] = breaker
+            return breaker
@@ -0,0 +1,193 @@
+import logging
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+from brand_modules import waits
+from brand_modules import metrics
+from brand_modules.request_blocking import apply_request_blocking
+from brand_modules.scheduling import throttle
+from brand_modules import static_fetch
+
+# How long to look for the search box on an already-open page before reloading the homepage
+WARM_SEARCH_TIMEOUT = 3
+
+# How long a warm search may take to replace the results of the previous search
+RESULTS_REPLACED_TIMEOUT = 10
+
+class SearchError(Exception):
+    """Raised when a search cannot be submitted, so the caller can retry it."""
+
+class BrandSession:
+    """
+    Browser session on one brand website.
+
+    The homepage is loaded and the cookie/pop-up handling runs only once. Later searches are
+    submitted from the search box of whatever results page is already open, and the homepage
+    is only reloaded when that search box cannot be found.
+
+    `blocked_urls` (URL patterns, see request_blocking) are applied to the driver whenever
+    the session (re)opens the brand website; None leaves request blocking untouched.
+    """
+
+    brand_label = 'Brand'
+
+    # Locator of the result items on a search results page
+    item_locator = None
+
+    # CSS selector of the search box, used to find the search form for the HTTP fast path
+    search_input_selector = None
+
+    def __init__(self, driver, brand_website, blocked_urls=None):
+        self.driver = driver
+        self.brand_website = brand_website
+        self.blocked_urls = blocked_urls
+        self.prepared = False  # Cookies and pop-ups have been handled in this browser
+        self.on_site = False   # The browser is currently showing a page of this brand
+
+    def prepare(self):
+        """Handle cookie banners and pop-ups shown on the first visit."""
+
+    def submit_search(self, product_type, timeout=10):
+        """Submit a search from the current page; return False if the search box was not found."""
+        raise NotImplementedError
+
+    def extract(self, start=0):
+        """Extract the product links of the current results page, from item index `start` on."""
+        raise NotImplementedError
+
+    def next_page(self):
+        """
+        Load more results (next page or infinite scroll).
+
+        Returns the index of the first new item on the page, or None when there are no more.
+        """
+        return None
+
+    @staticmethod
+    def parse_item_links(soup, base_url):
+        """Extract the product links from a search results page fetched over plain HTTP."""
+        return []
+
+    @classmethod
+    def iter_static_search(cls, brand_website, product_type, max_pages=None, max_items=None):
+        """
+        Search without a browser, using pooled HTTP requests and the same result selectors.
+
+        Yields nothing when the brand needs Selenium; the first empty static result switches
+        the brand to the Selenium path for the rest of the run.
+        """
+        if cls.search_input_selector is None or static_fetch.uses_selenium_only(cls.brand_label):
+            return
+        seen_ids = set()
+        pages = static_fetch.iter_search(cls.brand_label, brand_website, product_type,
+                                         cls.search_input_selector, cls.parse_item_links, max_pages)
+        for page_links in pages:
+            if not seen_ids and not page_links:
+                metrics.count('fast_path_fallbacks')
+                logging.info(f"Static fetch returned no results, switching {cls.brand_label} to Selenium.")
+                static_fetch.switch_to_selenium(cls.brand_label)
+                return
+            for product in page_links:
+                if product["id"] in seen_ids:
+                    continue
+                seen_ids.add(product["id"])
+                yield product
+                if max_items and len(seen_ids) >= max_items:
+                    return
+
+    def open(self):
+        """Load the homepage, running the cookie/pop-up handling on the first visit only."""
+        if self.blocked_urls is not None:
+            # The driver may have been used for another brand with different blocking rules
+            apply_request_blocking(self.driver, self.blocked_urls)
+        throttle(self.brand_website)
+        with metrics.span('page_load'):
+            self.driver.get(self.brand_website)
+        if not self.prepared:
+            with metrics.span('prepare'):
+                self.prepare()
+            self.prepared = True
+        self.on_site = True
+
+    def wait_replaced(self, previous_item):
+        """
+        Wait until a result item of the previous search went stale, i.e. the new results page replaced it.
+
+        The old result cards match the item locator too, so extracting before that would
+        return the previous search's products. Returns False when the page was not replaced.
+        """
+        try:
+            waits.wait_until(self.driver, EC.staleness_of(previous_item), RESULTS_REPLACED_TIMEOUT)
+            return True
+        except TimeoutException:
+            logging.warning(f"The {self.brand_label} results of the previous search were not replaced.")
+            return False
+
+    def leave(self):
+        """Mark that the browser navigated to another site, so the next search reloads the homepage."""
+        self.on_site = False
+
+    def iter_search(self, product_type, max_pages=None, max_items=None):
+        """
+        Search for a product type and yield its product links as each results page is parsed.
+
+        Pagination or infinite scroll is followed until a page brings no new products or
+        the `max_pages`/`max_items` caps are reached.
+        """
+        logging.info(f"Starting search on {self.brand_website} for product type: {product_type}")
+        waits.start_stats()
+
+        warm_submitted = False
+        throttle(self.brand_website)
+        if self.on_site:
+            previous_items = self.driver.find_elements(*self.item_locator)[:1] if self.item_locator else []
+            with metrics.span('submit', warm=True):
+                warm_submitted = self.submit_search(product_type, timeout=WARM_SEARCH_TIMEOUT)
+                if warm_submitted and previous_items:
+                    warm_submitted = self.wait_replaced(previous_items[0])
+        if warm_submitted:
+            logging.info(f"Reused the open {self.brand_label} page for the search.")
+        else:
+            if self.on_site:
+                # The warm search box was not found or the results were not replaced, so the search is retried from the homepage
+                metrics.count('warm_reloads')
+            self.open()
+            with metrics.span('submit', warm=False):
+                submitted = self.submit_search(product_type)
+            if not submitted:
+                self.on_site = False
+                raise SearchError(f"Could not submit the {self.brand_label} search for {product_type}")
+
+        seen_ids = set()
+        pages = 0
+        start = 0
+        try:
+            while True:
+                pages += 1
+                new_products = 0
+                with metrics.span('extract'):
+                    page_products = self.extract(start)
+                metrics.count('pages')
+                for product in page_products:
+                    if product["id"] in seen_ids:
+                        continue
+                    seen_ids.add(product["id"])
+                    new_products += 1
+                    yield product
+                    if max_items and len(seen_ids) >= max_items:
+                        return
+                if not new_products or (max_pages and pages >= max_pages):
+                    return
+                throttle(self.brand_website)
+                with metrics.span('next_page'):
+                    start = self.next_page()
+                if start is None:
+                    return
+        finally:
+            waits.finish_stats(f"{self.brand_label} search for {product_type}")
+            logging.info(f"Search completed for product type: {product_type} on {self.brand_website} "
+                         f"({len(seen_ids)} products over {pages} pages)")
+
+    def search(self, product_type, max_pages=1, max_items=None):
+        """Search for a product type and return the product links found (first page by default)."""
+        return list(self.iter_search(product_type, max_pages, max_items))
@@ -0,0 +1,115 @@
+import logging
+import threading
+from urllib.parse import urljoin, urlencode
+import requests
+from bs4 import BeautifulSoup
+
+from brand_modules import metrics
+from brand_modules.scheduling import throttle
+from shared.fetcher import get_http_session
+
+# Search forms found on each homepage, and brands whose static fetch came back empty
+_search_forms = {}
+_selenium_only_brands = set()
+_lock = threading.Lock()
+
+def fetch_html(url, timeout=10):
+    """Fetch a page over HTTP; return (html, final_url) or (None, url) on failure."""
+    throttle(url)
+    try:
+        with metrics.span('http_fetch'):
+            response = get_http_session().get(url, timeout=timeout)
+            response.raise_for_status()
+        return response.text, response.url
+    except requests.RequestException as e:
+        metrics.count('http_errors')
+        logging.warning(f"Static fetch of {url} failed: {e}")
+        return None, url
+
+def parse_html(html):
+    """Parse HTML with the lxml parser."""
+    return BeautifulSoup(html, 'lxml')
+
+def find_search_form(soup, base_url, search_input_selector):
+    """
+    Find the GET form around the search box of a page.
+
+    Returns (action_url, query_field, hidden_fields) or None when the search box is missing
+    or is not submitted with a plain GET form (e.g. a JavaScript-only search).
+    """
+    search_input = soup.select_one(search_input_selector)
+    if search_input is None or not search_input.get('name'):
+        return None
+    form = search_input.find_parent('form')
+    if form is None or form.get('method', 'get').lower() != 'get':
+        return None
+
+    hidden_fields = {}
+    for hidden in form.select('input[type="hidden"][name]'):
+        hidden_fields[hidden['name']] = hidden.get('value', '')
+    action_url = urljoin(base_url, form.get('action') or base_url)
+    return action_url, search_input['name'], hidden_fields
+
+def get_search_form(brand_website, search_input_selector):
+    """Return the search form of a brand's homepage, fetching the homepage only once."""
+    with _lock:
+        if brand_website in _search_forms:
+            return _search_forms[brand_website]
+
+    html, final_url = fetch_html(brand_website)
+    search_form = None
+    if html is not None:
+        search_form = find_search_form(parse_html(html), final_url, search_input_selector)
+
+    with _lock:
+        _search_forms[brand_website] = search_form
+    return search_form
+
+def uses_selenium_only(brand_label):
+    with _lock:
+        return brand_label in _selenium_only_brands
+
+def switch_to_selenium(brand_label):
+    """Stop trying the HTTP fast path for a brand for the rest of the run."""
+    with _lock:
+        _selenium_only_brands.add(brand_label)
+
+def iter_search(brand_label, brand_website, product_type, search_input_selector, parse_item_links,
+                max_pages=None):
+    """
+    Search a brand website with plain HTTP requests and yield the product links page by page.
+
+    The homepage search form is submitted directly and each results page is parsed with
+    `parse_item_links(soup, base_url)`; rel="next" links are followed up to `max_pages`.
+    Yields a single empty page when the static path finds nothing, in which case the
+    caller should use the Selenium path instead.
+    """
+    search_form = get_search_form(brand_website, search_input_selector)
+    if search_form is None:
+        logging.info(f"No static search form found on {brand_website}.")
+        yield []
+        return
+
+    action_url, query_field, hidden_fields = search_form
+    params = dict(hidden_fields)
+    params[query_field] = product_type
+    separator = '&' if '?' in action_url else '?'
+    page_url = f"{action_url}{separator}{urlencode(params)}"
+
+    pages = 0
+    while page_url:
+        html, final_url = fetch_html(page_url)
+        if html is None:
+            yield []
+            return
+        pages += 1
+        with metrics.span('http_parse'):
+            soup = parse_html(html)
+            links = parse_item_links(soup, final_url)
+        logging.info(f"Static fetch found {len(links)} {brand_label} items for {product_type} on page {pages}.")
+        yield links
+
+        next_link = soup.select_one('link[rel="next"][href], a[rel="next"][href]')
+        if not links or next_link is None or (max_pages and pages >= max_pages):
+            return
+        page_url = urljoin(final_url, next_link['href'])
@@ -0,0 +1,23 @@
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+# Leading path segments that only select a country/language, e.g. /pt/pt/, /en-gb/, /PT/
+LOCALE_SEGMENT = re.compile(r'^[a-z]{2}([-_][a-z]{2})?$', re.IGNORECASE)
+
+def clean_url(href):
+    """Drop the query string, fragment and trailing slash of a URL and lowercase its host."""
+    parts = urlsplit(href.strip())
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, '', ''))
+
+def canonical_path_segments(href):
+    """Return the path segments of a cleaned URL without its leading locale segments."""
+    segments = [segment for segment in urlsplit(clean_url(href)).path.split('/') if segment]
+    while len(segments) > 1 and LOCALE_SEGMENT.match(segments[0]):
+        segments.pop(0)
+    return segments
+
+def product_id_from_url(href):
+    """Return the product ID of a product URL: the last segment of its canonical path."""
+    segments = canonical_path_segments(href)
+    return segments[-1] if segments else ''
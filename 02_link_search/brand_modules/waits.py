@@ -0,0 +1,129 @@
+import time
+import random
+import logging
+import threading
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+from brand_modules import metrics
+
+class WaitStats:
+    """Time spent waiting on page conditions and on pacing, versus doing actual work."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.waiting = 0.0
+        self.pacing = 0.0
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "elapsed": elapsed,
+            "waiting": self.waiting,
+            "pacing": self.pacing,
+            "working": max(0.0, elapsed - self.waiting - self.pacing),
+        }
+
+# Each search runs on one thread, so stats are kept per thread
+_local = threading.local()
+_totals_lock = threading.Lock()
+_run_totals = {"searches": 0, "elapsed": 0.0, "waiting": 0.0, "pacing": 0.0, "working": 0.0}
+
+def start_stats():
+    """Start measuring a new search on the current thread."""
+    _local.stats = WaitStats()
+    return _local.stats
+
+def current_stats():
+    stats = getattr(_local, 'stats', None)
+    return stats if stats is not None else start_stats()
+
+def finish_stats(label):
+    """Log the waiting/working split of the current search and add it to the run totals."""
+    summary = current_stats().summary()
+    with _totals_lock:
+        _run_totals["searches"] += 1
+        for key in ("elapsed", "waiting", "pacing", "working"):
+            _run_totals[key] += summary[key]
+    logging.info(f"{label}: {summary['elapsed']:.1f}s total, {summary['waiting']:.1f}s waiting on page, "
+                 f"{summary['pacing']:.1f}s pacing, {summary['working']:.1f}s working.")
+    return summary
+
+def run_totals():
+    """Return the waiting/working totals accumulated over all searches of this run."""
+    with _totals_lock:
+        return dict(_run_totals)
+
+def wait_until(driver, condition, timeout=10):
+    """Wait for an expected condition and return its value; raises TimeoutException."""
+    started = time.perf_counter()
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.2).until(condition)
+    except TimeoutException:
+        metrics.count('timeouts')
+        raise
+    finally:
+        current_stats().waiting += time.perf_counter() - started
+
+def wait_optional(driver, condition, timeout=5):
+    """Wait for an expected condition, returning None instead of raising when it never holds."""
+    try:
+        return wait_until(driver, condition, timeout)
+    except TimeoutException:
+        return None
+
+class results_stable:
+    """
+    Expected condition: the elements matching `locator` exist and their count has not changed
+    for `settle_time` seconds. Returns the list of elements once stable.
+    """
+
+    def __init__(self, locator, settle_time=0.5, min_count=1):
+        self.locator = locator
+        self.settle_time = settle_time
+        self.min_count = min_count
+        self._last_count = None
+        self._changed_at = None
+
+    def __call__(self, driver):
+        elements = driver.find_elements(*self.locator)
+        now = time.monotonic()
+        if len(elements) != self._last_count:
+            self._last_count = len(elements)
+            self._changed_at = now
+            return False
+        if len(elements) >= self.min_count and now - self._changed_at >= self.settle_time:
+            return elements
+        return False
+
+class PolitenessBudget:
+    """
+    Per-domain rate budget for human-like pacing.
+
+    Consecutive actions on the same domain are kept at least `min_interval` (plus random
+    jitter) apart; time already spent loading or waiting counts towards the interval, so
+    pacing only sleeps for whatever is left.
+    """
+
+    def __init__(self, min_interval=0.4, jitter=0.4):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    def pace(self, domain):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed.get(domain, now))
+            self._next_allowed[domain] = slot + self.min_interval + random.uniform(0, self.jitter)
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+            current_stats().pacing += delay
+
+# Shared by all brand modules so parallel workers on the same site share one budget
+politeness = PolitenessBudget()
+
+def pace(domain):
+    """Wait for the politeness budget of `domain` before interacting with the page."""
+    politeness.pace(domain)
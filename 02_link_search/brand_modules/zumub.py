@@ -1,23 +1,30 @@
-import time
-import random
 import logging
+from urllib.parse import urljoin
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
-def random_sleep(min_time=0.1, max_time=0.8):
-    """Sleep for a random duration to mimic human behavior."""
-    time.sleep(random.uniform(min_time, max_time))
+from brand_modules import waits
+from brand_modules import metrics
+from brand_modules.extraction import extract_with_script, log_product
+from brand_modules.pagination import load_more_by_scrolling
+from brand_modules.session import BrandSession
+from brand_modules.urls import clean_url, product_id_from_url
+
+# Key of the politeness budget shared by every Zumub search
+DOMAIN = 'zumub.com'
+
+# The registration pop-up is shown with a delay of several seconds after the page loads
+POPUP_TIMEOUT = 15
 
 def accept_cookies(driver):
     """Accept cookies on the website."""
     try:
-        cookies_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, 'CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll'))
+        cookies_button = waits.wait_until(
+            driver, EC.element_to_be_clickable((By.ID, 'CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll')), 10
         )
-        random_sleep()
+        waits.pace(DOMAIN)
         cookies_button.click()
         logging.info("Cookies accepted successfully.")
     except (NoSuchElementException, TimeoutException):
@@ -28,10 +35,11 @@ def accept_cookies(driver):
 def close_registration_popup(driver):
     """Close the registration pop-up if it appears."""
     try:
-        close_button = WebDriverWait(driver, 5).until(
-            EC.element_to_be_clickable((By.CLASS_NAME, 'register-popup-close-cross'))
+        # Returns as soon as the pop-up shows up instead of always sleeping for its delay
+        close_button = waits.wait_until(
+            driver, EC.element_to_be_clickable((By.CLASS_NAME, 'register-popup-close-cross')), POPUP_TIMEOUT
         )
-        random_sleep()
+        waits.pace(DOMAIN)
         close_button.click()
         logging.info("Registration pop-up closed successfully.")
     except (NoSuchElementException, TimeoutException):
@@ -39,79 +47,121 @@ def close_registration_popup(driver):
     except Exception as e:
         logging.error("Error closing registration pop-up: " + str(e))
 
-def perform_search(driver, search_query):
-    """Perform a search for the given query on Zumub website."""
-    random_sleep()
+def perform_search(driver, search_query, timeout=10):
+    """Perform a search for the given query on Zumub website; return whether it was submitted."""
     try:
         # Locate the search input using its class name
-        search_box = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.CLASS_NAME, 'search-form'))
+        search_box = waits.wait_until(
+            driver, EC.element_to_be_clickable((By.CLASS_NAME, 'search-form')), timeout
         )
-        random_sleep()
         search_input = search_box.find_element(By.CLASS_NAME, 'txt_searchbox')
+        waits.pace(DOMAIN)
         search_input.click()
-        random_sleep()
         search_input.clear()
         search_input.send_keys(search_query)
         search_input.send_keys(Keys.RETURN)
         logging.info(f"Search performed successfully for query: {search_query}")
+        return True
     except Exception as e:
         logging.error("Search Error: " + str(e))
+        return False
+
+# Result items on the search results page
+ITEM_LOCATOR = (By.CSS_SELECTOR, '.list-product-75 .product-detail')
+
+# Returns {link, name} for every result item from index arguments[0] on, in a single WebDriver round trip
+EXTRACT_SCRIPT = """
+return Array.from(document.querySelectorAll('.list-product-75 .product-detail')).slice(arguments[0] || 0).map(function (item) {
+    var link = item.querySelector('a');
+    var name = item.querySelector('p');
+    return {link: link ? link.href : null, name: name ? name.innerText : null};
+});
+"""
+
+def product_id_from_link(href):
+    """Extract the unique part of a product link, ignoring query strings, locale and trailing slash."""
+    return product_id_from_url(href)
 
-def extract_item_links(driver):
-    """Extract item links from the search results on Zumub."""
-    random_sleep()
+def extract_links_from_items(items):
+    """Extract item links element by element (one WebDriver round trip per lookup)."""
     links = []
-    logging.info("Starting link extraction")
+    for item in items:
+        try:
+            # Find the link element within the product item
+            link_element = item.find_element(By.CSS_SELECTOR, '.product-detail a')
+            href = link_element.get_attribute('href')
+            product_name = item.find_element(By.CSS_SELECTOR, '.product-detail p').text  # Extracting product name
+            links.append({"id": product_id_from_link(href), "link": clean_url(href), "name": product_name})
+            log_product(product_name, href)
 
-    try:
-        # Locate the product listing container
-        product_listing = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, 'list-product-75'))
-        )
+        except NoSuchElementException:
+            logging.warning("Link element not found in item.")
+        except Exception as e:
+            logging.error(f"Error processing item: {str(e)}")
+    return links
+
+def parse_item_links(soup, base_url):
+    """Extract item links from a search results page fetched over plain HTTP."""
+    links = []
+    for item in soup.select('.list-product-75 .product-detail'):
+        link_element = item.select_one('a[href]')
+        if link_element is None:
+            continue
+        href = urljoin(base_url, link_element['href'])
+        name_element = item.select_one('p')
+        product_name = name_element.get_text(strip=True) if name_element else None  # Extracting product name
+        links.append({"id": product_id_from_link(href), "link": clean_url(href), "name": product_name})
+        log_product(product_name, href)
+    return links
 
-        # Find all product items within the listing
-        items = product_listing.find_elements(By.CSS_SELECTOR, '.product-detail')
+def extract_item_links(driver, start=0):
+    """Extract item links from the search results on Zumub, starting at item index `start`."""
+    links = []
+    logging.info("Starting link extraction")
 
+    try:
+        # Wait until the product items have rendered and their count has settled
+        items = waits.wait_until(driver, waits.results_stable(ITEM_LOCATOR), 10)
         logging.info(f"Found {len(items)} items on the page.")
 
-        for item in items:
-            try:
-                # Find the link element within the product item
-                link_element = item.find_element(By.CSS_SELECTOR, '.product-detail a')
-                href = link_element.get_attribute('href')
-                product_id = href.split("/")[-1]  # Extract the unique part of the link
-                
-                links.append({"id": product_id, "link": href})
-
-                # Improved logging for each product
-                product_name = item.find_element(By.CSS_SELECTOR, '.product-detail p').text  # Extracting product name
-                logging.info(f"Product found: {product_name}, Link: {href}")
-                print(f"Detected product: {product_name}, Link: {href}")  # Print each detected product for immediate feedback
-
-            except NoSuchElementException:
-                logging.warning("Link element not found in item.")
-            except Exception as e:
-                logging.error(f"Error processing item: {str(e)}")
+        # Read every item in one in-page script, falling back to per-element lookups
+        links = extract_with_script(driver, EXTRACT_SCRIPT, product_id_from_link, start)
+        if links is None:
+            links = extract_links_from_items(items[start:])
 
     except TimeoutException:
+        # Results that never render (throttling, a blocked page) have to reach the retries and the circuit breaker
         logging.error("Timeout while waiting for items to load.")
+        raise
     except Exception as e:
         logging.error("Links Error: " + str(e))
 
     return links
 
+class ZumubSession(BrandSession):
+    """Warm browser session on the Zumub website."""
+
+    brand_label = 'Zumub'
+    item_locator = ITEM_LOCATOR
+    search_input_selector = '.search-form .txt_searchbox'
+    parse_item_links = staticmethod(parse_item_links)
+
+    def prepare(self):
+        with metrics.span('cookies'):
+            accept_cookies(self.driver)  # Accept cookies if necessary
+        with metrics.span('popup'):
+            close_registration_popup(self.driver)  # Close the registration pop-up if it appears
+
+    def submit_search(self, product_type, timeout=10):
+        return perform_search(self.driver, product_type, timeout)
+
+    def extract(self, start=0):
+        return extract_item_links(self.driver, start)
+
+    def next_page(self):
+        # Zumub loads further results as the listing is scrolled
+        return load_more_by_scrolling(self.driver, ITEM_LOCATOR, DOMAIN)
 
 def search_zumub(driver, brand_website, product_type):
     """Function to search for a product type on Zumub website."""
-    logging.info(f"Starting search on {brand_website} for product type: {product_type}")
-    driver.get(brand_website)
-    random_sleep()  # Let the page load
-    accept_cookies(driver)  # Accept cookies if necessary
-    time.sleep(10)
-    close_registration_popup(driver)  # Close the registration pop-up if it appears
-    random_sleep()
-    perform_search(driver, product_type)  # Perform the search
-    product_links = extract_item_links(driver)  # Extract product links
-    logging.info(f"Search completed for product type: {product_type} on {brand_website}")
-    return product_links
+    return ZumubSession(driver, brand_website).search(product_type)
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service as ChromeService
+
+# Where the resolved chromedriver path is remembered between runs
+DRIVER_CACHE_PATH = os.getenv('CHROMEDRIVER_CACHE_PATH', '.chromedriver_cache.json')
+
+# Cached paths older than this are re-checked with webdriver-manager (unless offline)
+DRIVER_CACHE_MAX_AGE = 7 * 24 * 3600
+
+# Explicit driver settings; `configure_driver` overrides the environment defaults
+_driver_settings = {
+    "path": os.getenv('CHROMEDRIVER_PATH'),
+    "offline": os.getenv('CHROMEDRIVER_OFFLINE', '').lower() in ('1', 'true', 'yes'),
+}
+_resolved_path = None
+_resolve_lock = threading.Lock()
+
+def configure_driver(path=None, offline=None):
+    """Use a local chromedriver binary and/or never contact the network to resolve one."""
+    global _resolved_path
+    with _resolve_lock:
+        if path is not None:
+            _driver_settings["path"] = path
+        if offline is not None:
+            _driver_settings["offline"] = offline
+        _resolved_path = None
+
+def read_driver_cache(cache_path=DRIVER_CACHE_PATH):
+    """Return (path, resolved_at) of the cached chromedriver, or (None, 0) when missing or stale."""
+    try:
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None, 0
+    path = cached.get('path')
+    if not path or not os.path.exists(path):
+        return None, 0
+    return path, cached.get('resolved_at', 0)
+
+def write_driver_cache(path, cache_path=DRIVER_CACHE_PATH):
+    try:
+        with open(cache_path, 'w') as f:
+            json.dump({"path": path, "resolved_at": time.time()}, f)
+    except OSError as e:
+        logging.warning(f"Could not write the chromedriver cache {cache_path}: {e}")
+
+def resolve_chromedriver():
+    """
+    Return the path of the chromedriver binary, resolving it at most once per process.
+
+    Resolution order: an explicit path (CHROMEDRIVER_PATH or `configure_driver`), a fresh
+    entry of the local driver cache, then webdriver-manager (a network version check). In
+    offline mode webdriver-manager is never called; a stale cache entry or a chromedriver
+    on the PATH is used instead.
+    """
+    global _resolved_path
+    with _resolve_lock:
+        if _resolved_path is not None:
+            return _resolved_path
+
+        path = _driver_settings["path"]
+        if path:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"chromedriver not found at {path}")
+            _resolved_path = path
+            return path
+
+        cached_path, resolved_at = read_driver_cache()
+        offline = _driver_settings["offline"]
+        if cached_path and (offline or time.time() - resolved_at < DRIVER_CACHE_MAX_AGE):
+            logging.info(f"Using cached chromedriver {cached_path}")
+            _resolved_path = cached_path
+            return cached_path
+
+        if offline:
+            path = shutil.which('chromedriver')
+            if path is None:
+                raise RuntimeError("Offline mode: set CHROMEDRIVER_PATH to a local chromedriver binary.")
+        else:
+            # Imported here so offline runs never load webdriver-manager
+            from webdriver_manager.chrome import ChromeDriverManager
+            path = ChromeDriverManager().install()
+            write_driver_cache(path)
+        logging.info(f"Resolved chromedriver {path}")
+        _resolved_path = path
+        return path
+
+def init_webdriver(browser='chrome', width=1920, height=1080, headless=False, page_load_strategy=None):
+    """
+    Initialize WebDriver with the option to set resolution and headless mode.
+
+    `page_load_strategy='eager'` makes navigation return once the DOM is ready, without
+    waiting for images, stylesheets and other subresources.
+    """
+    if browser == 'chrome':
+        options = webdriver.ChromeOptions()
+        options.add_argument("--no-sandbox")
+        options.add_argument("--incognito")  # Open Chrome in incognito mode
+        options.add_argument(f"--window-size={width},{height}")  # Set screen resolution
+
+        if headless:
+            options.add_argument("--headless")  # Open Chrome in headless mode
+        if page_load_strategy:
+            options.page_load_strategy = page_load_strategy
+
+        driver = webdriver.Chrome(service=ChromeService(resolve_chromedriver()), options=options)
+    else:
+        raise ValueError("Unsupported browser. Use 'chrome'.")
+
+    return driver
@@ -0,0 +1,113 @@
+import logging
+import psutil
+from selenium.webdriver.remote.command import Command
+from selenium.common.exceptions import WebDriverException
+
+from brand_modules.metrics import metrics as run_metrics, RUN_BRAND
+
+class DriverManager:
+    """
+    Owns the WebDriver of one worker and replaces it when it gets too old, too big or dies.
+
+    Chrome is started on first use. `check()` is meant to be called between searches: it
+    recycles the driver after `max_navigations` navigations (page loads plus searches) or
+    once the browser process tree uses more than `max_rss_mb` MB. `recover()` restarts a
+    driver that crashed. Both return True when a new driver has to be used, so callers can
+    drop whatever was bound to the old one.
+    """
+
+    def __init__(self, factory, max_navigations=150, max_rss_mb=1500):
+        self.factory = factory
+        self.max_navigations = max_navigations
+        self.max_rss_mb = max_rss_mb
+        self.driver = None
+        self.navigations = 0
+        self.recycles = {"navigations": 0, "memory": 0, "crash": 0}
+        self.peak_rss_mb = 0.0
+
+    def get(self):
+        """Return the current driver, starting Chrome when there is none."""
+        if self.driver is None:
+            with run_metrics.span('driver_init', brand=RUN_BRAND):
+                self.driver = self.factory()
+            self.navigations = 0
+            self._count_page_loads(self.driver)
+        return self.driver
+
+    def _count_page_loads(self, driver):
+        execute = driver.execute
+
+        def counting_execute(driver_command, params=None):
+            if driver_command == Command.GET:
+                self.navigations += 1
+            return execute(driver_command, params)
+
+        driver.execute = counting_execute
+
+    def note_navigation(self, count=1):
+        """Count navigations the driver cannot see as page loads, e.g. a submitted search form."""
+        self.navigations += count
+
+    def rss_mb(self):
+        """Return the resident memory of chromedriver and all the browser processes it started, in MB."""
+        process = getattr(getattr(self.driver, 'service', None), 'process', None)
+        if process is None:
+            return None
+        try:
+            root = psutil.Process(process.pid)
+            rss = root.memory_info().rss
+            for child in root.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    continue
+        except psutil.Error:
+            return None
+        return rss / (1024 * 1024)
+
+    def is_alive(self):
+        if self.driver is None:
+            return True
+        try:
+            self.driver.current_window_handle
+            return True
+        except WebDriverException:
+            return False
+
+    def check(self):
+        """Recycle the driver if it reached its navigation or memory budget; True when it was recycled."""
+        if self.driver is None:
+            return False
+        rss = self.rss_mb()
+        if rss is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb, rss)
+            run_metrics.observe('browser_rss_mb', rss, RUN_BRAND)
+        if self.max_navigations and self.navigations >= self.max_navigations:
+            self.restart('navigations', f"{self.navigations} navigations")
+            return True
+        if self.max_rss_mb and rss is not None and rss >= self.max_rss_mb:
+            self.restart('memory', f"{rss:.0f} MB resident")
+            return True
+        return False
+
+    def recover(self):
+        """Restart the driver if it is no longer responding; True when it was restarted."""
+        if self.is_alive():
+            return False
+        self.restart('crash', "the browser stopped responding")
+        return True
+
+    def restart(self, reason, detail):
+        logging.warning(f"Recycling the WebDriver after {detail}.")
+        print(f"Recycling the WebDriver after {detail}.")
+        self.recycles[reason] += 1
+        run_metrics.count('driver_recycles', 1, RUN_BRAND, reason=reason)
+        self.close()
+
+    def close(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except WebDriverException as e:
+                logging.warning(f"Error while closing the WebDriver: {e}")
+            self.driver = None
@@ -0,0 +1,268 @@
+import json
+import time
+import logging
+import sqlite3
+import threading
+
+from brand_modules.metrics import metrics as run_metrics, RUN_BRAND
+from shared.firestore_batch import BATCH_LIMIT, commit_in_batches
+
+# Default location of the outbox, next to search_log.log
+DEFAULT_OUTBOX_PATH = 'firestore_outbox.db'
+
+# HTTP statuses of Firestore errors that are about the service (quota, contention, outages),
+# not about the writes themselves
+TRANSIENT_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+def is_transient(error):
+    """Tell whether a failed commit is worth retrying as is, rather than a problem with one of its writes."""
+    return isinstance(error, (ConnectionError, TimeoutError)) or getattr(error, 'code', None) in TRANSIENT_CODES
+
+def coalesce(pending, operation, data):
+    """
+    Combine a pending write of a document with a newer one into a single write.
+
+    A set or delete replaces whatever was pending; an update is merged into a pending set
+    or update, so only the final state of the document is sent.
+    """
+    if pending is None or operation in ('set', 'delete'):
+        return operation, data
+    pending_operation, pending_data = pending
+    if pending_operation == 'delete':
+        return operation, data
+    return pending_operation, dict(pending_data, **data)
+
+class FirestoreOutbox:
+    """
+    Durable local write-behind queue for Firestore writes.
+
+    Writes are stored in SQLite, one row per document path, so repeated writes to the same
+    document are coalesced before they reach Firestore. A background flusher commits due
+    rows in bulk batches and retries failed batches with exponential backoff; rows survive
+    crashes and are flushed by the next run. A batch rejected because of one of its writes is
+    split until the failing writes are isolated, so they do not hold back the others; a write
+    still rejected after `max_attempts` attempts is moved to the dead_letters table. The
+    outbox also keeps a local mirror of every document it wrote (or was told about), which
+    can answer existence and field lookups without a Firestore read.
+    """
+
+    def __init__(self, path=DEFAULT_OUTBOX_PATH, base_delay=2.0, max_delay=300.0, max_attempts=5):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        with self._lock, self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    path TEXT PRIMARY KEY,
+                    operation TEXT NOT NULL,
+                    data TEXT,
+                    version INTEGER NOT NULL DEFAULT 1,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at REAL NOT NULL,
+                    next_attempt REAL NOT NULL,
+                    last_error TEXT
+                );
+                CREATE TABLE IF NOT EXISTS mirror (
+                    path TEXT PRIMARY KEY,
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    path TEXT NOT NULL,
+                    operation TEXT NOT NULL,
+                    data TEXT,
+                    attempts INTEGER NOT NULL,
+                    last_error TEXT,
+                    failed_at REAL NOT NULL
+                );
+            """)
+
+    def enqueue(self, writes):
+        """
+        Queue (operation, doc_ref, data) writes, as accepted by commit_in_batches.
+
+        Returns the number of writes that were coalesced into an already pending write. A
+        rewritten write is due at once and starts over its attempts.
+        """
+        coalesced = 0
+        now = time.time()
+        with self._lock, self._connection:
+            for operation, doc_ref, data in writes:
+                row = self._connection.execute(
+                    "SELECT operation, data FROM outbox WHERE path = ?", (doc_ref.path,)
+                ).fetchone()
+                pending = (row[0], json.loads(row[1]) if row[1] else None) if row else None
+                operation, data = coalesce(pending, operation, data)
+                if row is not None:
+                    coalesced += 1
+                self._connection.execute("""
+                    INSERT INTO outbox (path, operation, data, enqueued_at, next_attempt) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (path) DO UPDATE SET
+                        operation = excluded.operation, data = excluded.data, version = version + 1,
+                        attempts = 0, next_attempt = excluded.next_attempt, last_error = NULL
+                """, (doc_ref.path, operation, json.dumps(data) if data is not None else None, now, now))
+                self._mirror_write(doc_ref.path, operation, data)
+        if coalesced:
+            run_metrics.count('outbox_coalesced', coalesced, RUN_BRAND)
+        self._wakeup.set()
+        return coalesced
+
+    def _mirror_write(self, path, operation, data):
+        if operation == 'delete':
+            self._connection.execute("DELETE FROM mirror WHERE path = ?", (path,))
+            return
+        row = self._connection.execute("SELECT data FROM mirror WHERE path = ?", (path,)).fetchone()
+        if operation == 'update' and row is not None:
+            data = dict(json.loads(row[0]), **data)
+        self._connection.execute("INSERT OR REPLACE INTO mirror (path, data) VALUES (?, ?)", (path, json.dumps(data)))
+
+    def remember(self, documents):
+        """Add documents read from Firestore, given as {path: data}, to the local mirror."""
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO mirror (path, data) VALUES (?, ?)",
+                                         [(path, json.dumps(data)) for path, data in documents.items()])
+
+    def get_documents(self, doc_refs):
+        """Return {doc_id: data} for the documents the local mirror knows, like get_existing_documents."""
+        existing = {}
+        with self._lock:
+            for doc_ref in doc_refs:
+                row = self._connection.execute("SELECT data FROM mirror WHERE path = ?", (doc_ref.path,)).fetchone()
+                if row is not None:
+                    existing[doc_ref.id] = json.loads(row[0])
+        return existing
+
+    def pending_count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def dead_letter_count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+
+    def flush(self, client, limit=BATCH_LIMIT, force=False):
+        """
+        Commit up to `limit` due writes; returns the number of writes committed.
+
+        The writes go out in one batch. When Firestore rejects it because of its writes, it is
+        split in halves until the failing writes are isolated and the others are committed.
+        Failed writes stay in the outbox and are retried after an exponential backoff
+        (immediately with `force`); a write rejected on its own `max_attempts` times is moved
+        to the dead letters. Failures of the service itself (see is_transient) back off the
+        whole batch and never dead-letter it. Rows rewritten while their batch was in flight
+        are kept for the next flush.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, operation, data, version, attempts FROM outbox WHERE next_attempt <= ? "
+                "ORDER BY enqueued_at LIMIT ?",
+                (float('inf') if force else now, limit)
+            ).fetchall()
+        if not rows:
+            return 0
+
+        with run_metrics.span('outbox_flush', brand=RUN_BRAND, documents=len(rows)):
+            committed, failed = self._commit(client, rows)
+
+        with self._lock, self._connection:
+            self._connection.executemany("DELETE FROM outbox WHERE path = ? AND version = ?",
+                                         [(path, version) for path, _, _, version, _ in committed])
+            dead = 0
+            for (path, operation, data, version, attempts), error in failed:
+                if attempts + 1 >= self.max_attempts and not is_transient(error):
+                    self._dead_letter(path, operation, data, version, attempts + 1, error)
+                    dead += 1
+                    continue
+                self._connection.execute("""
+                    UPDATE outbox SET attempts = attempts + 1, last_error = ?,
+                        next_attempt = ? + MIN(?, ? * (1 << MIN(attempts, 16)))
+                    WHERE path = ? AND version = ?
+                """, (str(error), time.time(), self.max_delay, self.base_delay, path, version))
+        retried = len(failed) - dead
+        if retried:
+            run_metrics.count('outbox_retries', retried, RUN_BRAND)
+            logging.warning(f"Outbox flush of {retried} of {len(rows)} writes failed, will retry: {failed[-1][1]}")
+        if dead:
+            run_metrics.count('outbox_dead_letters', dead, RUN_BRAND)
+        return len(committed)
+
+    def _commit(self, client, rows):
+        """Commit rows in one batch, splitting it on failure; returns (committed rows, [(row, error)])."""
+        writes = [(operation, client.document(path), json.loads(data) if data else None)
+                  for path, operation, data, _, _ in rows]
+        try:
+            commit_in_batches(client, writes)
+            return rows, []
+        except Exception as e:
+            if len(rows) == 1 or is_transient(e):
+                return [], [(row, e) for row in rows]
+        middle = len(rows) // 2
+        first_committed, first_failed = self._commit(client, rows[:middle])
+        second_committed, second_failed = self._commit(client, rows[middle:])
+        return first_committed + second_committed, first_failed + second_failed
+
+    def _dead_letter(self, path, operation, data, version, attempts, error):
+        """Move a write that keeps failing out of the outbox; called with the lock held."""
+        self._connection.execute(
+            "INSERT INTO dead_letters (path, operation, data, attempts, last_error, failed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, operation, data, attempts, str(error), time.time())
+        )
+        cursor = self._connection.execute("DELETE FROM outbox WHERE path = ? AND version = ?", (path, version))
+        if cursor.rowcount:
+            # The mirror assumed the write would land, so the next lookup goes back to Firestore
+            self._connection.execute("DELETE FROM mirror WHERE path = ?", (path,))
+        logging.error(f"Gave up on the {operation} of {path} after {attempts} attempts, moved to the dead letters: {error}")
+        print(f"Gave up on the {operation} of {path} after {attempts} attempts, moved to the dead letters: {error}")
+
+    def start(self, client_factory, interval=2.0):
+        """Start the background flusher, which flushes due writes every `interval` seconds or when woken."""
+        def run():
+            try:
+                client = client_factory()
+            except Exception as e:
+                logging.error(f"Outbox flusher could not connect to Firestore, writes stay queued: {e}")
+                return
+            while not self._stopping.is_set():
+                self._wakeup.wait(interval)
+                self._wakeup.clear()
+                while not self._stopping.is_set() and self.flush(client):
+                    pass
+
+        self._stopping.clear()
+        self._thread = threading.Thread(target=run, name='firestore-outbox', daemon=True)
+        self._thread.start()
+
+    def stop(self, client=None, timeout=60.0):
+        """
+        Stop the flusher and try to drain the outbox within `timeout` seconds.
+
+        Writes that could not be flushed stay queued for the next run. Returns the number of
+        writes still pending.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        if client is not None:
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline and self.flush(client, force=True):
+                pass
+        dead_letters = self.dead_letter_count()
+        if dead_letters:
+            logging.warning(f"{dead_letters} Firestore writes are in the outbox dead letters.")
+            print(f"{dead_letters} Firestore writes are in the outbox dead letters.")
+        pending = self.pending_count()
+        if pending:
+            logging.warning(f"{pending} Firestore writes are still queued in the outbox for the next run.")
+            print(f"{pending} Firestore writes are still queued in the outbox for the next run.")
+        return pending
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
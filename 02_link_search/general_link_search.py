@@ -1,107 +1,818 @@
-import os
 import time
+# Taken before the other imports so --profile-startup can report the import time
+STARTED = time.perf_counter()
+
+import os
+import sys
+import asyncio
 import logging
-import firebase_admin
-from firebase_admin import credentials, firestore
-from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
+import argparse
+import threading
 from datetime import datetime
 
-# Import brand-specific search functions
-from brand_modules.prozis import search_prozis
-from brand_modules.myprotein import search_myprotein
-from brand_modules.zumub import search_zumub
+# Modules shared by every stage live in ../shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import brand-specific search sessions
+from brand_modules.registry import session_classes
+from brand_modules import waits
+from brand_modules.metrics import metrics as run_metrics, log_summary, RUN_BRAND
+from brand_modules.request_blocking import blocked_url_patterns
+from brand_modules.scheduling import SearchScheduler, RetryPolicy, CircuitOpenError, rate_limiter
+
+from browser import init_webdriver, configure_driver, resolve_chromedriver
+from driver_manager import DriverManager
+from shared.firestore_client import get_db
+from shared.firestore_batch import get_existing_documents, commit_in_batches
+from firestore_outbox import FirestoreOutbox, DEFAULT_OUTBOX_PATH
+from link_index import LinkIndex, DEFAULT_INDEX_PATH
+from product_index import ProductIndex
+from relevance import RelevanceScorer
+from job_journal import JobJournal, DEFAULT_JOURNAL_PATH
+from search_jobs import SearchJob, build_jobs
+from sharding import ShardCoordinator, SQLiteLeaseBackend, FirestoreLeaseBackend, DEFAULT_LEASE_PATH, shard_of
+from worker_pool import run_worker_pool
+from async_pipeline import run_async_pipeline
 
 # Setup logging
 logging.basicConfig(filename='search_log.log', level=logging.INFO, 
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Load environment variables from .env file
-load_dotenv()
+IMPORTS_DONE = time.perf_counter()
 
-# Get paths from environment variables
-FIREBASE_CREDENTIALS_PATH = os.getenv('FIREBASE_CREDENTIALS_PATH')
+class SearchWorker:
+    """
+    One WebDriver plus a warm search session for each brand it has visited.
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
-firebase_admin.initialize_app(cred)
+    With `fast_path=True` searches are first tried over plain HTTP, and Chrome is only
+    started once a brand needs the Selenium path. Results are streamed page by page, up to
+    `max_pages` pages or `max_items` products per search. `blocked_urls` maps brand names to
+    the URL patterns Chrome should not load on their websites. With a `scheduler`, failed
+    searches are retried with backoff and brands that keep failing are skipped. Chrome is
+    restarted after `recycle_after` navigations, above `max_browser_mb` MB or after a crash.
+    """
 
-# Initialize Firestore client
-db = firestore.client()
+    def __init__(self, headless=False, fast_path=False, max_pages=None, max_items=None, batch_size=25,
+                 page_load_strategy=None, blocked_urls=None, scheduler=None, recycle_after=150,
+                 max_browser_mb=1500):
+        self.headless = headless
+        self.scheduler = scheduler
+        self.page_load_strategy = page_load_strategy
+        self.blocked_urls = blocked_urls
+        self.fast_path = fast_path
+        self.max_pages = max_pages
+        self.max_items = max_items
+        self.batch_size = batch_size
+        self.driver_manager = DriverManager(self.start_driver, recycle_after, max_browser_mb)
+        self.sessions = {}
+        self.active_session = None
 
-def init_webdriver(browser='chrome', width=1920, height=1080, headless=False):
-    """Initialize WebDriver with the option to set resolution and headless mode."""
-    if browser == 'chrome':
-        options = webdriver.ChromeOptions()
-        options.add_argument("--no-sandbox")
-        options.add_argument("--incognito")  # Open Chrome in incognito mode
-        options.add_argument(f"--window-size={width},{height}")  # Set screen resolution
+    def start_driver(self):
+        return init_webdriver(browser='chrome', headless=self.headless,
+                              page_load_strategy=self.page_load_strategy)
 
-        if headless:
-            options.add_argument("--headless")  # Open Chrome in headless mode
+    def get_driver(self):
+        """Return the worker's WebDriver, starting Chrome on first use."""
+        return self.driver_manager.get()
 
-        driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
-    else:
-        raise ValueError("Unsupported browser. Use 'chrome'.")
+    def drop_sessions(self):
+        """Forget the sessions bound to a recycled driver; they are recreated on the new one."""
+        self.sessions.clear()
+        self.active_session = None
+
+    def session_for(self, brand_name, brand_website):
+        """Return the warm session for a brand, creating it on first use."""
+        session = self.sessions.get(brand_name)
+        if session is None:
+            blocked_urls = self.blocked_urls.get(brand_name, []) if self.blocked_urls is not None else None
+            session = session_classes[brand_name](self.get_driver(), brand_website, blocked_urls)
+            self.sessions[brand_name] = session
+        if self.active_session is not session:
+            # The browser is about to leave the previous brand's website
+            if self.active_session is not None:
+                self.active_session.leave()
+            self.active_session = session
+        return session
+
+    def iter_links(self, job):
+        """
+        Run a single (brand, product_type) search and yield product links as pages are parsed.
+
+        Failed attempts are retried after an exponential backoff with jitter, skipping the
+        products an earlier attempt already yielded. Raises CircuitOpenError without
+        searching when the brand's circuit breaker is open. The breaker counts searches, not
+        attempts: a search only records a failure once all its attempts failed.
+        """
+        if self.scheduler is None:
+            try:
+                yield from self.iter_attempt(job)
+            except Exception:
+                if self.driver_manager.recover():
+                    self.drop_sessions()
+                raise
+            return
+
+        breaker = self.scheduler.breaker_for(job.brand_name)
+        policy = self.scheduler.retry_policy
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit breaker of {job.brand_name} is open, skipping {job.product_type}.")
+        seen_ids = set()
+        for attempt in range(1, policy.attempts + 1):
+            try:
+                for product in self.iter_attempt(job):
+                    if product["id"] not in seen_ids:
+                        seen_ids.add(product["id"])
+                        yield product
+            except Exception as e:
+                if self.driver_manager.recover():
+                    self.drop_sessions()
+                if attempt == policy.attempts:
+                    breaker.record_failure()
+                    raise
+                delay = policy.delay(attempt)
+                run_metrics.count('retries', 1, job.brand_name, product_type=job.product_type)
+                logging.warning(f"Search for {job.product_type} on {job.brand_name} failed (attempt {attempt}): {e}. "
+                                f"Retrying in {delay:.1f}s.")
+                print(f"Search for {job.product_type} on {job.brand_name} failed, retrying in {delay:.1f}s.")
+                # The page may be in any state after a failure, so the retry starts from the homepage
+                if job.brand_name in self.sessions:
+                    self.sessions[job.brand_name].leave()
+                time.sleep(delay)
+            else:
+                breaker.record_success()
+                return
+
+    def iter_attempt(self, job):
+        """Run one attempt of a search, trying the HTTP fast path first when enabled."""
+        logging.info(f"Searching for {job.product_type} on {job.brand_name}...")
+        print(f"Searching for {job.product_type} on {job.brand_name}...")
+        if self.fast_path:
+            session_class = session_classes[job.brand_name]
+            found = False
+            for product in session_class.iter_static_search(job.brand_website, job.product_type,
+                                                            self.max_pages, self.max_items):
+                found = True
+                yield product
+            if found:
+                return
+        if self.driver_manager.check():
+            self.drop_sessions()
+        session = self.session_for(job.brand_name, job.brand_website)
+        # Submitting the search form navigates without a driver.get()
+        self.driver_manager.note_navigation()
+        yield from session.iter_search(job.product_type, self.max_pages, self.max_items)
+
+    def iter_batches(self, job):
+        """
+        Yield the product links of a search in batches of at most `batch_size` links.
+
+        The search is timed as one 'search' span that leaves out the time the caller spends
+        on each batch (e.g. saving it), so it is comparable between streaming and batch runs.
+        """
+        run_metrics.bind_brand(job.brand_name)
+        batch = []
+        items = 0
+        elapsed = 0.0
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            for product in self.iter_links(job):
+                batch.append(product)
+                items += 1
+                if len(batch) >= self.batch_size:
+                    elapsed += time.perf_counter() - started
+                    started = None
+                    yield batch
+                    started = time.perf_counter()
+                    batch = []
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            if started is not None:
+                elapsed += time.perf_counter() - started
+            run_metrics.record_span('search', elapsed, job.brand_name, status, product_type=job.product_type)
+            run_metrics.count('items', items, job.brand_name, product_type=job.product_type)
+        if batch:
+            yield batch
+
+    def run(self, job):
+        """Run a single (brand, product_type) search and return all product links found."""
+        return list(self.iter_links(job))
 
-    return driver
+    def close(self):
+        self.driver_manager.close()
 
-# Dictionary mapping brand ID to corresponding search function
-search_functions = {
-    "Prozis": search_prozis,
-    "MyProtein": search_myprotein,
-    "Zumub": search_zumub,
-}
+def write_documents(client, writes, brand_name, outbox=None):
+    """Commit writes to Firestore in batches, or queue them in the outbox when there is one."""
+    if outbox is not None:
+        with run_metrics.span('outbox_enqueue', brand=brand_name, documents=len(writes)):
+            outbox.enqueue(writes)
+        return
+    with run_metrics.span('firestore_write', brand=brand_name, documents=len(writes)):
+        commit_in_batches(client, writes)
 
 # Function to save or update product links in Firestore
-def save_or_update_product_links_to_firestore(brand_name, product_links):
-    """Saves or updates product links in Firestore under a new collection with today's date and brand name."""
+def save_or_update_product_links_to_firestore(brand_name, product_links, client=None, outbox=None, mirror_reads=False):
+    """
+    Saves or updates product links in Firestore under a new collection with today's date and brand name.
+
+    Existing documents are fetched in one multi-get and compared in memory, and only new or
+    changed links are committed in batches. Products carrying "product_types" (and their
+    "relevance" scores per type) store them on the document, merged with those already
+    recorded there. `client` defaults to the
+    shared Firestore client and can be replaced by an emulator-backed or fake client.
+    With an `outbox` the writes are queued locally and flushed in the background, and with
+    `mirror_reads` the existing documents are looked up in its local mirror instead of Firestore.
+    Returns a dictionary with the number of inserted, updated and unchanged documents.
+    """
+    client = client or get_db()
     today = datetime.now().strftime('%Y-%m-%d')
     collection_name = f"product_links/{today}/{brand_name}"
-    
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    # Keep one document per product ID (the last one found wins)
+    documents = {}
     for product in product_links:
-        product_id = product["id"]
-        product_link = product["link"]
-        
-        # Check if the product document already exists
-        product_doc = db.collection(collection_name).document(product_id).get()
-
-        if product_doc.exists:
-            # Check if the existing link is different from the current one
-            existing_link = product_doc.to_dict().get('link')
-            if existing_link != product_link:
-                # Update the product link if it's different
-                db.collection(collection_name).document(product_id).update({
-                    "link": product_link
-                })
-                logging.info(f"Updated product link for ID {product_id}: {product_link}")
-                print(f"Updated product link for ID {product_id}: {product_link}")
+        documents[product["id"]] = {"link": product["link"]}
+        if "product_types" in product:
+            documents[product["id"]]["product_types"] = list(product["product_types"])
+        if "relevance" in product:
+            documents[product["id"]]["relevance"] = dict(product["relevance"])
+
+    if not documents:
+        return counts
+
+    collection_ref = client.collection(collection_name)
+    doc_refs = {product_id: collection_ref.document(product_id) for product_id in documents}
+    if outbox is not None and mirror_reads:
+        with run_metrics.span('mirror_read', brand=brand_name, documents=len(doc_refs)):
+            existing_docs = outbox.get_documents(list(doc_refs.values()))
+    else:
+        with run_metrics.span('firestore_read', brand=brand_name, documents=len(doc_refs)):
+            existing_docs = get_existing_documents(client, list(doc_refs.values()))
+        if outbox is not None:
+            outbox.remember({doc_refs[product_id].path: data for product_id, data in existing_docs.items()})
+
+    writes = []
+    for product_id, data in documents.items():
+        if product_id in existing_docs:
+            existing = existing_docs[product_id]
+            if "product_types" in data:
+                data["product_types"] = sorted(set(existing.get('product_types') or []) | set(data["product_types"]))
+            if "relevance" in data:
+                data["relevance"] = dict(existing.get('relevance') or {}, **data["relevance"])
+            # Check if the existing link (or product types) differ from the current ones
+            changed = {field: value for field, value in data.items() if existing.get(field) != value}
+            if changed:
+                writes.append(('update', doc_refs[product_id], changed))
+                counts["updated"] += 1
+                logging.info(f"Updated product {product_id}: {changed}")
             else:
+                counts["unchanged"] += 1
                 logging.info(f"Product {product_id} already exists with the same link. No update needed.")
-                print(f"Product {product_id} already exists with the same link. No update needed.")
         else:
             # Add new product if it doesn't exist
-            db.collection(collection_name).document(product_id).set({
-                "link": product_link
-            })
-            logging.info(f"Added new product link to Firestore: {product_link} with ID: {product_id}")
-            print(f"Added new product link to Firestore: {product_link} with ID: {product_id}")
+            writes.append(('set', doc_refs[product_id], data))
+            counts["inserted"] += 1
+            logging.info(f"Added new product link to Firestore: {data['link']} with ID: {product_id}")
+
+    write_documents(client, writes, brand_name, outbox)
+    for name, count in counts.items():
+        run_metrics.count(name, count, brand_name)
+
+    logging.info(f"Saved {brand_name} links: {counts['inserted']} inserted, "
+                 f"{counts['updated']} updated, {counts['unchanged']} unchanged.")
+    print(f"Saved {brand_name} links: {counts['inserted']} inserted, "
+          f"{counts['updated']} updated, {counts['unchanged']} unchanged.")
+    return counts
+
+def save_product_link_changes_to_firestore(brand_name, changes, client=None, product_types=None, outbox=None,
+                                           relevance=None):
+    """
+    Delta mode: write (product_id, link, change) entries under today's collection for the brand.
+
+    Nothing is read from Firestore; each document records the product link and whether it
+    was 'added', 'changed' or 'removed', plus its product types when `product_types` maps
+    the product ID to them and its relevance scores when `relevance` does. With an `outbox` the writes are queued locally instead.
+    """
+    client = client or get_db()
+    today = datetime.now().strftime('%Y-%m-%d')
+    collection_ref = client.collection(f"product_links/{today}/{brand_name}")
+
+    writes = []
+    counts = {"added": 0, "changed": 0, "removed": 0}
+    for product_id, product_link, change in changes:
+        data = {"link": product_link, "change": change}
+        if product_types and product_id in product_types:
+            data["product_types"] = product_types[product_id]
+        if relevance and product_id in relevance:
+            data["relevance"] = relevance[product_id]
+        writes.append(('set', collection_ref.document(product_id), data))
+        counts[change] += 1
+        logging.info(f"Product {product_id} {change}: {product_link}")
+
+    write_documents(client, writes, brand_name, outbox)
+    for name, count in counts.items():
+        run_metrics.count(name, count, brand_name)
+    if writes:
+        logging.info(f"Saved {brand_name} link changes: {counts['added']} added, "
+                     f"{counts['changed']} changed, {counts['removed']} removed.")
+        print(f"Saved {brand_name} link changes: {counts['added']} added, "
+              f"{counts['changed']} changed, {counts['removed']} removed.")
+    return counts
+
+class LinkSaver:
+    """
+    Saves the link batches streamed by the searches of a run.
+
+    Without a link index every batch goes through the full Firestore upsert. With one (delta
+    mode) only new, changed and removed products are written, without any Firestore reads.
+    With a job journal the status, result count and timing of every job are checkpointed.
+
+    Batches first go through an in-run product index, so a product found again by another
+    product type is only rewritten to add that type, and never written twice for one type.
+    With an outbox, writes are queued locally and flushed to Firestore in the background.
+    With a relevance scorer, results scoring too low for the product type they were searched
+    for are dropped before anything is saved.
+    """
+
+    def __init__(self, link_index=None, detect_removals=True, journal=None, outbox=None, mirror_reads=False):
+        self.link_index = link_index
+        self.outbox = outbox
+        self.mirror_reads = mirror_reads
+        self.relevance = None
+        self.detect_removals = detect_removals
+        self.journal = journal
+        self.run_date = datetime.now().strftime('%Y-%m-%d')
+        # Product types whose searches completed, per brand; removals are only detected for those
+        self.completed_types = {}
+        self.failed_brands = set()
+        self.product_index = ProductIndex()
+        # Delta mode: change written for each (brand, product ID) during this run
+        self.written_changes = {}
+        # Batches may be saved from several writer threads at once
+        self.job_items = {}
+        self._lock = threading.Lock()
+        self._brand_locks = {}
+
+    def brand_lock(self, brand_name):
+        """
+        Return the lock serializing the saves of a brand.
+
+        Saving merges the product types and relevance of a document with those already
+        stored, so two writer threads saving the same brand at once could each merge with
+        the old document and the last write would drop the other's types.
+        """
+        with self._lock:
+            return self._brand_locks.setdefault(brand_name, threading.Lock())
+
+    def save(self, brand_name, product_links):
+        if self.link_index is None:
+            save_or_update_product_links_to_firestore(brand_name, product_links, outbox=self.outbox,
+                                                      mirror_reads=self.mirror_reads)
+            return
+        with run_metrics.span('index_diff', brand=brand_name):
+            changes = self.link_index.diff(brand_name, product_links)
+
+        # Changes written earlier in the run are rewritten when the product matched another type
+        writes = list(changes)
+        changed_ids = {product_id for product_id, _, _ in changes}
+        with self._lock:
+            for product in product_links:
+                change = self.written_changes.get((brand_name, product["id"]))
+                if change is not None and product["id"] not in changed_ids:
+                    writes.append((product["id"], product["link"], change))
+        product_types = {product["id"]: product["product_types"] for product in product_links
+                         if "product_types" in product}
+        relevance = {product["id"]: product["relevance"] for product in product_links if "relevance" in product}
+        save_product_link_changes_to_firestore(brand_name, writes, product_types=product_types, outbox=self.outbox,
+                                               relevance=relevance)
+        with self._lock:
+            for product_id, _, change in writes:
+                self.written_changes[(brand_name, product_id)] = change
+
+        # Only recorded once written (or durably queued), so a failed write is retried by the next run
+        with run_metrics.span('index_record', brand=brand_name):
+            self.link_index.record(brand_name, product_links, changes, self.run_date)
+
+    def job_started(self, job):
+        if self.journal is not None:
+            self.journal.job_started(job)
+
+    def save_job_batch(self, job, product_links):
+        """Persist a batch of links streamed by a search job, minus the products already saved for its type."""
+        items = len(product_links)
+        if self.relevance is not None:
+            with run_metrics.span('relevance', brand=job.brand_name):
+                product_links, dropped = self.relevance.filter(job.product_type, product_links)
+            if dropped:
+                run_metrics.count('irrelevant_dropped', len(dropped), job.brand_name, product_type=job.product_type)
+        # Indexed and written in the same order, so a later write always carries every type found before it
+        with self.brand_lock(job.brand_name):
+            products, duplicates = self.product_index.add(job.brand_name, job.product_type, product_links)
+            if products:
+                self.save(job.brand_name, products)
+        if duplicates:
+            run_metrics.count('duplicates_skipped', duplicates, job.brand_name, product_type=job.product_type)
+        with self._lock:
+            self.job_items[job] = self.job_items.get(job, 0) + items
+
+    def job_done(self, job, error):
+        """Track finished jobs; removals are only detected for the product types whose searches succeeded."""
+        run_metrics.count('searches', 1, job.brand_name)
+        with self._lock:
+            completed = self.completed_types.setdefault(job.brand_name, set())
+            if error is None:
+                completed.add(job.product_type)
+            else:
+                self.failed_brands.add(job.brand_name)
+        if error is not None:
+            run_metrics.count('search_errors', 1, job.brand_name, error=str(error))
+        if self.journal is not None:
+            with self._lock:
+                items = self.job_items.pop(job, 0)
+            self.journal.job_finished(job, items, error)
+
+    def finish(self):
+        """
+        Close the journal run and, in delta mode, write the products that disappeared from
+        the product types searched successfully in this run.
+        """
+        if self.journal is not None:
+            self.journal.finish_run()
+            counts = self.journal.status_counts()
+            summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+            logging.info(f"Job journal run {self.journal.run_id}: {summary}")
+            print(f"Job journal run {self.journal.run_id}: {summary}")
+        if self.link_index is None:
+            return
+        if self.detect_removals:
+            for brand_name, product_types in sorted(self.completed_types.items()):
+                # Products indexed without their types are only judged when none of the brand's searches failed
+                removed = self.link_index.find_removed(brand_name, self.run_date, product_types,
+                                                       include_untyped=brand_name not in self.failed_brands)
+                if removed:
+                    save_product_link_changes_to_firestore(brand_name, removed, outbox=self.outbox)
+                    self.link_index.record_removed(brand_name, removed, self.run_date)
+        else:
+            logging.info("Searches were capped, skipping removed product detection.")
+
+        for (brand_name, change), count in sorted(self.link_index.change_counts(self.run_date).items()):
+            logging.info(f"Change log {self.run_date}: {brand_name} {change} {count}")
+            print(f"Change log {self.run_date}: {brand_name} {change} {count}")
+
+    def start(self, flush_interval=2.0):
+        """Start flushing the outbox in the background, including writes left over by an earlier run."""
+        if self.outbox is not None:
+            self.outbox.start(get_db, flush_interval)
+
+    def close(self):
+        """Drain the outbox into Firestore; writes that cannot be flushed stay queued for the next run."""
+        if self.outbox is not None:
+            try:
+                self.outbox.stop(get_db())
+            except Exception as e:
+                logging.error(f"Could not drain the Firestore outbox: {e}")
+                print(f"Could not drain the Firestore outbox: {e}")
+            self.outbox.close()
+
+def log_wait_totals():
+    """Log how the searches of this run split their time between waiting and working."""
+    totals = waits.run_totals()
+    logging.info(f"{totals['searches']} searches took {totals['elapsed']:.1f}s: {totals['waiting']:.1f}s waiting on pages, "
+                 f"{totals['pacing']:.1f}s pacing, {totals['working']:.1f}s working.")
+    print(f"{totals['searches']} searches took {totals['elapsed']:.1f}s: {totals['waiting']:.1f}s waiting on pages, "
+          f"{totals['pacing']:.1f}s pacing, {totals['working']:.1f}s working.")
+
+def finish_metrics(args):
+    """Write the run metrics summary and log the p50/p95 stage durations of each brand."""
+    summary = run_metrics.close(args.metrics_summary)
+    log_summary(summary)
+    print(f"{'brand':<12}{'stage':<16}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}")
+    for brand, stages in summary["stages"].items():
+        for stage, stats in stages.items():
+            print(f"{brand:<12}{stage:<16}{stats['count']:>6}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}")
+    recycles = summary["counters"].get(RUN_BRAND, {}).get('driver_recycles', 0)
+    rss = summary["values"].get(RUN_BRAND, {}).get('browser_rss_mb')
+    if rss is not None:
+        logging.info(f"Browser memory: p95={rss['p95']:.0f} MB, max={rss['max']:.0f} MB, {recycles} driver recycles.")
+        print(f"Browser memory: p95={rss['p95']:.0f} MB, max={rss['max']:.0f} MB, {recycles} driver recycles.")
+    return summary
+
+def profile_startup():
+    """Time the startup steps (imports, Firebase, chromedriver resolution) and print them."""
+    steps = [("imports", IMPORTS_DONE - STARTED)]
+    for stage, step in (("firebase_init", get_db), ("driver_resolve", resolve_chromedriver)):
+        started = time.perf_counter()
+        with run_metrics.span(stage, brand=RUN_BRAND):
+            step()
+        steps.append((stage, time.perf_counter() - started))
+    for stage, seconds in steps:
+        logging.info(f"Startup {stage}: {seconds * 1000:.0f} ms")
+        print(f"Startup {stage}: {seconds * 1000:.0f} ms")
+
+def parse_brand_limits(values):
+    """Parse repeated NAME=N options into a {brand_name: limit} dictionary."""
+    brand_limits = {}
+    for value in values or []:
+        brand_name, _, limit = value.partition('=')
+        if not limit.isdigit() or int(limit) < 1:
+            raise argparse.ArgumentTypeError(f"Invalid brand limit '{value}', expected NAME=N.")
+        brand_limits[brand_name] = int(limit)
+    return brand_limits
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Search brand websites for product links.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of parallel browser workers (1 runs sequentially).")
+    parser.add_argument('--per-brand-limit', type=int, default=None,
+                        help="Maximum number of workers searching the same brand at once.")
+    parser.add_argument('--brand-limit', action='append', metavar='NAME=N',
+                        help="Override the per-brand limit for one brand, e.g. Zumub=1.")
+    parser.add_argument('--shard-count', type=int, default=1,
+                        help="Number of processes (on one or several hosts) sharing the run; 1 runs locally. "
+                             "Each shard runs a single browser worker.")
+    parser.add_argument('--shard-index', type=int, default=0, help="Shard of this process, from 0 to --shard-count - 1.")
+    parser.add_argument('--lease-backend', choices=('sqlite', 'firestore'), default='sqlite',
+                        help="Where the job leases of a sharded run are kept: a local SQLite file or Firestore.")
+    parser.add_argument('--lease-path', default=DEFAULT_LEASE_PATH, help="Path of the SQLite lease database.")
+    parser.add_argument('--lease-ttl', type=float, default=600,
+                        help="Seconds after which the job of a worker that stopped renewing its lease is taken over.")
+    parser.add_argument('--run-id', help="Identifier shared by all shards of a run (default today's date).")
+    parser.add_argument('--headless', action='store_true', help="Run Chrome in headless mode.")
+    parser.add_argument('--block-requests', action='store_true',
+                        help="Block images, fonts, media and trackers (per-brand overrides in brands.json).")
+    parser.add_argument('--page-load-strategy', choices=('normal', 'eager'), default=None,
+                        help="'eager' returns from page loads once the DOM is ready.")
+    parser.add_argument('--fast-path', action='store_true',
+                        help="Try plain HTTP fetching first and only use Chrome for brands that need it.")
+    parser.add_argument('--max-pages', type=int, default=None,
+                        help="Maximum number of result pages (or scroll loads) per search.")
+    parser.add_argument('--max-items', type=int, default=None, help="Maximum number of products per search.")
+    parser.add_argument('--batch-size', type=int, default=25,
+                        help="Number of links written to Firestore at a time while a search streams results.")
+    parser.add_argument('--async-pipeline', action='store_true',
+                        help="Write link batches from concurrent writer tasks while the browsers keep scraping.")
+    parser.add_argument('--writers', type=int, default=2, help="Number of writer tasks of the async pipeline.")
+    parser.add_argument('--queue-size', type=int, default=8,
+                        help="Maximum number of link batches waiting to be written in the async pipeline.")
+    parser.add_argument('--rate-limit', type=float, default=1.0,
+                        help="Average page requests per second allowed per website domain (0 disables).")
+    parser.add_argument('--burst', type=int, default=3, help="Page requests allowed in a burst per domain.")
+    parser.add_argument('--retries', type=int, default=2, help="Retries of a failed search, with exponential backoff.")
+    parser.add_argument('--backoff', type=float, default=2.0, help="Base delay in seconds of the retry backoff.")
+    parser.add_argument('--breaker-threshold', type=int, default=3,
+                        help="Consecutive failed searches after which a brand is skipped for the breaker cooldown.")
+    parser.add_argument('--breaker-cooldown', type=float, default=300,
+                        help="Seconds before a brand with an open circuit breaker is tried again.")
+    parser.add_argument('--relevance-filter', action='store_true',
+                        help="Drop results that do not match the product type (keywords/exclude in product_types.json).")
+    parser.add_argument('--min-relevance', type=float, default=None,
+                        help="Minimum relevance score (0-1) for every product type, overriding their min_score.")
+    parser.add_argument('--delta', action='store_true',
+                        help="Only write new, changed and removed products, using the local link index.")
+    parser.add_argument('--link-index', default=DEFAULT_INDEX_PATH, help="Path of the local link index database.")
+    parser.add_argument('--outbox', action='store_true',
+                        help="Queue Firestore writes in a local outbox and flush them in the background.")
+    parser.add_argument('--outbox-path', default=DEFAULT_OUTBOX_PATH, help="Path of the Firestore outbox database.")
+    parser.add_argument('--flush-interval', type=float, default=2.0,
+                        help="Seconds between background flushes of the outbox.")
+    parser.add_argument('--outbox-max-attempts', type=int, default=5,
+                        help="Attempts after which a write Firestore keeps rejecting is moved to the outbox dead letters.")
+    parser.add_argument('--mirror-reads', action='store_true',
+                        help="With --outbox, look up existing links in the outbox's local mirror instead of Firestore.")
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL_PATH, help="Path of the job journal database.")
+    resume_group = parser.add_mutually_exclusive_group()
+    resume_group.add_argument('--resume', action='store_true',
+                              help="Continue the latest run: only search its pending, interrupted and failed pairs.")
+    resume_group.add_argument('--retry-failed', action='store_true',
+                              help="Only search the (brand, product type) pairs that failed in the latest run.")
+    parser.add_argument('--recycle-after', type=int, default=150,
+                        help="Restart Chrome after this many navigations (0 disables).")
+    parser.add_argument('--max-browser-mb', type=float, default=1500,
+                        help="Restart Chrome once its processes use more than this many MB (0 disables).")
+    parser.add_argument('--chromedriver', help="Path of a local chromedriver binary (skips webdriver-manager).")
+    parser.add_argument('--offline-driver', action='store_true',
+                        help="Never contact the network to resolve chromedriver; use the local cache or PATH.")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Print how long imports, Firebase initialization and chromedriver resolution take.")
+    parser.add_argument('--trace', help="Append a JSON-lines trace of stage timings and counters to this file.")
+    parser.add_argument('--metrics-summary', help="Write the run summary (p50/p95 per stage and brand) to this JSON file.")
+    args = parser.parse_args(argv)
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error("--shard-index must be between 0 and --shard-count - 1.")
+    # A shard searches its leased jobs one at a time on a single browser; scale out with more shards
+    if args.shard_count > 1 and (args.workers > 1 or args.async_pipeline):
+        parser.error("--workers and --async-pipeline are not supported with --shard-count > 1, run more shards instead.")
+    return args
+
+def fetch_search_config():
+    """Fetch the brands and the product types (documents with a "label") to search from Firestore."""
+    # Fetch brand links from Firestore
+    brands_ref = get_db().collection('brands')
+    brands = [doc.to_dict() for doc in brands_ref.stream()]
+
+    # Fetch product types from Firestore
+    product_types_ref = get_db().collection('product_types')
+    product_types = [doc.to_dict() for doc in product_types_ref.stream()]
+
+    return brands, product_types
+
+def create_scheduler(args):
+    """Configure the per-domain rate limit and create the retry/circuit breaker scheduler of a run."""
+    rate_limiter.configure(rate=args.rate_limit, burst=args.burst)
+    return SearchScheduler(RetryPolicy(attempts=args.retries + 1, base_delay=args.backoff),
+                           breaker_threshold=args.breaker_threshold, breaker_cooldown=args.breaker_cooldown)
+
+def create_worker(args, brands=(), scheduler=None):
+    """Create a search worker configured from the command line options and the brand config."""
+    blocked_urls = None
+    if args.block_requests:
+        blocked_urls = {brand['name']: blocked_url_patterns(brand) for brand in brands}
+    return SearchWorker(headless=args.headless, fast_path=args.fast_path, max_pages=args.max_pages,
+                        max_items=args.max_items, batch_size=args.batch_size,
+                        page_load_strategy=args.page_load_strategy, blocked_urls=blocked_urls,
+                        scheduler=scheduler, recycle_after=args.recycle_after,
+                        max_browser_mb=args.max_browser_mb)
+
+def create_saver(args):
+    """
+    Create the link saver for a run with its job journal, opening the local link index in
+    delta mode and the Firestore outbox with --outbox.
+    """
+    journal = JobJournal(args.journal)
+    outbox = FirestoreOutbox(args.outbox_path, max_attempts=args.outbox_max_attempts) if args.outbox else None
+    if not args.delta:
+        return LinkSaver(journal=journal, outbox=outbox, mirror_reads=args.mirror_reads)
+    # Capped, partial (resumed) or sharded runs do not see every product, so removals cannot be told apart
+    detect_removals = (args.max_pages is None and args.max_items is None
+                       and not args.resume and not args.retry_failed and args.shard_count == 1)
+    return LinkSaver(LinkIndex(args.link_index), detect_removals=detect_removals, journal=journal, outbox=outbox)
+
+def create_relevance_scorer(args, product_types):
+    """Create the relevance filter of the run from the product type documents, with --relevance-filter."""
+    if not args.relevance_filter:
+        return None
+    return RelevanceScorer(product_types, min_score=args.min_relevance)
+
+def plan_jobs(brands, product_types, args, saver):
+    """
+    Build the search jobs of the run and open its journal run.
+
+    With --resume only the pending, interrupted and failed jobs of the latest run are kept,
+    with --retry-failed only its failed jobs.
+    """
+    jobs = build_jobs([brand for brand in brands if brand['name'] in session_classes], product_types)
+    mode = 'resume' if args.resume else 'retry_failed' if args.retry_failed else 'new'
+    selected = saver.journal.open_run(jobs, mode)
+    if mode != 'new':
+        logging.info(f"Continuing run {saver.journal.run_id}: {len(selected)} of {len(jobs)} searches left.")
+        print(f"Continuing run {saver.journal.run_id}: {len(selected)} of {len(jobs)} searches left.")
+    return selected
+
+def run_parallel(brands, jobs, args, saver, scheduler=None):
+    """
+    Run all searches on a pool of browser workers and save results as they stream in.
+
+    With `--async-pipeline` the batches are written by concurrent writer tasks instead of
+    the calling thread, so scraping and Firestore writes overlap.
+    """
+    searchable_brands = []
+    for brand in brands:
+        if brand['name'] in session_classes:
+            searchable_brands.append(brand)
+        else:
+            logging.warning(f"No search function defined for brand: {brand['name']}")
+            print(f"No search function defined for brand: {brand['name']}")
+
+    logging.info(f"Starting {len(jobs)} searches on {args.workers} workers...")
+    print(f"Starting {len(jobs)} searches on {args.workers} workers...")
+
+    if args.async_pipeline:
+        succeeded, failed = asyncio.run(run_async_pipeline(
+            jobs,
+            create_worker=lambda: create_worker(args, brands, scheduler),
+            on_batch=saver.save_job_batch,
+            on_job_done=saver.job_done,
+            on_job_start=saver.job_started,
+            scrapers=args.workers,
+            writers=args.writers,
+            queue_size=args.queue_size,
+            per_brand_limit=args.per_brand_limit,
+            brand_limits=parse_brand_limits(args.brand_limit),
+        ))
+        logging.info(f"Async pipeline finished: {succeeded} searches succeeded, {failed} failed.")
+        print(f"Async pipeline finished: {succeeded} searches succeeded, {failed} failed.")
+        return
+
+    succeeded, failed = run_worker_pool(
+        jobs,
+        create_worker=lambda: create_worker(args, brands, scheduler),
+        on_batch=saver.save_job_batch,
+        on_job_done=saver.job_done,
+        on_job_start=saver.job_started,
+        max_workers=args.workers,
+        per_brand_limit=args.per_brand_limit,
+        brand_limits=parse_brand_limits(args.brand_limit),
+    )
+    logging.info(f"Worker pool finished: {succeeded} searches succeeded, {failed} failed.")
+    print(f"Worker pool finished: {succeeded} searches succeeded, {failed} failed.")
+
+def create_coordinator(args):
+    """Create the shard coordinator of a distributed run on the configured lease backend."""
+    if args.lease_backend == 'firestore':
+        backend = FirestoreLeaseBackend(get_db())
+    else:
+        backend = SQLiteLeaseBackend(args.lease_path)
+    run_id = args.run_id or datetime.now().strftime('%Y-%m-%d')
+    return ShardCoordinator(backend, run_id, args.shard_index, args.shard_count, lease_ttl=args.lease_ttl)
+
+def run_distributed(brands, product_types, args, saver, scheduler=None):
+    """
+    Search this process's shard of the run, then help with the other shards.
+
+    Every process of the run builds the same job list; each job is searched under a lease,
+    so it is searched once even when several processes reach it, and the jobs of crashed
+    processes are taken over once their leases expire.
+    """
+    coordinator = create_coordinator(args)
+    jobs = build_jobs([brand for brand in brands if brand['name'] in session_classes], product_types)
+    saver.journal.open_run([], 'new')
+    own = sum(1 for job in jobs if shard_of(job, args.shard_count) == args.shard_index)
+    logging.info(f"Shard {args.shard_index} of {args.shard_count} in run {coordinator.run_id}: "
+                 f"{own} of {len(jobs)} searches hashed to this shard.")
+    print(f"Shard {args.shard_index} of {args.shard_count} in run {coordinator.run_id}: "
+          f"{own} of {len(jobs)} searches hashed to this shard.")
+
+    worker = create_worker(args, brands, scheduler)
+    try:
+        while True:
+            job = coordinator.next_job(jobs)
+            if job is None:
+                break
+            saver.job_started(job)
+            error = None
+            try:
+                for product_links in worker.iter_batches(job):
+                    saver.save_job_batch(job, product_links)
+            except Exception as e:
+                error = e
+                logging.error(f"Error searching for {job.product_type} on {job.brand_name}: {e}")
+                print(f"Error searching for {job.product_type} on {job.brand_name}: {e}")
+            saver.job_done(job, error)
+            coordinator.job_done(job, error)
+    finally:
+        worker.close()
+        counts = coordinator.status_counts()
+        coordinator.backend.close()
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    logging.info(f"Distributed run {coordinator.run_id}: {summary}")
+    print(f"Distributed run {coordinator.run_id}: {summary}")
 
 # Main function to loop through all brands and product types
-def main():
-    # Initialize WebDriver
-    driver = init_webdriver(browser='chrome')
+def main(argv=None):
+    args = parse_args(argv)
+    if args.trace:
+        run_metrics.open_trace(args.trace)
+    if args.chromedriver or args.offline_driver:
+        configure_driver(path=args.chromedriver, offline=args.offline_driver or None)
+    if args.profile_startup:
+        profile_startup()
+    saver = create_saver(args)
+    saver.start(args.flush_interval)
+    scheduler = create_scheduler(args)
 
+    if args.shard_count > 1 or args.workers > 1 or args.async_pipeline:
+        try:
+            with run_metrics.span('fetch_config', brand=RUN_BRAND):
+                brands, product_type_docs = fetch_search_config()
+            saver.relevance = create_relevance_scorer(args, product_type_docs)
+            product_types = [product_type['label'] for product_type in product_type_docs]
+            if args.shard_count > 1:
+                run_distributed(brands, product_types, args, saver, scheduler)
+            else:
+                run_parallel(brands, plan_jobs(brands, product_types, args, saver), args, saver, scheduler)
+            saver.finish()
+        except Exception as e:
+            logging.critical(f"Critical error in main process: {e}")
+            print(f"Critical error in main process: {e}")
+        saver.close()
+        log_wait_totals()
+        finish_metrics(args)
+        return
+
+    worker = None
     try:
-        # Fetch brand links from Firestore
-        brands_ref = db.collection('brands')
-        brands = [doc.to_dict() for doc in brands_ref.stream()]
+        with run_metrics.span('fetch_config', brand=RUN_BRAND):
+            brands, product_type_docs = fetch_search_config()
+        saver.relevance = create_relevance_scorer(args, product_type_docs)
+        product_types = [product_type['label'] for product_type in product_type_docs]
+
+        jobs = set(plan_jobs(brands, product_types, args, saver))
 
-        # Fetch product types from Firestore
-        product_types_ref = db.collection('product_types')
-        product_types = [doc.to_dict()['label'] for doc in product_types_ref.stream()]
+        # Initialize WebDriver
+        worker = create_worker(args, brands, scheduler)
 
         for brand in brands:
             brand_name = brand['name']
@@ -109,21 +820,20 @@ def main():
             logging.info(f"Searching on {brand_name} website ({brand_website})...")
             print(f"Starting search on {brand_name} website ({brand_website})...")
 
-            # Get the corresponding search function for the brand
-            search_function = search_functions.get(brand_name)
-
-            if search_function:
+            if brand_name in session_classes:
                 for product_type in product_types:
+                    job = SearchJob(brand_name, brand_website, product_type)
+                    if job not in jobs:
+                        continue  # Already searched in the run being resumed
+                    saver.job_started(job)
                     try:
-                        logging.info(f"Searching for {product_type} on {brand_name}...")
-                        print(f"Searching for {product_type} on {brand_name}...")
-                        
-                        product_links = search_function(driver, brand_website, product_type)
-                        
-                        # Save or update the product links in Firestore
-                        save_or_update_product_links_to_firestore(brand_name, product_links)
+                        # Save or update the product links in Firestore as each batch comes in
+                        for product_links in worker.iter_batches(job):
+                            saver.save_job_batch(job, product_links)
+                        saver.job_done(job, None)
                     
                     except Exception as e:
+                        saver.job_done(job, e)
                         logging.error(f"Error searching for {product_type} on {brand_name}: {e}")
                         print(f"Error searching for {product_type} on {brand_name}: {e}")
                         continue  # Continue to the next product type
@@ -132,13 +842,19 @@ def main():
                 logging.warning(f"No search function defined for brand: {brand_name}")
                 print(f"No search function defined for brand: {brand_name}")
 
+        saver.finish()
+
     except Exception as e:
         logging.critical(f"Critical error in main process: {e}")
         print(f"Critical error in main process: {e}")
     finally:
-        driver.quit()
+        if worker is not None:
+            worker.close()
         logging.info("WebDriver closed.")
         print("WebDriver closed.")
+        saver.close()
+        log_wait_totals()
+        finish_metrics(args)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+# Default location of the job journal, next to search_log.log
+DEFAULT_JOURNAL_PATH = 'job_journal.db'
+
+# Statuses of the (brand, product_type) pairs of a run
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+class JobJournal:
+    """
+    Persistent SQLite journal of the (brand, product_type) search jobs of each run.
+
+    Every job is recorded as pending when a run starts and updated as it runs, with its
+    result count, timing and error, so an interrupted or partly failed run can be resumed
+    without searching the completed pairs again.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.run_id = None
+        self._started = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS jobs (
+                    run_id TEXT NOT NULL,
+                    brand TEXT NOT NULL,
+                    product_type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    items INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    duration_s REAL,
+                    error TEXT,
+                    PRIMARY KEY (run_id, brand, product_type)
+                );
+            """)
+
+    @staticmethod
+    def _now():
+        return datetime.now().isoformat(timespec='seconds')
+
+    def latest_run(self):
+        with self._lock:
+            row = self._connection.execute("SELECT run_id FROM runs ORDER BY started_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def _add_jobs(self, jobs):
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO jobs (run_id, brand, product_type, status) VALUES (?, ?, ?, ?)",
+            [(self.run_id, job.brand_name, job.product_type, PENDING) for job in jobs]
+        )
+
+    def open_run(self, jobs, mode='new'):
+        """
+        Start a new run, or continue the latest one, and return the jobs to search.
+
+        `mode` is 'new' (all jobs), 'resume' (jobs of the latest run that are pending, were
+        interrupted while running or failed) or 'retry_failed' (failed jobs only). Jobs
+        missing from the latest run (e.g. a brand added since) are added as pending.
+        """
+        latest = self.latest_run() if mode != 'new' else None
+        with self._lock, self._connection:
+            if latest is None:
+                self.run_id = datetime.now().strftime('%Y%m%d-%H%M%S')
+                self._connection.execute("INSERT OR REPLACE INTO runs (run_id, started_at) VALUES (?, ?)",
+                                         (self.run_id, self._now()))
+                self._add_jobs(jobs)
+                return list(jobs)
+
+            self.run_id = latest
+            self._connection.execute("UPDATE runs SET finished_at = NULL WHERE run_id = ?", (self.run_id,))
+            self._add_jobs(jobs)
+            statuses = (FAILED,) if mode == 'retry_failed' else (PENDING, RUNNING, FAILED)
+            rows = self._connection.execute(
+                f"SELECT brand, product_type FROM jobs WHERE run_id = ? AND status IN ({','.join('?' * len(statuses))})",
+                (self.run_id, *statuses)
+            ).fetchall()
+        selected = set(rows)
+        return [job for job in jobs if (job.brand_name, job.product_type) in selected]
+
+    def job_started(self, job):
+        with self._lock, self._connection:
+            self._started[job] = datetime.now()
+            # Distributed runs only learn their jobs as they claim them
+            self._add_jobs([job])
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, error = NULL "
+                "WHERE run_id = ? AND brand = ? AND product_type = ?",
+                (RUNNING, self._now(), self.run_id, job.brand_name, job.product_type)
+            )
+
+    def job_finished(self, job, items, error=None):
+        """Record the outcome of a job: its result count, duration and error (None on success)."""
+        with self._lock, self._connection:
+            started = self._started.pop(job, None)
+            duration = (datetime.now() - started).total_seconds() if started else None
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, items = ?, finished_at = ?, duration_s = ?, error = ? "
+                "WHERE run_id = ? AND brand = ? AND product_type = ?",
+                (FAILED if error is not None else DONE, items, self._now(), duration,
+                 str(error) if error is not None else None, self.run_id, job.brand_name, job.product_type)
+            )
+
+    def finish_run(self):
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (self._now(), self.run_id))
+
+    def status_counts(self):
+        """Return {status: count} for the jobs of the current run."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY status", (self.run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
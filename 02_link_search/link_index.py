@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+
+# Default location of the local link index, next to search_log.log
+DEFAULT_INDEX_PATH = 'link_index.db'
+
+class LinkIndex:
+    """
+    Local SQLite index of the last known link of every product, per brand.
+
+    It lets delta runs decide what changed without reading Firestore, and keeps a compact
+    change log with one row per added, changed or removed product. The product types each
+    product was found under are kept too, so removals are only detected from the searches
+    that actually ran.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS links (
+                    brand TEXT NOT NULL,
+                    product_id TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    first_seen TEXT NOT NULL,
+                    last_seen TEXT NOT NULL,
+                    removed INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (brand, product_id)
+                );
+                CREATE TABLE IF NOT EXISTS change_log (
+                    run_date TEXT NOT NULL,
+                    brand TEXT NOT NULL,
+                    product_id TEXT NOT NULL,
+                    change TEXT NOT NULL,
+                    link TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS change_log_date ON change_log (run_date, brand);
+                CREATE TABLE IF NOT EXISTS link_types (
+                    brand TEXT NOT NULL,
+                    product_id TEXT NOT NULL,
+                    product_type TEXT NOT NULL,
+                    PRIMARY KEY (brand, product_id, product_type)
+                );
+            """)
+
+    def diff(self, brand, product_links):
+        """
+        Compare product links with the index.
+
+        Returns a list of (product_id, link, change) for products that are new ('added'),
+        whose link changed ('changed') or that come back after being removed ('added').
+        """
+        links_by_id = {product["id"]: product["link"] for product in product_links}
+        with self._lock:
+            known = {}
+            for product_id in links_by_id:
+                row = self._connection.execute(
+                    "SELECT link, removed FROM links WHERE brand = ? AND product_id = ?", (brand, product_id)
+                ).fetchone()
+                if row is not None:
+                    known[product_id] = row
+
+        changes = []
+        for product_id, link in links_by_id.items():
+            row = known.get(product_id)
+            if row is None or row[1]:
+                changes.append((product_id, link, 'added'))
+            elif row[0] != link:
+                changes.append((product_id, link, 'changed'))
+        return changes
+
+    def record(self, brand, product_links, changes, run_date):
+        """
+        Store the links seen in a run, and the "product_types" they carry, and append the
+        changes that were written to the change log.
+        """
+        with self._lock, self._connection:
+            self._connection.executemany("""
+                INSERT INTO links (brand, product_id, link, first_seen, last_seen, removed)
+                VALUES (?, ?, ?, ?, ?, 0)
+                ON CONFLICT (brand, product_id) DO UPDATE SET
+                    link = excluded.link, last_seen = excluded.last_seen, removed = 0
+            """, [(brand, product["id"], product["link"], run_date, run_date) for product in product_links])
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO link_types (brand, product_id, product_type) VALUES (?, ?, ?)",
+                [(brand, product["id"], product_type) for product in product_links
+                 for product_type in product.get("product_types", ())]
+            )
+            self._connection.executemany(
+                "INSERT INTO change_log (run_date, brand, product_id, change, link) VALUES (?, ?, ?, ?, ?)",
+                [(run_date, brand, product_id, change, link) for product_id, link, change in changes]
+            )
+
+    def find_removed(self, brand, run_date, product_types=None, include_untyped=True):
+        """
+        Return (product_id, link, 'removed') for products of a brand not seen since before `run_date`.
+
+        With `product_types` (the product types whose searches completed in the run), only
+        products found under none but those types are returned: a product of a type that was
+        not searched, failed or was skipped may still be listed. Products indexed before their
+        types were recorded are only returned with `include_untyped`.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT product_id, link FROM links WHERE brand = ? AND removed = 0 AND last_seen < ?",
+                (brand, run_date)
+            ).fetchall()
+            known_types = {}
+            if product_types is not None:
+                for product_id, product_type in self._connection.execute(
+                        "SELECT product_id, product_type FROM link_types WHERE brand = ?", (brand,)):
+                    known_types.setdefault(product_id, set()).add(product_type)
+        if product_types is not None:
+            rows = [(product_id, link) for product_id, link in rows
+                    if (known_types[product_id] <= set(product_types) if product_id in known_types else include_untyped)]
+        return [(product_id, link, 'removed') for product_id, link in rows]
+
+    def record_removed(self, brand, changes, run_date):
+        """Mark products as removed and append them to the change log."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE links SET removed = 1 WHERE brand = ? AND product_id = ?",
+                [(brand, product_id) for product_id, _, _ in changes]
+            )
+            self._connection.executemany(
+                "INSERT INTO change_log (run_date, brand, product_id, change, link) VALUES (?, ?, ?, ?, ?)",
+                [(run_date, brand, product_id, change, link) for product_id, link, change in changes]
+            )
+
+    def change_counts(self, run_date):
+        """Return {(brand, change): count} for the change log of one run date."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT brand, change, COUNT(*) FROM change_log WHERE run_date = ? GROUP BY brand, change",
+                (run_date,)
+            ).fetchall()
+        return {(brand, change): count for brand, change, count in rows}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
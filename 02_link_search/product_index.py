@@ -0,0 +1,43 @@
+import threading
+
+class ProductIndex:
+    """
+    In-run index of the products found by every search, keyed by brand and product ID.
+
+    Product IDs are derived from normalized URLs (see brand_modules.urls), so the same product
+    found by overlapping queries such as "Whey" and "Isolate Whey" maps to one entry that
+    records every product type it matched, and its relevance score for each of them.
+    """
+
+    def __init__(self):
+        self._product_types = {}
+        self._relevance = {}
+        self._lock = threading.Lock()
+
+    def add(self, brand, product_type, product_links):
+        """
+        Add the products found by a search for `product_type`.
+
+        Returns (products, duplicates): the products that need writing, i.e. seen for the
+        first time or matched by a new product type, each with the sorted "product_types"
+        found so far (and their "relevance" scores, for scored products), and the number of products that were already indexed for this type.
+        """
+        products = {}
+        duplicates = 0
+        with self._lock:
+            for product in product_links:
+                product_types = self._product_types.setdefault((brand, product["id"]), set())
+                if product_type in product_types:
+                    duplicates += 1
+                    continue
+                product_types.add(product_type)
+                products[product["id"]] = dict(product, product_types=sorted(product_types))
+                if "relevance" in product:
+                    scores = self._relevance.setdefault((brand, product["id"]), {})
+                    scores[product_type] = product["relevance"]
+                    products[product["id"]]["relevance"] = dict(scores)
+        return list(products.values()), duplicates
+
+    def __len__(self):
+        with self._lock:
+            return len(self._product_types)
@@ -0,0 +1,103 @@
+import re
+import logging
+import unicodedata
+import numpy as np
+
+from brand_modules.urls import canonical_path_segments
+
+# Products scoring below this are dropped, unless the product type sets its own "min_score";
+# with a two-word label such as "Isolate Whey" both words (or a keyword) have to match
+DEFAULT_MIN_SCORE = 0.75
+
+# Longest word n-gram matched, so multi-word keywords such as "protein bar" can be listed
+MAX_NGRAM = 3
+
+TOKEN = re.compile(r'[a-z0-9]+')
+
+def normalize(text):
+    """Lowercase a text and strip its accents, so 'Proteína' matches 'proteina'."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+def tokenize(text):
+    return TOKEN.findall(normalize(text))
+
+def ngrams(words, max_n=MAX_NGRAM):
+    """Return the set of word n-grams (n <= max_n) of a token list, joined with spaces."""
+    return {' '.join(words[start:start + n]) for n in range(1, max_n + 1) for start in range(len(words) - n + 1)}
+
+def product_text(product):
+    """Text a product is scored on: its name plus the words of its URL slug."""
+    segments = canonical_path_segments(product.get("link") or '')
+    slug = segments[-1] if segments else ''
+    return f"{product.get('name') or ''} {re.sub(r'[-_]+', ' ', slug)}"
+
+def terms(phrases):
+    """Normalize a list of words or phrases into an array of n-gram terms."""
+    normalized = {' '.join(tokenize(phrase)) for phrase in phrases or []}
+    return np.array(sorted(term for term in normalized if term), dtype=object)
+
+class RelevanceScorer:
+    """
+    Scores search results against the product type they were searched for.
+
+    The score of a product is the fraction of the product type label's words found in its
+    name and URL slug, or 1 when it matches one of the type's optional "keywords" (other
+    names of the type); matching one of the type's "exclude" terms sets it to 0. A
+    batch is scored at once: the n-grams of all products are flattened into one array,
+    matched against the terms with np.isin and summed per product with np.bincount.
+    """
+
+    def __init__(self, product_types=None, min_score=None):
+        # {label: product type document} with optional keywords, exclude and min_score
+        self.product_types = {product_type['label']: product_type for product_type in product_types or []}
+        self.min_score = min_score
+        self._terms = {}
+
+    def terms_for(self, product_type):
+        """Return (label terms, keyword terms, exclude terms, min score) of a product type."""
+        if product_type not in self._terms:
+            config = self.product_types.get(product_type, {})
+            min_score = self.min_score if self.min_score is not None else config.get('min_score', DEFAULT_MIN_SCORE)
+            self._terms[product_type] = (terms(tokenize(product_type)), terms(config.get('keywords')),
+                                         terms(config.get('exclude')), min_score)
+        return self._terms[product_type]
+
+    def score(self, product_type, products):
+        """Return an array with the relevance score (0 to 1) of each product."""
+        count = len(products)
+        if not count:
+            return np.zeros(0)
+        features = [ngrams(tokenize(product_text(product))) for product in products]
+        owners = np.repeat(np.arange(count), [len(product_features) for product_features in features])
+        flat = np.array([feature for product_features in features for feature in product_features], dtype=object)
+
+        label_terms, keyword_terms, exclude_terms, _ = self.terms_for(product_type)
+
+        def hits(term_array):
+            if not len(term_array) or not len(flat):
+                return np.zeros(count)
+            return np.bincount(owners, weights=np.isin(flat, term_array), minlength=count)
+
+        coverage = hits(label_terms) / max(len(label_terms), 1)
+        scores = np.where(hits(keyword_terms) > 0, 1.0, coverage)
+        scores[hits(exclude_terms) > 0] = 0.0
+        return scores
+
+    def filter(self, product_type, products):
+        """
+        Score a batch of products and drop those under the product type's minimum score.
+
+        Returns (kept, dropped): the kept products carry their rounded score as "relevance".
+        """
+        scores = self.score(product_type, products)
+        min_score = self.terms_for(product_type)[3]
+        kept, dropped = [], []
+        for product, score in zip(products, scores.tolist()):
+            if score >= min_score:
+                kept.append(dict(product, relevance=round(score, 3)))
+            else:
+                dropped.append(product)
+                logging.info(f"Dropped {product.get('name') or product['link']} for {product_type} "
+                             f"(relevance {score:.2f} < {min_score}).")
+        return kept, dropped
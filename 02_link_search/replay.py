@@ -0,0 +1,192 @@
+"""
+Record brand search pages to disk and replay them from local HTTP servers.
+
+Record the homepage and the search results page of every brand and product type:
+
+    python replay.py record --out recordings --headless
+
+Serve the recordings (one local server per brand) for manual runs:
+
+    python replay.py serve --recordings recordings
+
+Recorded pages are DOM snapshots with their <script> tags removed, so replays are
+deterministic and never call the live sites.
+"""
+import os
+import re
+import sys
+import json
+import logging
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qsl
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Modules shared by every stage live in ../shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brand_modules import waits
+from brand_modules.registry import session_classes
+from browser import init_webdriver
+
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_BRANDS_JSON = '../01_manage/config/brands.json'
+DEFAULT_PRODUCT_TYPES_JSON = '../01_manage/config/product_types.json'
+
+SCRIPT_TAG = re.compile(r'<script\b[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+
+def strip_scripts(html):
+    """Remove <script> elements so a recorded page neither re-renders nor calls home."""
+    return SCRIPT_TAG.sub('', html)
+
+def request_key(url):
+    """Key a recorded page by its path and query string."""
+    parts = urlsplit(url)
+    return parts.path + ('?' + parts.query if parts.query else '')
+
+def site_origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def record(out_dir, brands, product_types, headless=False):
+    """Record the homepage and one search results page per product type for each brand."""
+    out_dir = Path(out_dir)
+    manifest = {}
+    driver = init_webdriver(browser='chrome', headless=headless)
+    try:
+        for brand in brands:
+            session_class = session_classes.get(brand['name'])
+            if session_class is None:
+                print(f"No search function defined for brand: {brand['name']}")
+                continue
+
+            brand_dir = out_dir / brand['id']
+            brand_dir.mkdir(parents=True, exist_ok=True)
+            entry = {"id": brand['id'], "website": brand['website'], "home": request_key(brand['website']), "pages": []}
+
+            # Snapshot the homepage before the cookie banner is accepted, so replays show it too
+            session = session_class(driver, brand['website'])
+            driver.get(brand['website'])
+            (brand_dir / 'home.html').write_text(strip_scripts(driver.page_source), encoding='utf-8')
+            entry["pages"].append({"key": request_key(brand['website']), "file": 'home.html', "product_type": None})
+            session.prepare()
+            session.prepared = session.on_site = True
+
+            for index, product_type in enumerate(product_types):
+                if not session.submit_search(product_type):
+                    session.open()
+                    session.submit_search(product_type)
+                waits.wait_optional(driver, waits.results_stable(session_class.item_locator), 10)
+                file_name = f"search_{index}.html"
+                (brand_dir / file_name).write_text(strip_scripts(driver.page_source), encoding='utf-8')
+                entry["pages"].append({"key": request_key(driver.current_url), "file": file_name,
+                                       "product_type": product_type})
+                print(f"Recorded {brand['name']} search for {product_type}: {driver.current_url}")
+
+            manifest[brand['name']] = entry
+    finally:
+        driver.quit()
+
+    (out_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    return manifest
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Serve the recorded pages of one brand."""
+
+    brand_dir = None
+    entry = None
+    origin = None
+    local_origin = None
+
+    def find_page(self):
+        key = request_key(self.path)
+        for page in self.entry["pages"]:
+            if page["key"] == key:
+                return page
+
+        # Search URLs may differ slightly (extra parameters, encoding), so match on the query
+        query_values = ' '.join(value.lower() for _, value in parse_qsl(urlsplit(self.path).query))
+        for page in self.entry["pages"]:
+            if page["product_type"] and page["product_type"].lower() in query_values:
+                return page
+
+        if urlsplit(self.path).path in ('/', urlsplit(self.entry["home"]).path):
+            return self.entry["pages"][0]
+        return None
+
+    def do_GET(self):
+        page = self.find_page()
+        if page is None:
+            self.send_error(404, "Not recorded")
+            return
+        html = (self.brand_dir / page["file"]).read_text(encoding='utf-8')
+        # Point absolute links back at the replay server instead of the live site
+        body = html.replace(self.origin, self.local_origin).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug("Replay: " + format % args)
+
+def start_replay_servers(recordings_dir, host='127.0.0.1'):
+    """
+    Start one local HTTP server per recorded brand.
+
+    Returns ({brand_name: local brand_website}, servers); call `shutdown()` on each server
+    when done.
+    """
+    recordings_dir = Path(recordings_dir)
+    manifest = load_json(recordings_dir / MANIFEST_NAME)
+    websites = {}
+    servers = []
+    for brand_name, entry in manifest.items():
+        handler = type(f"{entry['id']}ReplayHandler", (ReplayHandler,), {
+            "brand_dir": recordings_dir / entry["id"],
+            "entry": entry,
+            "origin": site_origin(entry["website"]),
+        })
+        server = ThreadingHTTPServer((host, 0), handler)
+        handler.local_origin = f"http://{host}:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        websites[brand_name] = handler.local_origin + entry["home"]
+    return websites, servers
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and replay brand search pages.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="Record homepages and search results pages.")
+    record_parser.add_argument('--out', default='recordings', help="Directory to write the recordings to.")
+    record_parser.add_argument('--brands-json', default=DEFAULT_BRANDS_JSON)
+    record_parser.add_argument('--product-types-json', default=DEFAULT_PRODUCT_TYPES_JSON)
+    record_parser.add_argument('--headless', action='store_true', help="Run Chrome in headless mode.")
+
+    serve_parser = subparsers.add_parser('serve', help="Serve recorded pages from local HTTP servers.")
+    serve_parser.add_argument('--recordings', default='recordings', help="Directory with the recordings.")
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        product_types = [product_type['label'] for product_type in load_json(args.product_types_json)]
+        record(args.out, load_json(args.brands_json), product_types, headless=args.headless)
+    else:
+        websites, servers = start_replay_servers(args.recordings)
+        for brand_name, website in websites.items():
+            print(f"{brand_name}: {website}")
+        print("Replaying, press Ctrl+C to stop.")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            for server in servers:
+                server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+from collections import namedtuple
+
+# A single unit of search work: one product type on one brand website
+SearchJob = namedtuple('SearchJob', ['brand_name', 'brand_website', 'product_type'])
+
+def build_jobs(brands, product_types):
+    """Build the list of (brand, product_type) search jobs in brand order."""
+    jobs = []
+    for brand in brands:
+        for product_type in product_types:
+            jobs.append(SearchJob(brand['name'], brand['website'], product_type))
+    return jobs
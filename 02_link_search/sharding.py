@@ -0,0 +1,245 @@
+import os
+import time
+import socket
+import hashlib
+import logging
+import sqlite3
+import threading
+
+# Default location of the SQLite lease backend, next to search_log.log
+DEFAULT_LEASE_PATH = 'search_leases.db'
+
+# Lease statuses of a (brand, product_type) job within a distributed run
+LEASED, DONE, FAILED = 'leased', 'done', 'failed'
+
+# Outcomes of a claim: leased to the caller, already searched, or leased by a live owner
+CLAIMED, FINISHED, BUSY = 'claimed', 'finished', 'busy'
+
+def job_key(job):
+    return f"{job.brand_name}|{job.product_type}"
+
+def shard_of(job, shard_count):
+    """Return the shard of a job: a stable hash of its brand and product type, the same on every host."""
+    digest = hashlib.sha1(job_key(job).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+def default_owner():
+    """Identify this worker process by host name and PID."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class SQLiteLeaseBackend:
+    """
+    Lease backend on a local SQLite file, for several processes on one host (or tests).
+
+    Each claim runs in an IMMEDIATE transaction, so two processes never lease the same job.
+    """
+
+    def __init__(self, path=DEFAULT_LEASE_PATH):
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    run_id TEXT NOT NULL,
+                    job_key TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, job_key)
+                )
+            """)
+
+    def claim(self, run_id, key, owner, ttl):
+        """Lease a job that is not finished and not leased by a live owner; returns CLAIMED, FINISHED or BUSY."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT owner, status, expires_at FROM leases WHERE run_id = ? AND job_key = ?", (run_id, key)
+                ).fetchone()
+                if row is not None and (row[1] != LEASED or (row[2] > now and row[0] != owner)):
+                    self._connection.execute("ROLLBACK")
+                    return FINISHED if row[1] != LEASED else BUSY
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO leases (run_id, job_key, owner, status, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (run_id, key, owner, LEASED, now + ttl)
+                )
+                self._connection.execute("COMMIT")
+                return CLAIMED
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def renew(self, run_id, key, owner, ttl):
+        """Extend a lease this owner still holds; False when it expired and was taken over."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE leases SET expires_at = ? WHERE run_id = ? AND job_key = ? AND owner = ? AND status = ?",
+                (time.time() + ttl, run_id, key, owner, LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, run_id, key, owner, status):
+        with self._lock:
+            self._connection.execute(
+                "UPDATE leases SET status = ?, expires_at = ? WHERE run_id = ? AND job_key = ? AND owner = ?",
+                (status, time.time(), run_id, key, owner)
+            )
+
+    def status_counts(self, run_id):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM leases WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+class FirestoreLeaseBackend:
+    """
+    Lease backend on a Firestore collection, for workers on several hosts.
+
+    One document per (run, job) holds the owner, status and expiry of its lease; claims and
+    renewals run in Firestore transactions.
+    """
+
+    def __init__(self, client, collection='search_leases'):
+        self.client = client
+        self.collection = client.collection(collection)
+
+    def _doc(self, run_id, key):
+        return self.collection.document(f"{run_id}_{hashlib.sha1(key.encode('utf-8')).hexdigest()}")
+
+    def _transact(self, update):
+        from google.cloud import firestore
+
+        @firestore.transactional
+        def run(transaction):
+            return update(transaction)
+        return run(self.client.transaction())
+
+    def claim(self, run_id, key, owner, ttl):
+        doc_ref = self._doc(run_id, key)
+
+        def update(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            now = time.time()
+            if snapshot.exists:
+                lease = snapshot.to_dict()
+                if lease['status'] != LEASED:
+                    return FINISHED
+                if lease['expires_at'] > now and lease['owner'] != owner:
+                    return BUSY
+            transaction.set(doc_ref, {"run_id": run_id, "job_key": key, "owner": owner,
+                                      "status": LEASED, "expires_at": now + ttl})
+            return CLAIMED
+        return self._transact(update)
+
+    def renew(self, run_id, key, owner, ttl):
+        doc_ref = self._doc(run_id, key)
+
+        def update(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            lease = snapshot.to_dict() if snapshot.exists else None
+            if lease is None or lease['owner'] != owner or lease['status'] != LEASED:
+                return False
+            transaction.update(doc_ref, {"expires_at": time.time() + ttl})
+            return True
+        return self._transact(update)
+
+    def complete(self, run_id, key, owner, status):
+        self._doc(run_id, key).update({"status": status, "expires_at": time.time()})
+
+    def status_counts(self, run_id):
+        counts = {}
+        for doc in self.collection.where('run_id', '==', run_id).stream():
+            status = doc.to_dict()['status']
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def close(self):
+        pass
+
+class ShardCoordinator:
+    """
+    Hands out the jobs of a distributed run to one worker process.
+
+    Every process builds the same job list and owns the jobs whose stable hash falls in its
+    shard. A job is only searched under a lease, renewed in the background while the search
+    runs. Once its own shard is exhausted a process claims the jobs left in other shards,
+    which picks up the share of crashed workers as soon as their leases expire (and helps
+    slower ones). A process only stops once every job of the run is finished.
+    """
+
+    def __init__(self, backend, run_id, shard_index, shard_count, owner=None, lease_ttl=600, poll_interval=30):
+        self.backend = backend
+        self.run_id = run_id
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.owner = owner or default_owner()
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self._finished = set()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def ordered_jobs(self, jobs):
+        """Return the jobs of this shard first, then the other shards starting from the next one."""
+        def distance(job):
+            return (shard_of(job, self.shard_count) - self.shard_index) % self.shard_count
+        return sorted(jobs, key=distance)
+
+    def next_job(self, jobs):
+        """
+        Claim and return the next job this process should search, or None once every job is finished.
+
+        When the only jobs left are leased by other workers, waits for them to finish or for
+        their leases to expire.
+        """
+        while True:
+            busy = False
+            for job in self.ordered_jobs(jobs):
+                key = job_key(job)
+                if key in self._finished:
+                    continue
+                outcome = self.backend.claim(self.run_id, key, self.owner, self.lease_ttl)
+                if outcome == CLAIMED:
+                    if shard_of(job, self.shard_count) != self.shard_index:
+                        logging.info(f"Took over {job.product_type} on {job.brand_name} from shard "
+                                     f"{shard_of(job, self.shard_count)}.")
+                    self._start_heartbeat(job)
+                    return job
+                if outcome == FINISHED:
+                    self._finished.add(key)
+                else:
+                    busy = True
+            if not busy:
+                return None
+            time.sleep(self.poll_interval)
+
+    def _start_heartbeat(self, job):
+        self._stop.clear()
+
+        def renew():
+            while not self._stop.wait(self.lease_ttl / 3):
+                if not self.backend.renew(self.run_id, job_key(job), self.owner, self.lease_ttl):
+                    logging.warning(f"Lost the lease of {job.product_type} on {job.brand_name}.")
+                    return
+
+        self._heartbeat = threading.Thread(target=renew, name='lease-heartbeat', daemon=True)
+        self._heartbeat.start()
+
+    def job_done(self, job, error=None):
+        """Stop renewing the lease of a job and record its outcome."""
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        self._finished.add(job_key(job))
+        self.backend.complete(self.run_id, job_key(job), self.owner, FAILED if error is not None else DONE)
+
+    def status_counts(self):
+        return self.backend.status_counts(self.run_id)
@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The stage modules are imported the way the scripts import them: from the stage directory, and
+# the shared modules from the repository root
+STAGE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(STAGE_DIR.parent))
+sys.path.insert(0, str(STAGE_DIR))
+
+from brand_modules import static_fetch
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+def read_fixture(name):
+    """Return the content of a recorded HTML page in tests/fixtures."""
+    return (FIXTURES_DIR / name).read_text(encoding='utf-8')
+
+@pytest.fixture(autouse=True)
+def reset_static_fetch():
+    """Forget the search forms and Selenium-only brands remembered by an earlier test."""
+    static_fetch._search_forms.clear()
+    static_fetch._selenium_only_brands.clear()
+    yield
+    static_fetch._search_forms.clear()
+    static_fetch._selenium_only_brands.clear()
+
+@pytest.fixture
+def fake_http(monkeypatch):
+    """
+    Serve recorded pages instead of the websites: {url: fixture name} routes set by the test.
+
+    Unknown URLs fail like an HTTP error does. Every requested URL is appended to `requests`.
+    """
+    class FakeHttp:
+        def __init__(self):
+            self.routes = {}
+            self.requests = []
+
+        def fetch_html(self, url, timeout=10):
+            self.requests.append(url)
+            if url not in self.routes:
+                return None, url
+            return read_fixture(self.routes[url]), url
+
+    fake = FakeHttp()
+    monkeypatch.setattr(static_fetch, 'fetch_html', fake.fetch_html)
+    return fake
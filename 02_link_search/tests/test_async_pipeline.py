@@ -0,0 +1,26 @@
+import asyncio
+import threading
+
+from async_pipeline import run_async_pipeline
+from search_jobs import SearchJob
+
+class FakeWorker:
+    def iter_batches(self, job):
+        yield [{"id": f"{job.product_type}-1", "link": "https://shop/1"}]
+
+    def close(self):
+        pass
+
+def test_journal_callbacks_run_off_the_event_loop():
+    jobs = [SearchJob('Shop', 'https://shop/', product_type) for product_type in ('Whey', 'Creatine')]
+    threads = []
+
+    async def run():
+        loop_thread = threading.get_ident()
+        return await run_async_pipeline(
+            jobs, create_worker=FakeWorker, on_batch=lambda job, product_links: None,
+            on_job_start=lambda job: threads.append(('start', threading.get_ident() != loop_thread)),
+            on_job_done=lambda job, error: threads.append(('done', threading.get_ident() != loop_thread)))
+
+    assert asyncio.run(run()) == (2, 0)
+    assert sorted(threads) == [('done', True), ('done', True), ('start', True), ('start', True)]
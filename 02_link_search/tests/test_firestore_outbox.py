@@ -0,0 +1,133 @@
+from firestore_outbox import FirestoreOutbox
+
+class NotFound(Exception):
+    """Stand-in for google.api_core.exceptions.NotFound."""
+    code = 404
+
+class ServiceUnavailable(Exception):
+    """Stand-in for google.api_core.exceptions.ServiceUnavailable."""
+    code = 503
+
+class FakeRef:
+    def __init__(self, path):
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+class FakeFirestore:
+    """Client whose batches are atomic and reject updates of missing documents, like Firestore."""
+
+    def __init__(self):
+        self.documents = {}
+        self.available = True
+        self.commits = 0
+
+    def document(self, path):
+        return FakeRef(path)
+
+    def batch(self):
+        client = self
+
+        class Batch:
+            def __init__(self):
+                self.writes = []
+
+            def set(self, doc_ref, data):
+                self.writes.append(('set', doc_ref, data))
+
+            def update(self, doc_ref, data):
+                self.writes.append(('update', doc_ref, data))
+
+            def delete(self, doc_ref):
+                self.writes.append(('delete', doc_ref, None))
+
+            def commit(self):
+                client.commits += 1
+                if not client.available:
+                    raise ServiceUnavailable("Firestore is unavailable")
+                for operation, doc_ref, _ in self.writes:
+                    if operation == 'update' and doc_ref.path not in client.documents:
+                        raise NotFound(f"No document to update: {doc_ref.path}")
+                for operation, doc_ref, data in self.writes:
+                    if operation == 'set':
+                        client.documents[doc_ref.path] = dict(data)
+                    elif operation == 'update':
+                        client.documents[doc_ref.path].update(data)
+                    else:
+                        client.documents.pop(doc_ref.path, None)
+
+        return Batch()
+
+def make_outbox(tmp_path, max_attempts=3):
+    return FirestoreOutbox(str(tmp_path / 'outbox.db'), base_delay=0, max_attempts=max_attempts)
+
+def test_failing_write_does_not_hold_back_its_batch(tmp_path):
+    client = FakeFirestore()
+    outbox = make_outbox(tmp_path)
+    outbox.enqueue([('set', FakeRef(f"links/p{index}"), {"link": index}) for index in range(10)])
+    outbox.enqueue([('update', FakeRef("links/deleted"), {"link": "x"})])
+
+    assert outbox.flush(client, force=True) == 10
+    assert len(client.documents) == 10
+    assert outbox.pending_count() == 1
+
+def test_write_is_dead_lettered_after_max_attempts(tmp_path):
+    client = FakeFirestore()
+    outbox = make_outbox(tmp_path)
+    outbox.enqueue([('update', FakeRef("links/deleted"), {"link": "x"})])
+
+    for _ in range(3):
+        outbox.flush(client, force=True)
+    assert outbox.pending_count() == 0
+    assert outbox.dead_letter_count() == 1
+    # The mirror no longer claims the document exists
+    assert outbox.get_documents([FakeRef("links/deleted")]) == {}
+
+def test_outage_keeps_every_write_queued(tmp_path):
+    client = FakeFirestore()
+    client.available = False
+    outbox = make_outbox(tmp_path)
+    outbox.enqueue([('set', FakeRef(f"links/p{index}"), {"link": index}) for index in range(10)])
+
+    for _ in range(5):
+        assert outbox.flush(client, force=True) == 0
+    # The batch is not split while the service is down, and nothing is dead-lettered
+    assert client.commits == 5
+    assert outbox.pending_count() == 10
+    assert outbox.dead_letter_count() == 0
+
+    client.available = True
+    assert outbox.flush(client, force=True) == 10
+    assert outbox.pending_count() == 0
+
+def attempts(outbox, path):
+    return outbox._connection.execute("SELECT attempts FROM outbox WHERE path = ?", (path,)).fetchone()[0]
+
+def test_rewritten_write_starts_over_its_attempts(tmp_path):
+    client = FakeFirestore()
+    outbox = make_outbox(tmp_path)
+    outbox.enqueue([('update', FakeRef("links/deleted"), {"link": "x"})])
+    outbox.flush(client, force=True)
+    outbox.flush(client, force=True)
+    assert attempts(outbox, "links/deleted") == 2
+
+    # The new write is due at once and gets its own attempts before being dead-lettered
+    outbox.enqueue([('update', FakeRef("links/deleted"), {"link": "y"})])
+    assert attempts(outbox, "links/deleted") == 0
+    outbox.flush(client)
+    assert outbox.dead_letter_count() == 0
+    assert attempts(outbox, "links/deleted") == 1
+
+def test_failure_does_not_count_against_a_write_rewritten_in_flight(tmp_path):
+    client = FakeFirestore()
+    client.available = False
+    outbox = make_outbox(tmp_path)
+    outbox.enqueue([('set', FakeRef("links/p0"), {"link": 0})])
+
+    batch = client.batch
+    def rewrite_then_batch():
+        outbox.enqueue([('set', FakeRef("links/p0"), {"link": 1})])
+        return batch()
+    client.batch = rewrite_then_batch
+
+    assert outbox.flush(client, force=True) == 0
+    assert attempts(outbox, "links/p0") == 0
@@ -0,0 +1,24 @@
+from link_index import LinkIndex
+
+def product(product_id, *product_types):
+    return {"id": product_id, "link": f"https://shop/{product_id}", "product_types": list(product_types)}
+
+def test_removals_only_come_from_completed_product_types(tmp_path):
+    index = LinkIndex(str(tmp_path / 'link_index.db'))
+    index.record('Shop', [product("whey", "Whey"), product("creatine", "Creatine"),
+                          product("clear-whey", "Whey", "Isolate")], [], '2024-02-01')
+
+    # Only the Whey search ran (or succeeded) the next day and found nothing
+    removed = index.find_removed('Shop', '2024-02-02', {"Whey"})
+    # Clear whey is also an isolate, which was not searched, so it may still be listed
+    assert [product_id for product_id, _, _ in removed] == ["whey"]
+    assert {product_id for product_id, _, _ in index.find_removed('Shop', '2024-02-02', {"Whey", "Creatine", "Isolate"})} == {
+        "whey", "creatine", "clear-whey"}
+    assert index.find_removed('Shop', '2024-02-02', set()) == []
+
+def test_untyped_products_need_include_untyped(tmp_path):
+    index = LinkIndex(str(tmp_path / 'link_index.db'))
+    index.record('Shop', [{"id": "bar", "link": "https://shop/bar"}], [], '2024-02-01')
+
+    assert index.find_removed('Shop', '2024-02-02', {"Bars"}, include_untyped=False) == []
+    assert index.find_removed('Shop', '2024-02-02', {"Bars"}) == [("bar", "https://shop/bar", 'removed')]
@@ -0,0 +1,110 @@
+from general_link_search import save_or_update_product_links_to_firestore
+from shared.firestore_batch import commit_in_batches
+
+class FakeRef:
+    def __init__(self, path):
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.id = ref.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+class FakeCollection:
+    def __init__(self, path):
+        self.path = path
+
+    def document(self, document_id):
+        return FakeRef(f"{self.path}/{document_id}")
+
+class FakeFirestore:
+    """Client recording the multi-gets and the size of every committed batch."""
+
+    def __init__(self, documents=None):
+        self.documents = dict(documents or {})
+        self.get_all_calls = []
+        self.batch_sizes = []
+
+    def collection(self, path):
+        return FakeCollection(path)
+
+    def get_all(self, doc_refs):
+        self.get_all_calls.append(len(doc_refs))
+        return [FakeSnapshot(ref, self.documents.get(ref.path)) for ref in doc_refs]
+
+    def batch(self):
+        client = self
+
+        class Batch:
+            def __init__(self):
+                self.writes = []
+
+            def set(self, doc_ref, data):
+                self.writes.append(('set', doc_ref, data))
+
+            def update(self, doc_ref, data):
+                self.writes.append(('update', doc_ref, data))
+
+            def delete(self, doc_ref):
+                self.writes.append(('delete', doc_ref, None))
+
+            def commit(self):
+                client.batch_sizes.append(len(self.writes))
+                for operation, doc_ref, data in self.writes:
+                    if operation == 'set':
+                        client.documents[doc_ref.path] = dict(data)
+                    elif operation == 'update':
+                        client.documents[doc_ref.path].update(data)
+                    else:
+                        client.documents.pop(doc_ref.path, None)
+
+        return Batch()
+
+def saved_collections(client):
+    """Collections the saved documents were written to."""
+    return {path.rsplit('/', 1)[0] for path in client.documents}
+
+def test_save_counts_and_reads_in_one_multi_get():
+    client = FakeFirestore()
+    products = [{"id": f"p{index}", "link": f"https://shop/p{index}"} for index in range(3)]
+    assert save_or_update_product_links_to_firestore('Shop', products, client=client) == {
+        "inserted": 3, "updated": 0, "unchanged": 0}
+    [collection] = saved_collections(client)
+    assert collection.startswith('product_links/') and collection.endswith('/Shop')
+
+    products[1] = {"id": "p1", "link": "https://shop/p1-new"}
+    products.append({"id": "p3", "link": "https://shop/p3"})
+    assert save_or_update_product_links_to_firestore('Shop', products, client=client) == {
+        "inserted": 1, "updated": 1, "unchanged": 2}
+    # Every existing document is read in a single multi-get per save
+    assert client.get_all_calls == [3, 4]
+    assert client.documents[f"{collection}/p1"] == {"link": "https://shop/p1-new"}
+
+def test_unchanged_products_make_no_write():
+    client = FakeFirestore()
+    products = [{"id": "p0", "link": "https://shop/p0"}]
+    save_or_update_product_links_to_firestore('Shop', products, client=client)
+    batches = len(client.batch_sizes)
+
+    assert save_or_update_product_links_to_firestore('Shop', products, client=client) == {
+        "inserted": 0, "updated": 0, "unchanged": 1}
+    assert len(client.batch_sizes) == batches
+
+def test_writes_are_committed_in_batches_of_500():
+    client = FakeFirestore()
+    writes = [('set', FakeRef(f"links/p{index}"), {"link": index}) for index in range(1001)]
+    assert commit_in_batches(client, writes) == 3
+    assert client.batch_sizes == [500, 500, 1]
+    assert len(client.documents) == 1001
+
+def test_large_save_is_split_in_batches():
+    client = FakeFirestore()
+    products = [{"id": f"p{index}", "link": f"https://shop/p{index}"} for index in range(1001)]
+    assert save_or_update_product_links_to_firestore('Shop', products, client=client)["inserted"] == 1001
+    assert client.get_all_calls == [1001]
+    assert client.batch_sizes == [500, 500, 1]
@@ -0,0 +1,11 @@
+import pytest
+
+from general_link_search import parse_args
+
+def test_sharded_runs_reject_local_parallelism():
+    assert parse_args(['--shard-count', '2', '--shard-index', '1']).shard_count == 2
+    for flags in (['--workers', '4'], ['--async-pipeline']):
+        with pytest.raises(SystemExit):
+            parse_args(['--shard-count', '2', *flags])
+    # Without sharding the flags run the local worker pool as before
+    assert parse_args(['--workers', '4', '--async-pipeline']).workers == 4
@@ -0,0 +1,21 @@
+import fnmatch
+
+from brand_modules.request_blocking import blocked_url_patterns
+
+def is_blocked(url, patterns):
+    # setBlockedURLs patterns only know the "*" wildcard, which fnmatch treats the same way
+    return any(fnmatch.fnmatchcase(url, pattern) for pattern in patterns)
+
+def test_assets_with_query_strings_are_blocked():
+    patterns = blocked_url_patterns()
+    assert is_blocked("https://cdn.shop/image.jpg", patterns)
+    assert is_blocked("https://cdn.shop/image.jpg?w=300&h=300", patterns)
+    assert is_blocked("https://cdn.shop/fonts/brand.woff2?v=4", patterns)
+    assert not is_blocked("https://shop/search?text=Whey", patterns)
+    assert not is_blocked("https://shop/static/app.js?v=4", patterns)
+
+def test_brand_overrides():
+    patterns = blocked_url_patterns({"request_blocking": {"allow_urls": ["*.svg"], "block_urls": ["*chat-widget*"]}})
+    assert not is_blocked("https://cdn.shop/logo.svg?v=2", patterns)
+    assert is_blocked("https://cdn.shop/chat-widget.js", patterns)
+    assert blocked_url_patterns({"request_blocking": {"enabled": False}}) == []
@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+from selenium.common.exceptions import StaleElementReferenceException
+
+from brand_modules import session as session_module
+from brand_modules import waits
+from brand_modules.scheduling import rate_limiter
+from brand_modules.session import BrandSession
+
+ITEM_LOCATOR = ('css selector', '.result')
+
+class FakeItem:
+    """Result card that raises like a WebElement once its page was replaced."""
+
+    def __init__(self, product_id):
+        self.product_id = product_id
+        self.stale = False
+
+    def is_enabled(self):
+        if self.stale:
+            raise StaleElementReferenceException("element is not attached to the page document")
+        return True
+
+class FakeDriver:
+    """Browser showing one results page at a time; a submitted search replaces it after `delay` seconds."""
+
+    def __init__(self, results, delay):
+        self.results = results
+        self.delay = delay
+        self.items = []
+        self.loads = []
+        # Searches the page ignores, like a search box that does not react
+        self.ignored_searches = 0
+
+    def get(self, url):
+        self.loads.append(url)
+        self.replace([])
+
+    def replace(self, product_ids):
+        for item in self.items:
+            item.stale = True
+        self.items = [FakeItem(product_id) for product_id in product_ids]
+
+    def search(self, product_type):
+        if self.ignored_searches:
+            self.ignored_searches -= 1
+            return None
+        timer = threading.Timer(self.delay, self.replace, [self.results[product_type]])
+        timer.start()
+        return timer
+
+    def find_elements(self, by, value):
+        return list(self.items)
+
+class FakeSession(BrandSession):
+    brand_label = 'Fake'
+    item_locator = ITEM_LOCATOR
+
+    def submit_search(self, product_type, timeout=10):
+        self.driver.search(product_type)
+        return True
+
+    def extract(self, start=0):
+        # Same wait as the brand modules: the result cards exist and their count settled
+        items = waits.wait_until(self.driver, waits.results_stable(ITEM_LOCATOR, settle_time=0.2), 5)
+        return [{"id": item.product_id, "link": f"https://fake.shop/{item.product_id}"} for item in items[start:]]
+
+@pytest.fixture(autouse=True)
+def no_rate_limit():
+    rate = rate_limiter.rate
+    rate_limiter.configure(rate=0)
+    yield
+    rate_limiter.configure(rate=rate)
+
+def test_warm_search_waits_for_the_previous_results_to_be_replaced():
+    driver = FakeDriver({"Whey": ["whey-1", "whey-2"], "Creatine": ["creatine-1"]}, delay=0.8)
+    session = FakeSession(driver, 'https://fake.shop/')
+
+    assert [product["id"] for product in session.search('Whey')] == ["whey-1", "whey-2"]
+    # The second search is submitted from the Whey results page, which is slow to go away
+    assert [product["id"] for product in session.search('Creatine')] == ["creatine-1"]
+    assert driver.loads == ['https://fake.shop/']
+
+def test_warm_search_reloads_when_the_results_are_never_replaced(monkeypatch):
+    monkeypatch.setattr(session_module, 'RESULTS_REPLACED_TIMEOUT', 0.5)
+    driver = FakeDriver({"Whey": ["whey-1"], "Creatine": ["creatine-1"]}, delay=0.3)
+    session = FakeSession(driver, 'https://fake.shop/')
+    session.search('Whey')
+
+    # The warm search does nothing: the Whey results stay, so the search starts again from the homepage
+    driver.ignored_searches = 1
+    assert [product["id"] for product in session.search('Creatine')] == ["creatine-1"]
+    assert driver.loads == ['https://fake.shop/', 'https://fake.shop/']
@@ -0,0 +1,150 @@
+import pytest
+
+from brand_modules import static_fetch
+from brand_modules.prozis import ProzisSession
+from brand_modules.myprotein import MyProteinSession
+from brand_modules.zumub import ZumubSession
+from search_jobs import SearchJob
+
+from conftest import read_fixture
+
+PROZIS = 'https://www.prozis.com/pt/pt'
+MYPROTEIN = 'https://www.myprotein.pt/'
+ZUMUB = 'https://www.zumub.com/PT/'
+
+def parse(session_class, fixture, base_url):
+    return session_class.parse_item_links(static_fetch.parse_html(read_fixture(fixture)), base_url)
+
+def test_prozis_parse_item_links():
+    links = parse(ProzisSession, 'prozis_search.html', 'https://www.prozis.com/pt/pt/search?text=Whey')
+    assert links == [
+        {"id": "100-real-whey-protein-1000-g", "link": "https://www.prozis.com/pt/pt/prozis/100-real-whey-protein-1000-g",
+         "name": "100% Real Whey Protein 1000 g"},
+        {"id": "100-real-whey-isolate-1000-g", "link": "https://www.prozis.com/pt/pt/prozis/100-real-whey-isolate-1000-g",
+         "name": "100% Real Whey Isolate 1000 g"},
+    ]
+
+def test_myprotein_parse_item_links():
+    links = parse(MyProteinSession, 'myprotein_search_1.html', 'https://www.myprotein.pt/elysium.search?search=Whey')
+    assert links == [
+        {"id": "impact-whey-protein", "link": "https://www.myprotein.pt/sports-nutrition/impact-whey-protein/10530943.html",
+         "name": "Impact Whey Protein"},
+        {"id": "impact-whey-isolate", "link": "https://www.myprotein.pt/sports-nutrition/impact-whey-isolate/10530911.html",
+         "name": "Impact Whey Isolate"},
+    ]
+
+def test_zumub_parse_item_links():
+    links = parse(ZumubSession, 'zumub_search.html', 'https://www.zumub.com/PT/pesquisa?q=Whey')
+    assert links == [
+        {"id": "whey-protein-isolate-zumub", "link": "https://www.zumub.com/PT/produto/whey-protein-isolate-zumub",
+         "name": "Whey Protein Isolate - Zumub"},
+        {"id": "100-whey-gold-standard", "link": "https://www.zumub.com/PT/produto/100-whey-gold-standard",
+         "name": "100% Whey Gold Standard - Optimum Nutrition"},
+    ]
+
+@pytest.mark.parametrize("session_class, fixture, base_url, expected", [
+    (ProzisSession, 'prozis_home.html', PROZIS, ('https://www.prozis.com/pt/pt/search', 'text', {"lang": "pt"})),
+    (MyProteinSession, 'myprotein_home.html', MYPROTEIN, ('https://www.myprotein.pt/elysium.search', 'search', {})),
+    (ZumubSession, 'zumub_home.html', ZUMUB, ('https://www.zumub.com/PT/pesquisa', 'q', {})),
+])
+def test_find_search_form(session_class, fixture, base_url, expected):
+    soup = static_fetch.parse_html(read_fixture(fixture))
+    assert static_fetch.find_search_form(soup, base_url, session_class.search_input_selector) == expected
+
+def test_find_search_form_without_get_form():
+    # A search posted by JavaScript cannot be replayed with a plain GET request
+    soup = static_fetch.parse_html(read_fixture('js_search_home.html'))
+    assert static_fetch.find_search_form(soup, PROZIS, ProzisSession.search_input_selector) is None
+    soup = static_fetch.parse_html(read_fixture('empty_search.html'))
+    assert static_fetch.find_search_form(soup, PROZIS, ProzisSession.search_input_selector) is None
+
+def test_iter_static_search_submits_the_homepage_form(fake_http):
+    fake_http.routes = {
+        PROZIS: 'prozis_home.html',
+        'https://www.prozis.com/pt/pt/search?lang=pt&text=Whey': 'prozis_search.html',
+    }
+    products = list(ProzisSession.iter_static_search(PROZIS, 'Whey'))
+    assert [product["id"] for product in products] == ["100-real-whey-protein-1000-g", "100-real-whey-isolate-1000-g"]
+
+    # The homepage form is only fetched once per run
+    list(ProzisSession.iter_static_search(PROZIS, 'Whey'))
+    assert fake_http.requests.count(PROZIS) == 1
+
+def test_iter_static_search_follows_next_pages(fake_http):
+    fake_http.routes = {
+        MYPROTEIN: 'myprotein_home.html',
+        'https://www.myprotein.pt/elysium.search?search=Whey': 'myprotein_search_1.html',
+        'https://www.myprotein.pt/elysium.search?search=Whey&pageNumber=2': 'myprotein_search_2.html',
+    }
+    products = list(MyProteinSession.iter_static_search(MYPROTEIN, 'Whey'))
+    # The isolate listed on both pages is only yielded once
+    assert [product["id"] for product in products] == ["impact-whey-protein", "impact-whey-isolate", "clear-whey-isolate"]
+
+def test_iter_static_search_caps(fake_http):
+    fake_http.routes = {
+        MYPROTEIN: 'myprotein_home.html',
+        'https://www.myprotein.pt/elysium.search?search=Whey': 'myprotein_search_1.html',
+        'https://www.myprotein.pt/elysium.search?search=Whey&pageNumber=2': 'myprotein_search_2.html',
+    }
+    assert len(list(MyProteinSession.iter_static_search(MYPROTEIN, 'Whey', max_pages=1))) == 2
+    assert len(list(MyProteinSession.iter_static_search(MYPROTEIN, 'Whey', max_items=1))) == 1
+
+def test_empty_static_result_switches_the_brand_to_selenium(fake_http):
+    fake_http.routes = {
+        ZUMUB: 'zumub_home.html',
+        'https://www.zumub.com/PT/pesquisa?q=Whey': 'empty_search.html',
+    }
+    assert list(ZumubSession.iter_static_search(ZUMUB, 'Whey')) == []
+    assert static_fetch.uses_selenium_only('Zumub')
+
+    # Later searches of the brand skip the HTTP fast path without any request
+    requests = len(fake_http.requests)
+    assert list(ZumubSession.iter_static_search(ZUMUB, 'Isolate Whey')) == []
+    assert len(fake_http.requests) == requests
+
+def test_missing_search_form_falls_back(fake_http):
+    fake_http.routes = {PROZIS: 'js_search_home.html'}
+    assert list(ProzisSession.iter_static_search(PROZIS, 'Whey')) == []
+    assert static_fetch.uses_selenium_only('Prozis')
+
+class FakeSession:
+    """Selenium session stand-in that returns canned results."""
+
+    def __init__(self, products):
+        self.products = products
+        self.searches = []
+
+    def iter_search(self, product_type, max_pages=None, max_items=None):
+        self.searches.append(product_type)
+        yield from self.products
+
+def test_search_worker_falls_back_to_selenium(fake_http, monkeypatch):
+    from general_link_search import SearchWorker
+
+    fake_http.routes = {
+        ZUMUB: 'zumub_home.html',
+        'https://www.zumub.com/PT/pesquisa?q=Whey': 'empty_search.html',
+    }
+    selenium_products = [{"id": "whey-protein-isolate-zumub", "link": "https://www.zumub.com/PT/produto/whey-protein-isolate-zumub",
+                          "name": "Whey Protein Isolate - Zumub"}]
+    session = FakeSession(selenium_products)
+    worker = SearchWorker(fast_path=True)
+    monkeypatch.setattr(worker, 'session_for', lambda brand_name, brand_website: session)
+
+    assert worker.run(SearchJob('Zumub', ZUMUB, 'Whey')) == selenium_products
+    assert session.searches == ['Whey']
+
+def test_search_worker_uses_static_results(fake_http, monkeypatch):
+    from general_link_search import SearchWorker
+
+    fake_http.routes = {
+        ZUMUB: 'zumub_home.html',
+        'https://www.zumub.com/PT/pesquisa?q=Whey': 'zumub_search.html',
+    }
+    session = FakeSession([])
+    worker = SearchWorker(fast_path=True)
+    monkeypatch.setattr(worker, 'session_for', lambda brand_name, brand_website: session)
+
+    products = worker.run(SearchJob('Zumub', ZUMUB, 'Whey'))
+    assert [product["id"] for product in products] == ["whey-protein-isolate-zumub", "100-whey-gold-standard"]
+    assert session.searches == []
@@ -0,0 +1,27 @@
+import asyncio
+
+from async_pipeline import run_async_pipeline
+from search_jobs import SearchJob
+from worker_pool import run_worker_pool
+
+def broken_worker():
+    raise RuntimeError("chromedriver did not start")
+
+def test_jobs_are_failed_when_no_worker_starts():
+    jobs = [SearchJob('Shop', 'https://shop/', product_type) for product_type in ('Whey', 'Creatine', 'Bars')]
+    done = []
+    succeeded, failed = run_worker_pool(jobs, broken_worker, on_batch=lambda job, product_links: None,
+                                        on_job_done=lambda job, error: done.append((job.product_type, str(error))),
+                                        max_workers=2)
+    assert (succeeded, failed) == (0, 3)
+    assert sorted(product_type for product_type, _ in done) == ['Bars', 'Creatine', 'Whey']
+    assert all("chromedriver did not start" in error for _, error in done)
+
+def test_async_pipeline_fails_the_jobs_when_no_scraper_starts():
+    jobs = [SearchJob('Shop', 'https://shop/', product_type) for product_type in ('Whey', 'Creatine')]
+    done = []
+    succeeded, failed = asyncio.run(run_async_pipeline(
+        jobs, broken_worker, on_batch=lambda job, product_links: None,
+        on_job_done=lambda job, error: done.append(job.product_type), scrapers=2))
+    assert (succeeded, failed) == (0, 2)
+    assert sorted(done) == ['Creatine', 'Whey']
@@ -0,0 +1,163 @@
+import queue
+import logging
+import threading
+
+class JobQueue:
+    """Shared queue of search jobs that respects a concurrency cap per brand."""
+
+    def __init__(self, jobs, per_brand_limit=None, brand_limits=None):
+        self._pending = list(jobs)
+        self._running = {}
+        self._per_brand_limit = per_brand_limit
+        self._brand_limits = brand_limits or {}
+        self._condition = threading.Condition()
+
+    def _limit_for(self, brand_name):
+        return self._brand_limits.get(brand_name, self._per_brand_limit)
+
+    def _has_capacity(self, brand_name):
+        limit = self._limit_for(brand_name)
+        return limit is None or self._running.get(brand_name, 0) < limit
+
+    def claim(self):
+        """Take the next job whose brand is under its cap, or None once the queue is drained."""
+        with self._condition:
+            while self._pending:
+                for index, job in enumerate(self._pending):
+                    if self._has_capacity(job.brand_name):
+                        del self._pending[index]
+                        self._running[job.brand_name] = self._running.get(job.brand_name, 0) + 1
+                        return job
+                # Every remaining job belongs to a brand that is at its cap
+                self._condition.wait()
+            return None
+
+    def release(self, job):
+        """Mark a claimed job as finished so another job of the same brand can start."""
+        with self._condition:
+            self._running[job.brand_name] -= 1
+            self._condition.notify_all()
+
+    def drain(self):
+        """Remove and return the jobs no worker claimed."""
+        with self._condition:
+            jobs, self._pending = self._pending, []
+            self._condition.notify_all()
+            return jobs
+
+def fail_unclaimed(job_queue, on_job_done, error):
+    """
+    Report the jobs left in the queue once every worker stopped as failed; returns their count.
+
+    Without a worker to run them (e.g. no WebDriver could start) they would otherwise be
+    dropped without a trace and the run would look successful.
+    """
+    jobs = job_queue.drain()
+    if not jobs:
+        return 0
+    error = RuntimeError(f"No search worker was left to run the job: {error}")
+    logging.error(f"{len(jobs)} searches were never run, no search worker was left: {error}")
+    print(f"{len(jobs)} searches were never run, no search worker was left: {error}")
+    for job in jobs:
+        logging.error(f"Search for {job.product_type} on {job.brand_name} was never run.")
+        if on_job_done is not None:
+            on_job_done(job, error)
+    return len(jobs)
+
+def _worker_loop(worker_id, job_queue, results, create_worker):
+    """Own one browser worker and run jobs from the shared queue until it is empty or the worker fails."""
+    worker = None
+    try:
+        worker = create_worker()
+        logging.info(f"Worker {worker_id} started.")
+        while True:
+            job = job_queue.claim()
+            if job is None:
+                break
+            results.put(('start', job, None))
+            try:
+                for product_links in worker.iter_batches(job):
+                    results.put(('batch', job, product_links))
+                results.put(('done', job, None))
+            except Exception as e:
+                results.put(('done', job, e))
+            finally:
+                job_queue.release(job)
+    except Exception as e:
+        logging.critical(f"Worker {worker_id} failed: {e}")
+        print(f"Worker {worker_id} failed: {e}")
+        results.put(('failed', None, e))
+    finally:
+        if worker is not None:
+            worker.close()
+        logging.info(f"Worker {worker_id} closed its WebDriver.")
+        results.put(None)
+
+def run_worker_pool(jobs, create_worker, on_batch, on_job_done=None, max_workers=2,
+                    per_brand_limit=None, brand_limits=None, on_job_start=None):
+    """
+    Run search jobs on a pool of workers, each with its own WebDriver.
+
+    `create_worker()` is called once per pool thread and must return an object with
+    `iter_batches(job)` yielding lists of product links and `close()` releasing its browser.
+    Each batch is handed to `on_batch(job, product_links)` on the calling thread as soon as
+    it is produced, and `on_job_done(job, error)` (if given) once the job has finished, with
+    `error` None on success. `on_job_start(job)` (if given) is called when a worker picks a
+    job up. Jobs left unsearched because every worker failed are reported as failed.
+    Returns a (succeeded, failed) tuple of job counts.
+    """
+    job_queue = JobQueue(jobs, per_brand_limit, brand_limits)
+    worker_count = max(1, min(max_workers, len(jobs)))
+    # Bounded so workers pause instead of piling up batches while writes are slow
+    results = queue.Queue(maxsize=worker_count * 4)
+
+    threads = []
+    for worker_id in range(worker_count):
+        thread = threading.Thread(target=_worker_loop, name=f"search-worker-{worker_id}",
+                                  args=(worker_id, job_queue, results, create_worker),
+                                  daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    succeeded = failed = 0
+    save_errors = {}
+    worker_error = None
+    running = worker_count
+    while running:
+        result = results.get()
+        if result is None:
+            # A worker finished (or could not start); keep draining the others
+            running -= 1
+            continue
+
+        kind, job, payload = result
+        if kind == 'failed':
+            worker_error = payload
+            continue
+        if kind == 'start':
+            if on_job_start is not None:
+                on_job_start(job)
+            continue
+        if kind == 'batch':
+            try:
+                on_batch(job, payload)
+            except Exception as e:
+                save_errors.setdefault(job, e)
+            continue
+
+        # The job finished; it failed if the search raised or any of its batches could not be saved
+        error = payload or save_errors.pop(job, None)
+        if on_job_done is not None:
+            on_job_done(job, error)
+        if error is None:
+            succeeded += 1
+        else:
+            failed += 1
+            logging.error(f"Error searching for {job.product_type} on {job.brand_name}: {error}")
+            print(f"Error searching for {job.product_type} on {job.brand_name}: {error}")
+
+    for thread in threads:
+        thread.join()
+
+    failed += fail_unclaimed(job_queue, on_job_done, worker_error)
+    return succeeded, failed
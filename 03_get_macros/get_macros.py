@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from bs4 import BeautifulSoup
+
+# Modules shared by every stage live in ../shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import brand-specific product page parsers
+from macro_modules.registry import macro_parsers
+
+from page_cache import PageCache, DEFAULT_CACHE_PATH, content_hash
+from shared.fetcher import fetch_page, DomainThrottle
+from shared.firestore_client import get_db
+from shared.firestore_batch import commit_in_batches
+from shared.product_links import fetch_link_snapshots, current_links
+
+# Setup logging
+logging.basicConfig(filename='macros_log.log', level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+def fetch_product_links(brand_name, date, lookback_days):
+    """
+    Fetch the current product links of a brand on `date` (YYYY-MM-DD).
+
+    A full link search stores every product; a delta search (--delta) only the products
+    added, changed or removed since the previous run. The latest full search within
+    `lookback_days` is combined with the delta searches stored after it, leaving out removed
+    products, so a run on top of daily delta searches still sees the whole catalog. Unchanged
+    product pages are answered by the page cache.
+    """
+    day = datetime.strptime(date, '%Y-%m-%d')
+    snapshots = fetch_link_snapshots(get_db(), brand_name, day, lookback_days)
+    if snapshots and not snapshots[0].full:
+        logging.warning(f"No full link search of {brand_name} in the last {lookback_days} days, "
+                        f"only the products of its delta searches are processed.")
+        print(f"No full link search of {brand_name} in the last {lookback_days} days, "
+              f"only the products of its delta searches are processed.")
+    return [{"brand": brand_name, "id": product_id, "link": link}
+            for product_id, link in current_links(snapshots).items()]
+
+def process_product(product, cache, throttle, run_date, force=False):
+    """
+    Fetch one product page and parse its macros when the page changed since the last run.
+
+    Returns (outcome, macros, cache_entry). Only the 'changed' outcome carries macros to
+    write; its cache entry is stored once the write succeeded, so a failed write is retried
+    by the next run. Pages answered with 304 Not Modified or whose content hash did not
+    change are not parsed at all.
+    """
+    url = product["link"]
+    cached = None if force else cache.get(url)
+    result = fetch_page(url, cached, throttle)
+    if result.status == 'error':
+        return 'error', None, None
+    if result.status == 'not_modified':
+        cache.touch(url, run_date, result.etag, result.last_modified)
+        return 'not_modified', None, None
+
+    page_hash = content_hash(result.html)
+    if cached is not None and cached["content_hash"] == page_hash:
+        cache.touch(url, run_date, result.etag, result.last_modified)
+        return 'unchanged', None, None
+
+    parse_macros = macro_parsers[product["brand"]]
+    macros = parse_macros(BeautifulSoup(result.html, 'lxml'), url)
+    entry = (url, product["brand"], product["id"], result.etag, result.last_modified, page_hash, macros, run_date)
+    if macros is None or (cached is not None and cached["macros"] == macros):
+        # Nothing to write, but remember the new hash so the page is not parsed again
+        cache.store(*entry)
+        return 'no_macros' if macros is None else 'same_macros', None, None
+    return 'changed', macros, entry
+
+def save_macros_to_firestore(brand_name, changed, cache, client=None):
+    """
+    Write the macros of changed products in batches and record them in the page cache.
+
+    `changed` is a list of (macros, cache_entry) pairs; documents are stored under
+    product_macros/{brand}/products with the product ID as document ID.
+    """
+    client = client or get_db()
+    collection = client.collection(f"product_macros/{brand_name}/products")
+    writes = []
+    for macros, (url, _, product_id, _, _, _, _, run_date) in changed:
+        writes.append(('set', collection.document(product_id), dict(macros, link=url, updated_at=run_date)))
+    commit_in_batches(client, writes)
+    for _, entry in changed:
+        cache.store(*entry)
+    logging.info(f"Saved the macros of {len(changed)} {brand_name} products to Firestore.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract the macros of the products found by the link search.")
+    parser.add_argument('--date', default=None,
+                        help="Date of the link searches to read (YYYY-MM-DD, default today).")
+    parser.add_argument('--lookback-days', type=int, default=14,
+                        help="How many days back to look for the latest full link search of each brand.")
+    parser.add_argument('--brand', action='append', choices=sorted(macro_parsers),
+                        help="Only process this brand (repeatable).")
+    parser.add_argument('--workers', type=int, default=8, help="Number of product pages fetched at once.")
+    parser.add_argument('--rate-limit', type=float, default=2.0,
+                        help="Product page requests per second allowed per website domain (0 disables).")
+    parser.add_argument('--batch-size', type=int, default=200,
+                        help="Number of changed products written to Firestore at a time.")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="Path of the page cache database.")
+    parser.add_argument('--force', action='store_true', help="Ignore the page cache: parse and write every product.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    run_date = datetime.now().strftime('%Y-%m-%d')
+    date = args.date or run_date
+    brands = args.brand or list(macro_parsers)
+
+    products = []
+    for brand_name in brands:
+        brand_products = fetch_product_links(brand_name, date, args.lookback_days)
+        if not brand_products:
+            logging.warning(f"No product links for {brand_name} in the {args.lookback_days} days before {date}.")
+            print(f"No product links for {brand_name} in the {args.lookback_days} days before {date}.")
+        products.extend(brand_products)
+    logging.info(f"Extracting the macros of {len(products)} products current on {date}.")
+    print(f"Extracting the macros of {len(products)} products current on {date}.")
+
+    cache = PageCache(args.cache)
+    throttle = DomainThrottle(args.rate_limit)
+    outcomes = Counter()
+    pending = defaultdict(list)
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {executor.submit(process_product, product, cache, throttle, run_date, args.force): product
+                       for product in products}
+            for future in as_completed(futures):
+                product = futures[future]
+                try:
+                    outcome, macros, entry = future.result()
+                except Exception as e:
+                    logging.error(f"Error extracting the macros of {product['link']}: {e}")
+                    outcome, macros, entry = 'error', None, None
+                outcomes[outcome] += 1
+                if outcome == 'changed':
+                    pending[product["brand"]].append((macros, entry))
+                    if len(pending[product["brand"]]) >= args.batch_size:
+                        save_macros_to_firestore(product["brand"], pending.pop(product["brand"]), cache)
+        for brand_name, changed in pending.items():
+            save_macros_to_firestore(brand_name, changed, cache)
+    finally:
+        cache.close()
+
+    elapsed = time.perf_counter() - started
+    rate = len(products) / elapsed if elapsed > 0 else 0.0
+    summary = ", ".join(f"{outcome}={count}" for outcome, count in sorted(outcomes.items()))
+    logging.info(f"Processed {len(products)} product pages in {elapsed:.1f}s ({rate:.1f}/s): {summary}")
+    print(f"Processed {len(products)} product pages in {elapsed:.1f}s ({rate:.1f}/s): {summary}")
+
+if __name__ == "__main__":
+    main()
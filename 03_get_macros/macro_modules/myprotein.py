@@ -0,0 +1,8 @@
+from macro_modules.nutrition import parse_product_macros
+
+# Nutrition facts table of a MyProtein product page (inside the product description tabs)
+TABLE_SELECTORS = ('div.productDescription_contentProperties table', 'div.athenaProductPageSynopsisContent table')
+
+def parse_macros(soup, url):
+    """Parse the macros of a MyProtein product page."""
+    return parse_product_macros(soup, url, TABLE_SELECTORS)
@@ -0,0 +1,185 @@
+import re
+import json
+import logging
+
+# Macro fields stored for every product, per 100 g (or 100 ml) unless the page only gives servings
+MACRO_FIELDS = ('energy_kcal', 'protein_g', 'carbs_g', 'sugars_g', 'fat_g', 'saturated_fat_g', 'fiber_g', 'salt_g')
+
+# Nutrition table labels (Portuguese and English), most specific first: "dos quais açúcares"
+# must not be read as carbohydrates, nor "dos quais saturados" as fat
+ROW_LABELS = (
+    ('sugars_g', re.compile(r'a[çc][úu]car|sugar', re.IGNORECASE)),
+    ('saturated_fat_g', re.compile(r'saturad', re.IGNORECASE)),
+    ('energy_kcal', re.compile(r'energ|calori', re.IGNORECASE)),
+    ('protein_g', re.compile(r'prote[íi]n', re.IGNORECASE)),
+    ('carbs_g', re.compile(r'hidratos|carboidrato|carbohydrate', re.IGNORECASE)),
+    ('fat_g', re.compile(r'l[íi]pido|gordura|\bfat\b', re.IGNORECASE)),
+    ('fiber_g', re.compile(r'fibra|fibre|fiber', re.IGNORECASE)),
+    ('salt_g', re.compile(r'^\s*(sal|salt)\b', re.IGNORECASE)),
+)
+
+NUMBER = re.compile(r'(\d+(?:[.,]\d+)?)')
+KCAL = re.compile(r'(\d+(?:[.,]\d+)?)\s*kcal', re.IGNORECASE)
+KJ = re.compile(r'(\d+(?:[.,]\d+)?)\s*kj', re.IGNORECASE)
+PER_100 = re.compile(r'100\s*(g|ml)', re.IGNORECASE)
+
+# schema.org NutritionInformation properties
+JSON_LD_FIELDS = {
+    'calories': 'energy_kcal',
+    'proteinContent': 'protein_g',
+    'carbohydrateContent': 'carbs_g',
+    'sugarContent': 'sugars_g',
+    'fatContent': 'fat_g',
+    'saturatedFatContent': 'saturated_fat_g',
+    'fiberContent': 'fiber_g',
+}
+
+def parse_number(text):
+    """Return the first number in a text such as '<0,5 g' or '21.3g', or None."""
+    match = NUMBER.search(text or '')
+    return float(match.group(1).replace(',', '.')) if match else None
+
+def parse_energy_kcal(text):
+    """Return the kcal of an energy value such as '1590 kJ / 376 kcal', converting kJ when needed."""
+    match = KCAL.search(text or '')
+    if match:
+        return float(match.group(1).replace(',', '.'))
+    match = KJ.search(text or '')
+    if match:
+        return round(float(match.group(1).replace(',', '.')) / 4.184, 1)
+    return parse_number(text)
+
+def field_for_label(label):
+    for field, pattern in ROW_LABELS:
+        if pattern.search(label):
+            return field
+    return None
+
+def iter_json_ld(soup):
+    """Yield every JSON object embedded in the page's application/ld+json scripts."""
+    for script in soup.select('script[type="application/ld+json"]'):
+        try:
+            data = json.loads(script.string or '')
+        except ValueError:
+            continue
+        stack = [data]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(item)
+            elif isinstance(item, dict):
+                yield item
+                stack.extend(value for value in item.values() if isinstance(value, (dict, list)))
+
+def macros_from_json_ld(soup):
+    """Read the macros from a schema.org NutritionInformation object, if the page has one."""
+    for item in iter_json_ld(soup):
+        nutrition = item.get('nutrition')
+        if not isinstance(nutrition, dict):
+            continue
+        macros = {}
+        for key, field in JSON_LD_FIELDS.items():
+            if key in nutrition:
+                value = str(nutrition[key])
+                macros[field] = parse_energy_kcal(value) if field == 'energy_kcal' else parse_number(value)
+        if 'sodiumContent' in nutrition:
+            sodium = parse_number(str(nutrition['sodiumContent']))
+            if sodium is not None:
+                # Salt is reported as sodium x 2.5 on EU labels; schema.org pages give sodium in g or mg
+                grams = sodium / 1000 if 'mg' in str(nutrition['sodiumContent']).lower() else sodium
+                macros['salt_g'] = round(grams * 2.5, 2)
+        if macros.get('protein_g') is not None:
+            macros['basis'] = 'serving' if nutrition.get('servingSize') else '100g'
+            if nutrition.get('servingSize'):
+                macros['serving_size'] = str(nutrition['servingSize'])
+            macros['source'] = 'json-ld'
+            return macros
+    return None
+
+def cell_texts(row):
+    return [cell.get_text(' ', strip=True) for cell in row.find_all(['th', 'td'])]
+
+def macros_from_table(table):
+    """
+    Read the macros from a nutrition facts table.
+
+    The value column is the one whose header mentions 100 g/ml, or the first value column.
+    Energy given on two rows (kJ, then kcal) keeps the kcal row.
+    """
+    rows = [cell_texts(row) for row in table.find_all('tr')]
+    column = 0
+    basis = 'serving'
+    for cells in rows:
+        for index, text in enumerate(cells[1:]):
+            if PER_100.search(text):
+                column, basis = index, '100g'
+                break
+        else:
+            continue
+        break
+
+    macros = {}
+    for cells in rows:
+        if len(cells) < 2:
+            continue
+        field = field_for_label(cells[0])
+        if field is None or column + 1 >= len(cells):
+            continue
+        value = cells[column + 1]
+        if field == 'energy_kcal':
+            text = f"{cells[0]} {value}".lower()
+            if 'kcal' in text:
+                parsed = parse_energy_kcal(value if 'kcal' in value.lower() else f"{value} kcal")
+            elif field not in macros:
+                parsed = parse_energy_kcal(f"{value} kJ" if 'kj' in text else value)
+            else:
+                continue
+        elif field in macros:
+            continue
+        else:
+            parsed = parse_number(value)
+        if parsed is not None:
+            macros[field] = parsed
+
+    if macros.get('protein_g') is None:
+        return None
+    macros['basis'] = basis
+    macros['source'] = 'table'
+    return macros
+
+def find_nutrition_table(soup, selectors):
+    """Return the first table matching the brand selectors, else any table with a protein row."""
+    for selector in selectors:
+        table = soup.select_one(selector)
+        if table is not None:
+            return table
+    for table in soup.find_all('table'):
+        if any(field_for_label(cells[0]) == 'protein_g'
+               for cells in (cell_texts(row) for row in table.find_all('tr')) if cells):
+            return table
+    return None
+
+def product_name(soup):
+    """Return the product name from the og:title meta tag or the first heading."""
+    meta = soup.select_one('meta[property="og:title"][content]')
+    if meta is not None:
+        return meta['content'].strip()
+    heading = soup.find('h1')
+    return heading.get_text(' ', strip=True) if heading is not None else None
+
+def parse_product_macros(soup, url, table_selectors):
+    """
+    Parse the macros of a product page: JSON-LD nutrition data first, then the nutrition table.
+
+    Returns a dictionary with the MACRO_FIELDS found, "basis", "source" and "name", or None
+    when the page has no recognizable nutrition facts (e.g. accessories).
+    """
+    macros = macros_from_json_ld(soup)
+    if macros is None:
+        table = find_nutrition_table(soup, table_selectors)
+        macros = macros_from_table(table) if table is not None else None
+    if macros is None:
+        logging.info(f"No nutrition facts found on {url}.")
+        return None
+    macros['name'] = product_name(soup)
+    return macros
@@ -0,0 +1,8 @@
+from macro_modules.nutrition import parse_product_macros
+
+# Nutrition facts table of a Prozis product page
+TABLE_SELECTORS = ('div.nutritional-info table', 'table.nutritional-table', '#nutritional-info table')
+
+def parse_macros(soup, url):
+    """Parse the macros of a Prozis product page."""
+    return parse_product_macros(soup, url, TABLE_SELECTORS)
@@ -0,0 +1,11 @@
+# Import brand-specific product page parsers
+from macro_modules import prozis
+from macro_modules import myprotein
+from macro_modules import zumub
+
+# Dictionary mapping brand name to the function that parses the macros of its product pages
+macro_parsers = {
+    "Prozis": prozis.parse_macros,
+    "MyProtein": myprotein.parse_macros,
+    "Zumub": zumub.parse_macros,
+}
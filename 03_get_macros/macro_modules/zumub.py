@@ -0,0 +1,8 @@
+from macro_modules.nutrition import parse_product_macros
+
+# Nutrition facts table of a Zumub product page
+TABLE_SELECTORS = ('div#nutritional-information table', 'div.nutritional-information table', 'table.nutrition-table')
+
+def parse_macros(soup, url):
+    """Parse the macros of a Zumub product page."""
+    return parse_product_macros(soup, url, TABLE_SELECTORS)
@@ -0,0 +1,85 @@
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+
+# Default location of the product page cache, next to macros_log.log
+DEFAULT_CACHE_PATH = 'page_cache.db'
+
+# Markup that changes on every request without changing the product (scripts, CSRF tokens, nonces);
+# JSON-LD scripts are kept because they can carry the nutrition facts
+VOLATILE_MARKUP = re.compile(
+    r'<script\b(?![^>]*application/ld\+json).*?</script>|<style\b.*?</style>|<noscript\b.*?</noscript>|\s(nonce|data-csrf[\w-]*)="[^"]*"',
+    re.IGNORECASE | re.DOTALL
+)
+WHITESPACE = re.compile(r'\s+')
+
+def content_hash(html):
+    """Hash a page without its volatile markup, so reloading an unchanged product gives the same hash."""
+    text = WHITESPACE.sub(' ', VOLATILE_MARKUP.sub('', html))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class PageCache:
+    """
+    Local SQLite cache of the product pages seen by earlier runs.
+
+    Each URL keeps the ETag and Last-Modified headers used for conditional requests, the
+    content hash of the page and the macros parsed from it, so unchanged pages are neither
+    parsed nor written to Firestore again.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    brand TEXT NOT NULL,
+                    product_id TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT,
+                    macros TEXT,
+                    checked_at TEXT NOT NULL,
+                    changed_at TEXT NOT NULL
+                )
+            """)
+
+    def get(self, url):
+        """Return the cached entry of a URL as a dictionary, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT etag, last_modified, content_hash, macros FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, page_hash, macros = row
+        return {"etag": etag, "last_modified": last_modified, "content_hash": page_hash,
+                "macros": json.loads(macros) if macros else None}
+
+    def store(self, url, brand, product_id, etag, last_modified, page_hash, macros, run_date):
+        """Store a page whose content changed (or was seen for the first time)."""
+        with self._lock, self._connection:
+            self._connection.execute("""
+                INSERT INTO pages (url, brand, product_id, etag, last_modified, content_hash, macros, checked_at, changed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    etag = excluded.etag, last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash, macros = excluded.macros,
+                    checked_at = excluded.checked_at, changed_at = excluded.changed_at
+            """, (url, brand, product_id, etag, last_modified, page_hash,
+                  json.dumps(macros, sort_keys=True) if macros is not None else None, run_date, run_date))
+
+    def touch(self, url, run_date, etag=None, last_modified=None):
+        """Record that an unchanged page was checked, refreshing its validators when the server sent new ones."""
+        with self._lock, self._connection:
+            self._connection.execute("""
+                UPDATE pages SET checked_at = ?, etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+                WHERE url = ?
+            """, (run_date, etag, last_modified, url))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from bs4 import BeautifulSoup
+
+# Modules shared by every stage live in ../shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_parsing import parse_price
+from price_store import PriceStore, DEFAULT_STORE_PATH
+from revisit_scheduler import RevisitScheduler, DEFAULT_SCHEDULE_PATH
+from shared.fetcher import fetch_page, DomainThrottle
+from shared.firestore_client import get_db
+from shared.firestore_batch import commit_in_batches
+from shared.product_links import fetch_link_snapshots, current_links
+
+# Setup logging
+logging.basicConfig(filename='prices_log.log', level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+def fetch_brand_names():
+    """Fetch the names of the brands to track from Firestore."""
+    return [doc.to_dict()['name'] for doc in get_db().collection('brands').stream()]
+
+def fetch_product_links(brand_name, day, lookback_days):
+    """
+    Fetch the current product links of a brand from its latest link searches.
+
+    A full link search stores every product; a delta search (--delta) only the products
+    added, changed or removed since the previous run. The links of the latest full search
+    within `lookback_days` are combined with the delta searches stored after it, leaving out
+    removed products. Returns ({product_id: link}, snapshots read, oldest first).
+    """
+    snapshots = fetch_link_snapshots(get_db(), brand_name, day, lookback_days)
+    if snapshots and not snapshots[0].full:
+        logging.warning(f"No full link search of {brand_name} in the last {lookback_days} days, "
+                        f"only the products of its delta searches are tracked.")
+        print(f"No full link search of {brand_name} in the last {lookback_days} days, "
+              f"only the products of its delta searches are tracked.")
+    return current_links(snapshots), snapshots
+
+def fetch_price(link, throttle):
+    result = fetch_page(link, throttle=throttle)
+    if result.status != 'ok':
+        return None
+    return parse_price(BeautifulSoup(result.html, 'lxml'))
+
+def fetch_prices(links, workers, throttle):
+    """Fetch the current price of every product concurrently; returns {product_id: price}."""
+    prices = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_price, link, throttle): product_id for product_id, link in links.items()}
+        for future in as_completed(futures):
+            product_id = futures[future]
+            try:
+                price = future.result()
+            except Exception as e:
+                logging.error(f"Error fetching the price of {links[product_id]}: {e}")
+                continue
+            if price is None:
+                logging.warning(f"No price found on {links[product_id]}.")
+            else:
+                prices[product_id] = price
+    return prices
+
+def sync_latest_prices_to_firestore(brand_name, summaries, day, client=None):
+    """
+    Write the latest price and delta of the products that are new or changed price on `day`.
+
+    Only this summary lives in Firestore (product_prices/{brand}/products); the full history
+    stays in the local price store. Returns the number of documents written.
+    """
+    client = client or get_db()
+    collection = client.collection(f"product_prices/{brand_name}/products")
+    # "last_seen" moves every day, so it is left out to keep unchanged prices free of writes
+    writes = [('set', collection.document(product_id), {key: value for key, value in summary.items() if key != 'last_seen'})
+              for product_id, summary in summaries.items() if summary["changed_on"] == day]
+    commit_in_batches(client, writes)
+    return len(writes)
+
+def record_snapshots(scheduler, brand_name, snapshots):
+    """Feed the link snapshots read for a brand to the revisit scheduler, oldest first."""
+    for snapshot in snapshots:
+        if snapshot.full:
+            scheduler.record_snapshot(brand_name, snapshot.date, snapshot.links())
+        else:
+            scheduler.record_changes(brand_name, snapshot.date, snapshot.changes())
+
+def plan_visits(scheduler, links_by_brand, day, budget):
+    """Keep only the products the revisit scheduler selects for today, most likely changed first."""
+    planned = defaultdict(dict)
+    for brand_name, product_id, link in scheduler.plan(day, budget, set(links_by_brand)):
+        planned[brand_name][product_id] = link
+    stats = scheduler.stats(day)
+    selected = sum(len(links) for links in planned.values())
+    logging.info(f"Revisit schedule: {selected} of {stats['due']} due products selected (budget {budget}), "
+                 f"{stats['tracked'] - stats['removed'] - stats['due']} stable products skipped.")
+    print(f"Revisit schedule: {selected} of {stats['due']} due products selected (budget {budget}), "
+          f"{stats['tracked'] - stats['removed'] - stats['due']} stable products skipped.")
+    return planned
+
+def record_visits(scheduler, brand_name, day, prices, summaries):
+    """Feed the prices found today to the revisit scheduler; a price differing from the last observation is a change."""
+    for product_id in prices:
+        summary = summaries[product_id]
+        changed = summary["changed_on"] == day and summary["previous_price"] is not None
+        scheduler.record_visit(brand_name, product_id, day, changed)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Record today's product prices and sync the latest prices.")
+    parser.add_argument('--brand', action='append', help="Only track this brand (repeatable).")
+    parser.add_argument('--lookback-days', type=int, default=14,
+                        help="How many days back to look for the latest full link search of each brand.")
+    parser.add_argument('--workers', type=int, default=8, help="Number of product pages fetched at once.")
+    parser.add_argument('--rate-limit', type=float, default=2.0,
+                        help="Product page requests per second allowed per website domain (0 disables).")
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH, help="Directory of the local price history.")
+    parser.add_argument('--history-days', type=int, default=90,
+                        help="How many days of price history are read to find the previous price of today's products.")
+    parser.add_argument('--no-sync', action='store_true', help="Only update the local price history.")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="Only visit the products the revisit scheduler expects to have changed.")
+    parser.add_argument('--budget', type=int, default=1000, help="Maximum number of product pages visited per run.")
+    parser.add_argument('--min-interval', type=int, default=1, help="Minimum number of days between two visits.")
+    parser.add_argument('--max-interval', type=int, default=14, help="Maximum number of days between two visits.")
+    parser.add_argument('--schedule', default=DEFAULT_SCHEDULE_PATH, help="Path of the revisit schedule database.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    today = datetime.now()
+    day = today.strftime('%Y-%m-%d')
+    store = PriceStore(args.store)
+    # Today's changes only need the previous observation of each product, so the daily run reads
+    # the last months of partitions instead of the whole history, and never less than the longest revisit interval
+    history_start = (today - timedelta(days=max(args.history_days, args.max_interval))).strftime('%Y-%m-%d')
+    throttle = DomainThrottle(args.rate_limit)
+    scheduler = RevisitScheduler(args.schedule, args.min_interval, args.max_interval) if args.adaptive else None
+
+    links_by_brand = {}
+    for brand_name in args.brand or fetch_brand_names():
+        links, snapshots = fetch_product_links(brand_name, today, args.lookback_days)
+        if not snapshots:
+            logging.warning(f"No product links for {brand_name} in the last {args.lookback_days} days.")
+            print(f"No product links for {brand_name} in the last {args.lookback_days} days.")
+            continue
+        links_by_brand[brand_name] = links
+        if scheduler is not None:
+            record_snapshots(scheduler, brand_name, snapshots)
+    if scheduler is not None:
+        links_by_brand = plan_visits(scheduler, links_by_brand, day, args.budget)
+
+    for brand_name, links in links_by_brand.items():
+        started = time.perf_counter()
+        prices = fetch_prices(links, args.workers, throttle)
+        appended = store.append(brand_name, day, prices)
+        summaries = store.latest(brand_name, start=history_start)
+        if scheduler is not None:
+            record_visits(scheduler, brand_name, day, prices, summaries)
+        changed = sum(1 for summary in summaries.values() if summary["changed_on"] == day)
+        synced = 0 if args.no_sync else sync_latest_prices_to_firestore(brand_name, summaries, day)
+        elapsed = time.perf_counter() - started
+        logging.info(f"{brand_name}: {len(prices)}/{len(links)} prices found, {appended} recorded, "
+                     f"{changed} new or changed, {synced} synced in {elapsed:.1f}s.")
+        print(f"{brand_name}: {len(prices)}/{len(links)} prices found, {appended} recorded, "
+              f"{changed} new or changed, {synced} synced in {elapsed:.1f}s.")
+    if scheduler is not None:
+        scheduler.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse
+
+from price_store import PriceStore, DEFAULT_STORE_PATH
+
+def print_changes(store, args):
+    for product_id, day, old_price, new_price in store.changes(args.brand, args.start, args.end):
+        print(f"{day}  {product_id:<50}{old_price:>10.2f} -> {new_price:.2f}")
+
+def print_range(store, args):
+    for product_id, (low, high) in sorted(store.min_max(args.brand, args.start, args.end).items()):
+        print(f"{product_id:<50}{low:>10.2f}{high:>10.2f}")
+
+def print_latest(store, args):
+    for product_id, summary in sorted(store.latest(args.brand, args.start, args.end).items()):
+        delta = f"{summary['delta']:+.2f}" if summary['delta'] is not None else ''
+        print(f"{product_id:<50}{summary['price']:>10.2f}{delta:>10}  since {summary['changed_on']}")
+
+def print_moving_average(store, args):
+    for day, average in store.moving_average(args.brand, args.product, args.window, args.start, args.end):
+        print(f"{day}  {average:.2f}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Query the local price history.")
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH, help="Directory of the local price history.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, handler, help_text in (('changes', print_changes, "List every price change."),
+                                     ('range', print_range, "Show the minimum and maximum price of each product."),
+                                     ('latest', print_latest, "Show the latest price and last change of each product."),
+                                     ('moving-average', print_moving_average, "Show the moving average of one product.")):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument('brand', help="Brand name, e.g. Prozis.")
+        subparser.add_argument('--start', help="First day (YYYY-MM-DD).")
+        subparser.add_argument('--end', help="Last day (YYYY-MM-DD).")
+        subparser.set_defaults(handler=handler)
+        if name == 'moving-average':
+            subparser.add_argument('product', help="Product ID.")
+            subparser.add_argument('--window', type=int, default=7, help="Number of observations averaged.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.handler(PriceStore(args.store), args)
+
+if __name__ == "__main__":
+    main()
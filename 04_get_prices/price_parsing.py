@@ -0,0 +1,51 @@
+import re
+import json
+
+PRICE = re.compile(r'(\d+(?:[.,]\d{3})*(?:[.,]\d{1,2})?)')
+
+def parse_price_text(text):
+    """Parse a price such as '29,99 €', '€1.299,00' or '29.99' into a float, or None."""
+    match = PRICE.search(text or '')
+    if not match:
+        return None
+    number = match.group(1)
+    # The last separator followed by one or two digits is the decimal separator
+    decimal = re.search(r'[.,](\d{1,2})$', number)
+    if decimal:
+        whole = re.sub(r'[.,]', '', number[:decimal.start()])
+        return float(f"{whole}.{decimal.group(1)}")
+    return float(re.sub(r'[.,]', '', number))
+
+def price_from_json_ld(soup):
+    """Return the price of the first schema.org Offer found in the page's JSON-LD, or None."""
+    for script in soup.select('script[type="application/ld+json"]'):
+        try:
+            stack = [json.loads(script.string or '')]
+        except ValueError:
+            continue
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(item)
+            elif isinstance(item, dict):
+                offers = item.get('offers')
+                for offer in offers if isinstance(offers, list) else [offers]:
+                    if isinstance(offer, dict):
+                        price = offer.get('price', offer.get('lowPrice'))
+                        if price is not None:
+                            return parse_price_text(str(price))
+                stack.extend(value for value in item.values() if isinstance(value, (dict, list)))
+    return None
+
+def parse_price(soup):
+    """Return the current price of a product page: JSON-LD offers first, then the price meta tags."""
+    price = price_from_json_ld(soup)
+    if price is not None:
+        return price
+    for selector in ('meta[itemprop="price"][content]', 'meta[property="product:price:amount"][content]',
+                     'meta[property="og:price:amount"][content]'):
+        tag = soup.select_one(selector)
+        if tag is not None:
+            return parse_price_text(tag['content'])
+    tag = soup.select_one('[itemprop="price"]')
+    return parse_price_text(tag.get('content') or tag.get_text()) if tag is not None else None
@@ -0,0 +1,222 @@
+import os
+import json
+import threading
+from datetime import date, timedelta
+import numpy as np
+
+# Default location of the local price history, next to prices_log.log
+DEFAULT_STORE_PATH = 'price_store'
+
+EPOCH = date(1970, 1, 1)
+
+# One raw binary file per column and partition: appending a day never rewrites earlier rows,
+# and a partition is read back with one np.fromfile per column
+COLUMNS = {"product": np.int32, "day": np.int32, "price_cents": np.int32}
+
+def day_number(day):
+    """Return the number of days since 1970-01-01 of a date or a 'YYYY-MM-DD' string."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return (day - EPOCH).days
+
+def day_from_number(number):
+    return EPOCH + timedelta(days=int(number))
+
+def month_of(day):
+    """Return the 'YYYY-MM' partition of a day number."""
+    return day_from_number(day).strftime('%Y-%m')
+
+class PriceColumns:
+    """Price observations as column arrays, sorted by product and day."""
+
+    def __init__(self, product, day, price_cents, product_ids):
+        order = np.lexsort((day, product))
+        self.product = product[order]
+        self.day = day[order]
+        self.price_cents = price_cents[order]
+        self.product_ids = product_ids
+        # Start and end (exclusive) of the rows of each product
+        self.ends = np.flatnonzero(np.r_[self.product[1:] != self.product[:-1], True]) + 1
+        self.starts = np.r_[0, self.ends[:-1]] if len(self.product) else self.ends
+
+    def __len__(self):
+        return len(self.product)
+
+    def ids(self, codes):
+        return [self.product_ids[code] for code in codes]
+
+    def change_mask(self):
+        """True on the rows whose price differs from the previous observation of the same product."""
+        mask = np.zeros(len(self.product), dtype=bool)
+        if len(self.product) > 1:
+            mask[1:] = (self.product[1:] == self.product[:-1]) & (self.price_cents[1:] != self.price_cents[:-1])
+        return mask
+
+class PriceStore:
+    """
+    Append-only local price history, partitioned by brand and month.
+
+    Each partition (`{path}/{brand}/{YYYY-MM}/`) holds the product code, day and price in
+    cents of every observation as raw int32 columns. Product IDs are dictionary-encoded per
+    brand in `{path}/{brand}/products.json`. Queries load the partitions of a day range into
+    numpy arrays and run vectorized over all products at once.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _brand_dir(self, brand):
+        return os.path.join(self.path, brand)
+
+    def product_ids(self, brand):
+        """Return the dictionary of product IDs of a brand; the index of an ID is its product code."""
+        path = os.path.join(self._brand_dir(brand), 'products.json')
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _encode(self, brand, product_ids):
+        """Return the product codes of `product_ids`, adding unknown IDs to the brand dictionary."""
+        known = self.product_ids(brand)
+        codes = {product_id: code for code, product_id in enumerate(known)}
+        added = [product_id for product_id in dict.fromkeys(product_ids) if product_id not in codes]
+        if added:
+            for product_id in added:
+                codes[product_id] = len(known)
+                known.append(product_id)
+            # Written before the columns that reference the new codes, and replaced atomically
+            path = os.path.join(self._brand_dir(brand), 'products.json')
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(known, f)
+            os.replace(path + '.tmp', path)
+        return np.array([codes[product_id] for product_id in product_ids], dtype=np.int32)
+
+    def partitions(self, brand, start=None, end=None):
+        """Return the month partitions of a brand overlapping the [start, end] day number range."""
+        brand_dir = self._brand_dir(brand)
+        if not os.path.isdir(brand_dir):
+            return []
+        first = month_of(start) if start is not None else None
+        last = month_of(end) if end is not None else None
+        months = sorted(name for name in os.listdir(brand_dir) if os.path.isdir(os.path.join(brand_dir, name)))
+        return [os.path.join(brand_dir, month) for month in months
+                if (first is None or month >= first) and (last is None or month <= last)]
+
+    def _read_partition(self, partition):
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            path = os.path.join(partition, f"{name}.bin")
+            columns[name] = np.fromfile(path, dtype=dtype) if os.path.exists(path) else np.empty(0, dtype=dtype)
+        # An append interrupted between column files leaves a ragged tail, which is ignored
+        rows = min(len(values) for values in columns.values())
+        return {name: values[:rows] for name, values in columns.items()}
+
+    def append(self, brand, day, prices):
+        """
+        Append the prices of one day, given as {product_id: price}, to the brand's partition.
+
+        Products already recorded for that day are skipped, so re-running a day's ingestion
+        does not duplicate it. Returns the number of observations appended.
+        """
+        day = day_number(day)
+        with self._lock:
+            partition = os.path.join(self._brand_dir(brand), month_of(day))
+            os.makedirs(partition, exist_ok=True)
+            existing = self._read_partition(partition)
+            recorded = set(existing["product"][existing["day"] == day].tolist())
+
+            product_ids = list(prices)
+            codes = self._encode(brand, product_ids)
+            keep = np.array([code not in recorded for code in codes.tolist()], dtype=bool)
+            if not keep.any():
+                return 0
+            new_rows = {
+                "product": codes[keep],
+                "day": np.full(int(keep.sum()), day, dtype=np.int32),
+                "price_cents": np.round(np.array([prices[product_id] for product_id in product_ids],
+                                                 dtype=np.float64) * 100).astype(np.int32)[keep],
+            }
+            for name, values in new_rows.items():
+                with open(os.path.join(partition, f"{name}.bin"), 'ab') as f:
+                    values.astype(COLUMNS[name]).tofile(f)
+            return int(keep.sum())
+
+    def load(self, brand, start=None, end=None):
+        """Load the observations of a brand between two days (inclusive) as PriceColumns."""
+        start = day_number(start) if start is not None else None
+        end = day_number(end) if end is not None else None
+        parts = [self._read_partition(partition) for partition in self.partitions(brand, start, end)]
+        columns = {name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0, dtype=dtype)
+                   for name, dtype in COLUMNS.items()}
+        mask = np.ones(len(columns["day"]), dtype=bool)
+        if start is not None:
+            mask &= columns["day"] >= start
+        if end is not None:
+            mask &= columns["day"] <= end
+        return PriceColumns(columns["product"][mask], columns["day"][mask], columns["price_cents"][mask],
+                            self.product_ids(brand))
+
+    def latest(self, brand, start=None, end=None):
+        """
+        Return {product_id: summary} with the latest price of every product and its last change.
+
+        The summary holds "price", "previous_price" and "delta" (None for products whose price
+        never changed), "changed_on" (day of the last change, or first observation) and
+        "last_seen", prices in euros and days as 'YYYY-MM-DD'.
+        """
+        columns = self.load(brand, start, end)
+        if not len(columns):
+            return {}
+        last = columns.ends - 1
+        # Index of the latest change row of each product; changes of earlier products fall before its start
+        change_rows = np.where(columns.change_mask(), np.arange(len(columns)), -1)
+        last_change = np.maximum.accumulate(change_rows)[last]
+        changed = last_change >= columns.starts
+        change_day = np.where(changed, columns.day[last_change], columns.day[columns.starts])
+        previous = np.where(changed, columns.price_cents[np.maximum(last_change - 1, 0)], columns.price_cents[last])
+
+        summaries = {}
+        for index, product_id in enumerate(columns.ids(columns.product[last])):
+            price = int(columns.price_cents[last[index]])
+            summaries[product_id] = {
+                "price": price / 100,
+                "previous_price": int(previous[index]) / 100 if changed[index] else None,
+                "delta": (price - int(previous[index])) / 100 if changed[index] else None,
+                "changed_on": day_from_number(change_day[index]).isoformat(),
+                "last_seen": day_from_number(columns.day[last[index]]).isoformat(),
+            }
+        return summaries
+
+    def changes(self, brand, start=None, end=None):
+        """Return (product_id, day, old_price, new_price) for every price change in the range."""
+        columns = self.load(brand, start, end)
+        rows = np.flatnonzero(columns.change_mask())
+        return [(product_id, day_from_number(day).isoformat(), old / 100, new / 100)
+                for product_id, day, old, new in zip(columns.ids(columns.product[rows]), columns.day[rows].tolist(),
+                                                     columns.price_cents[rows - 1].tolist(),
+                                                     columns.price_cents[rows].tolist())]
+
+    def min_max(self, brand, start=None, end=None):
+        """Return {product_id: (min_price, max_price)} over the range."""
+        columns = self.load(brand, start, end)
+        if not len(columns):
+            return {}
+        lows = np.minimum.reduceat(columns.price_cents, columns.starts)
+        highs = np.maximum.reduceat(columns.price_cents, columns.starts)
+        return {product_id: (int(low) / 100, int(high) / 100)
+                for product_id, low, high in zip(columns.ids(columns.product[columns.starts]), lows, highs)}
+
+    def moving_average(self, brand, product_id, window=7, start=None, end=None):
+        """Return [(day, average)] of the `window`-observation moving average of one product's price."""
+        columns = self.load(brand, start, end)
+        if product_id not in columns.product_ids:
+            return []
+        rows = columns.product == columns.product_ids.index(product_id)
+        prices = columns.price_cents[rows] / 100
+        if len(prices) < window:
+            return []
+        averages = np.convolve(prices, np.ones(window) / window, mode='valid')
+        days = columns.day[rows][window - 1:]
+        return [(day_from_number(day).isoformat(), round(float(average), 2)) for day, average in zip(days, averages)]
@@ -0,0 +1,216 @@
+import math
+import heapq
+import sqlite3
+import threading
+
+from price_store import day_number
+
+# Default location of the revisit schedule, next to prices_log.log
+DEFAULT_SCHEDULE_PATH = 'revisit_schedule.db'
+
+# Sources of recorded changes
+LINK, PRICE, REMOVED = 'link', 'price', 'removed'
+
+class RevisitScheduler:
+    """
+    Decides which products to visit on a day from how often each one changed so far.
+
+    Every product has a change history fed by the successive link snapshots of its brand
+    (new or changed links, removals; full or delta) and by the price observations of each visit. Its change
+    rate is estimated as (changes + prior_changes) / (days tracked + prior_days) changes per
+    day, so new products start at one change per `prior_days` days. After each visit the next
+    one is scheduled once the product has a `target` probability of having changed (Poisson),
+    clamped to [min_interval, max_interval] days.
+
+    `plan()` takes the products that are due and returns at most `budget` of them from a
+    priority queue: never visited products first, then products at their maximum interval,
+    then by their probability of having changed since the last visit.
+    """
+
+    def __init__(self, path=DEFAULT_SCHEDULE_PATH, min_interval=1, max_interval=14, target=0.5,
+                 prior_changes=1.0, prior_days=7.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target = target
+        self.prior_changes = prior_changes
+        self.prior_days = prior_days
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS products (
+                    brand TEXT NOT NULL,
+                    product_id TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    first_seen INTEGER NOT NULL,
+                    last_visit INTEGER,
+                    next_visit INTEGER NOT NULL,
+                    visits INTEGER NOT NULL DEFAULT 0,
+                    changes INTEGER NOT NULL DEFAULT 0,
+                    removed INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (brand, product_id)
+                );
+                CREATE TABLE IF NOT EXISTS change_log (
+                    brand TEXT NOT NULL,
+                    product_id TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    source TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    brand TEXT NOT NULL,
+                    snapshot_date TEXT NOT NULL,
+                    PRIMARY KEY (brand, snapshot_date)
+                );
+                CREATE INDEX IF NOT EXISTS products_next_visit ON products (removed, next_visit);
+            """)
+
+    def change_rate(self, changes, tracked_days):
+        """Estimated changes per day of a product."""
+        return (changes + self.prior_changes) / (max(tracked_days, 0) + self.prior_days)
+
+    def interval(self, rate):
+        """Days until a product changing `rate` times a day has changed with probability `target`."""
+        days = -math.log(1 - self.target) / rate
+        return min(self.max_interval, max(self.min_interval, round(days)))
+
+    def _log_change(self, brand, product_id, day, source):
+        self._connection.execute("INSERT INTO change_log (brand, product_id, day, source) VALUES (?, ?, ?, ?)",
+                                 (brand, product_id, day, source))
+
+    def _seen_snapshot(self, brand, snapshot_date):
+        return self._connection.execute("SELECT 1 FROM snapshots WHERE brand = ? AND snapshot_date = ?",
+                                        (brand, snapshot_date)).fetchone() is not None
+
+    def _known_products(self, brand):
+        return {product_id: (link, removed) for product_id, link, removed in self._connection.execute(
+            "SELECT product_id, link, removed FROM products WHERE brand = ?", (brand,))}
+
+    def _record_link(self, brand, product_id, link, day, known):
+        """Add a product seen with `link`; returns True when that is a change of a known product."""
+        if product_id not in known:
+            self._connection.execute(
+                "INSERT INTO products (brand, product_id, link, first_seen, next_visit) VALUES (?, ?, ?, ?, ?)",
+                (brand, product_id, link, day, day))
+            return False
+        if known[product_id] == (link, 0):
+            return False
+        self._connection.execute("""
+            UPDATE products SET link = ?, removed = 0, changes = changes + 1, next_visit = MIN(next_visit, ?)
+            WHERE brand = ? AND product_id = ?
+        """, (link, day, brand, product_id))
+        self._log_change(brand, product_id, day, LINK)
+        return True
+
+    def _record_removal(self, brand, product_id, day):
+        self._connection.execute("UPDATE products SET removed = 1 WHERE brand = ? AND product_id = ?",
+                                 (brand, product_id))
+        self._log_change(brand, product_id, day, REMOVED)
+
+    def record_snapshot(self, brand, snapshot_date, links):
+        """
+        Add a full link snapshot of a brand ({product_id: link} stored on `snapshot_date`).
+
+        New products and products whose link changed or that came back are due right away;
+        products missing from the snapshot are marked removed and no longer visited. Only
+        pass snapshots of full link searches here, delta searches go to record_changes().
+        Each snapshot is only counted once. Returns the number of changes found.
+        """
+        day = day_number(snapshot_date)
+        with self._lock, self._connection:
+            if self._seen_snapshot(brand, snapshot_date):
+                return 0
+            known = self._known_products(brand)
+            changes = 0
+            for product_id, link in links.items():
+                changes += self._record_link(brand, product_id, link, day, known)
+            for product_id, (_, removed) in known.items():
+                if product_id not in links and not removed:
+                    self._record_removal(brand, product_id, day)
+                    changes += 1
+            self._connection.execute("INSERT INTO snapshots (brand, snapshot_date) VALUES (?, ?)",
+                                     (brand, snapshot_date))
+        return changes
+
+    def record_changes(self, brand, snapshot_date, changes):
+        """
+        Add the (product_id, link, change) entries a delta link search stored on `snapshot_date`.
+
+        A delta snapshot only lists the products that were 'added', 'changed' or 'removed', so
+        products missing from it are left as they are. Each snapshot is only counted once.
+        Returns the number of changes found.
+        """
+        day = day_number(snapshot_date)
+        with self._lock, self._connection:
+            if self._seen_snapshot(brand, snapshot_date):
+                return 0
+            known = self._known_products(brand)
+            count = 0
+            for product_id, link, change in changes:
+                if change != REMOVED:
+                    count += self._record_link(brand, product_id, link, day, known)
+                elif product_id in known and not known[product_id][1]:
+                    self._record_removal(brand, product_id, day)
+                    count += 1
+            self._connection.execute("INSERT INTO snapshots (brand, snapshot_date) VALUES (?, ?)",
+                                     (brand, snapshot_date))
+        return count
+
+    def record_visit(self, brand, product_id, visit_date, changed, source=PRICE):
+        """Record a visit of a product and whether it had changed; schedules its next visit."""
+        day = day_number(visit_date)
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT first_seen, changes FROM products WHERE brand = ? AND product_id = ?",
+                                           (brand, product_id)).fetchone()
+            if row is None:
+                return None
+            first_seen, changes = row
+            changes += 1 if changed else 0
+            next_visit = day + self.interval(self.change_rate(changes, day - first_seen))
+            self._connection.execute("""
+                UPDATE products SET last_visit = ?, next_visit = ?, visits = visits + 1, changes = ?
+                WHERE brand = ? AND product_id = ?
+            """, (day, next_visit, changes, brand, product_id))
+            if changed:
+                self._log_change(brand, product_id, day, source)
+        return next_visit
+
+    def plan(self, visit_date, budget=None, brands=None):
+        """
+        Return up to `budget` due products as (brand, product_id, link) in the order to visit them.
+
+        Products that are not due yet are skipped.
+        """
+        day = day_number(visit_date)
+        with self._lock:
+            rows = self._connection.execute("""
+                SELECT brand, product_id, link, first_seen, last_visit, changes FROM products
+                WHERE removed = 0 AND next_visit <= ?
+            """, (day,)).fetchall()
+
+        queue = []
+        for brand, product_id, link, first_seen, last_visit, changes in rows:
+            if brands is not None and brand not in brands:
+                continue
+            if last_visit is None:
+                priority = (2, 1.0)
+            else:
+                elapsed = day - last_visit
+                changed = 1 - math.exp(-self.change_rate(changes, day - first_seen) * elapsed)
+                priority = (1 if elapsed >= self.max_interval else 0, changed)
+            queue.append((priority, brand, product_id, link))
+        selected = heapq.nlargest(budget, queue) if budget is not None else sorted(queue, reverse=True)
+        return [(brand, product_id, link) for _, brand, product_id, link in selected]
+
+    def stats(self, visit_date):
+        """Return the number of tracked, due and removed products on a day."""
+        day = day_number(visit_date)
+        with self._lock:
+            tracked, due, removed = self._connection.execute("""
+                SELECT COUNT(*), COALESCE(SUM(removed = 0 AND next_visit <= ?), 0), COALESCE(SUM(removed), 0)
+                FROM products
+            """, (day,)).fetchone()
+        return {"tracked": tracked, "due": due, "removed": removed}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# The stage modules are imported the way the scripts import them: from the stage directory, and
+# the shared modules from the repository root
+STAGE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(STAGE_DIR.parent))
+sys.path.insert(0, str(STAGE_DIR))
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from price_parsing import parse_price_text
+from price_store import PriceStore, day_number
+
+@pytest.fixture
+def store(tmp_path):
+    """Price history of one brand observed across the end of January."""
+    store = PriceStore(str(tmp_path / 'price_store'))
+    store.append('Shop', '2024-01-30', {"whey": 29.99, "creatine": 19.99})
+    store.append('Shop', '2024-01-31', {"whey": 29.99, "creatine": 17.99})
+    store.append('Shop', '2024-02-01', {"whey": 24.99, "creatine": 17.99, "bar": 2.5})
+    store.append('Shop', '2024-02-02', {"whey": 26.99, "creatine": 17.99, "bar": 2.5})
+    return store
+
+def test_append_partitions_by_month(store):
+    assert [os.path.basename(partition) for partition in store.partitions('Shop')] == ['2024-01', '2024-02']
+    assert len(store.load('Shop')) == 10
+
+def test_reappending_a_day_is_idempotent(store):
+    assert store.append('Shop', '2024-02-02', {"whey": 26.99, "creatine": 17.99, "bar": 2.5}) == 0
+    # Only the product not yet recorded that day is added
+    assert store.append('Shop', '2024-02-02', {"whey": 99.0, "gainer": 39.9}) == 1
+    assert len(store.load('Shop')) == 11
+    assert store.latest('Shop')["whey"]["price"] == 26.99
+
+def test_latest(store):
+    assert store.latest('Shop') == {
+        "whey": {"price": 26.99, "previous_price": 24.99, "delta": 2.0,
+                 "changed_on": "2024-02-02", "last_seen": "2024-02-02"},
+        "creatine": {"price": 17.99, "previous_price": 19.99, "delta": -2.0,
+                     "changed_on": "2024-01-31", "last_seen": "2024-02-02"},
+        "bar": {"price": 2.5, "previous_price": None, "delta": None,
+                "changed_on": "2024-02-01", "last_seen": "2024-02-02"},
+    }
+
+def test_latest_does_not_see_changes_before_start(store):
+    latest = store.latest('Shop', start='2024-02-01')
+    # The creatine change happened before the range: its first observation in range is all that is known
+    assert latest["creatine"] == {"price": 17.99, "previous_price": None, "delta": None,
+                                  "changed_on": "2024-02-01", "last_seen": "2024-02-02"}
+    # The earlier products' change rows do not leak into the products sorted after them
+    assert latest["bar"]["previous_price"] is None
+    assert latest["whey"]["previous_price"] == 24.99
+    # Only the February partition is read
+    assert store.partitions('Shop', day_number('2024-02-01')) == [store.partitions('Shop')[1]]
+
+def test_changes(store):
+    assert store.changes('Shop') == [
+        ("whey", "2024-02-01", 29.99, 24.99),
+        ("whey", "2024-02-02", 24.99, 26.99),
+        ("creatine", "2024-01-31", 19.99, 17.99),
+    ]
+    assert store.changes('Shop', start='2024-02-01') == [("whey", "2024-02-02", 24.99, 26.99)]
+
+def test_min_max(store):
+    assert store.min_max('Shop') == {"whey": (24.99, 29.99), "creatine": (17.99, 19.99), "bar": (2.5, 2.5)}
+    assert store.min_max('Shop', start='2024-02-01')["creatine"] == (17.99, 17.99)
+
+def test_moving_average(store):
+    assert store.moving_average('Shop', "whey", window=2) == [
+        ("2024-01-31", 29.99), ("2024-02-01", 27.49), ("2024-02-02", 25.99)]
+    assert store.moving_average('Shop', "bar", window=3) == []
+    assert store.moving_average('Shop', "unknown") == []
+
+def test_empty_store(tmp_path):
+    store = PriceStore(str(tmp_path / 'price_store'))
+    assert store.latest('Shop') == {}
+    assert store.changes('Shop') == []
+    assert store.min_max('Shop') == {}
+
+@pytest.mark.parametrize("text, price", [
+    ('29,99 €', 29.99),
+    ('€1.299,00', 1299.0),
+    ('29.99', 29.99),
+    ('1,299.5', 1299.5),
+    ('Preço: 45 €', 45.0),
+    ('', None),
+    (None, None),
+    ('Esgotado', None),
+])
+def test_parse_price_text(text, price):
+    assert parse_price_text(text) == price
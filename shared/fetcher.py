@@ -0,0 +1,86 @@
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# Browser-like headers so the shops serve the same markup Chrome receives
+HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36"),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "pt-PT,pt;q=0.9,en;q=0.8",
+}
+
+# requests.Session is not thread-safe, so each thread keeps its own connection pool
+_local = threading.local()
+
+def get_http_session():
+    """Return the pooled HTTP session of the current thread."""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=1)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _local.session = session
+    return session
+
+class DomainThrottle:
+    """Space the requests to each domain at least 1/rate seconds apart, across all threads."""
+
+    def __init__(self, rate=2.0):
+        self.rate = rate
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.rate:
+            return 0.0
+        domain = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(domain, now))
+            self._next_slot[domain] = slot + 1 / self.rate
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+class FetchResult:
+    """Outcome of a product page request: 'ok' with the page, 'not_modified' (HTTP 304) or 'error'."""
+
+    def __init__(self, status, html=None, etag=None, last_modified=None, error=None):
+        self.status = status
+        self.html = html
+        self.etag = etag
+        self.last_modified = last_modified
+        self.error = error
+
+def fetch_page(url, cached=None, throttle=None, timeout=15):
+    """
+    Fetch a product page, sending the cached ETag/Last-Modified as conditional request headers.
+
+    Servers that support them answer 304 Not Modified for unchanged pages without sending the
+    page again.
+    """
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    if throttle is not None:
+        throttle.wait(url)
+    try:
+        response = get_http_session().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            return FetchResult('not_modified', etag=response.headers.get('ETag'),
+                               last_modified=response.headers.get('Last-Modified'))
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logging.warning(f"Fetching {url} failed: {e}")
+        return FetchResult('error', error=str(e))
+    return FetchResult('ok', response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
@@ -0,0 +1,35 @@
+# Firestore rejects WriteBatches with more than 500 operations
+BATCH_LIMIT = 500
+
+def get_existing_documents(client, doc_refs):
+    """Fetch many documents in a single multi-get and return {doc_id: data} for those that exist."""
+    existing = {}
+    if not doc_refs:
+        return existing
+    for snapshot in client.get_all(doc_refs):
+        if snapshot.exists:
+            existing[snapshot.id] = snapshot.to_dict()
+    return existing
+
+def commit_in_batches(client, writes, batch_limit=BATCH_LIMIT):
+    """
+    Commit a list of (operation, doc_ref, data) writes in chunked WriteBatches.
+
+    `operation` is one of 'set', 'update' or 'delete' (data is ignored for deletes).
+    Returns the number of batches committed.
+    """
+    batches = 0
+    for start in range(0, len(writes), batch_limit):
+        batch = client.batch()
+        for operation, doc_ref, data in writes[start:start + batch_limit]:
+            if operation == 'set':
+                batch.set(doc_ref, data)
+            elif operation == 'update':
+                batch.update(doc_ref, data)
+            elif operation == 'delete':
+                batch.delete(doc_ref)
+            else:
+                raise ValueError(f"Unsupported batch operation: {operation}")
+        batch.commit()
+        batches += 1
+    return batches
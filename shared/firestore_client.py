@@ -0,0 +1,30 @@
+import os
+import threading
+from dotenv import load_dotenv, find_dotenv
+
+# Load environment variables from the .env file of the stage being run (or of the repository)
+load_dotenv(find_dotenv(usecwd=True))
+
+_db = None
+_lock = threading.Lock()
+
+def get_db():
+    """
+    Return the Firestore client, initializing the Firebase Admin SDK on first use.
+
+    firebase_admin is only imported here, so modules that never touch Firestore (or run
+    offline) do not pay for the SDK import or the credential loading.
+    """
+    global _db
+    with _lock:
+        if _db is None:
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+
+            try:
+                firebase_admin.get_app()
+            except ValueError:
+                cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS_PATH'))
+                firebase_admin.initialize_app(cred)
+            _db = firestore.client()
+    return _db
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+# Changes recorded by a delta link search (general_link_search.py --delta)
+ADDED, CHANGED, REMOVED = 'added', 'changed', 'removed'
+
+class LinkSnapshot:
+    """
+    The product links a link search stored for a brand on one date (product_links/{date}/{brand}).
+
+    A full search stores every product it found. A delta search (--delta) only stores the
+    products that were added, changed or removed since the previous run, each with a
+    "change" field; removed products are kept as tombstones. A snapshot is full when any of
+    its documents has no "change" field.
+    """
+
+    def __init__(self, date, documents):
+        self.date = date
+        self.documents = documents
+        self.full = any("change" not in data for data in documents.values())
+
+    def links(self):
+        """Return {product_id: link} of the live products, leaving out removed tombstones."""
+        return {product_id: data["link"] for product_id, data in self.documents.items()
+                if data.get("change") != REMOVED}
+
+    def changes(self):
+        """Return the (product_id, link, change) entries of a delta snapshot."""
+        return [(product_id, data["link"], data["change"]) for product_id, data in self.documents.items()
+                if "change" in data]
+
+def fetch_link_snapshot(client, brand_name, date):
+    """Fetch the snapshot stored for a brand on `date` (YYYY-MM-DD), or None when there is none."""
+    documents = {doc.id: doc.to_dict() for doc in client.collection(f"product_links/{date}/{brand_name}").stream()}
+    return LinkSnapshot(date, documents) if documents else None
+
+def fetch_link_snapshots(client, brand_name, day, lookback_days):
+    """
+    Fetch the snapshots that make up a brand's current catalog, oldest first.
+
+    Looks back from `day` (a datetime) for up to `lookback_days` days and returns the latest
+    full snapshot followed by the delta snapshots stored after it. When there is no full
+    snapshot in that window, only the delta snapshots are returned.
+    """
+    snapshots = []
+    for offset in range(lookback_days + 1):
+        snapshot = fetch_link_snapshot(client, brand_name, (day - timedelta(days=offset)).strftime('%Y-%m-%d'))
+        if snapshot is None:
+            continue
+        snapshots.append(snapshot)
+        if snapshot.full:
+            break
+    return snapshots[::-1]
+
+def current_links(snapshots):
+    """Apply delta snapshots on top of a full one; returns {product_id: link} of the live products."""
+    links = {}
+    for snapshot in snapshots:
+        if snapshot.full:
+            links = snapshot.links()
+            continue
+        for product_id, link, change in snapshot.changes():
+            if change == REMOVED:
+                links.pop(product_id, None)
+            else:
+                links[product_id] = link
+    return links